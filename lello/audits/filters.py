@@ -0,0 +1,16 @@
+from django_filters import rest_framework as filters
+
+from audits.models import Audit
+
+
+class AuditFilter(filters.FilterSet):
+    httpMethod = filters.ChoiceFilter(choices = Audit.HttpMethod.choices)
+    user = filters.NumberFilter(field_name = 'user')
+    board = filters.NumberFilter(field_name = 'board')
+    # ?created_at_after=...&created_at_before=...
+    created_at = filters.IsoDateTimeFromToRangeFilter()
+    ordering = filters.OrderingFilter(fields = ('created_at',))
+
+    class Meta:
+        model = Audit
+        fields = []
@@ -0,0 +1,121 @@
+"""
+Verification of the audit hash chains (see audits.models.link).
+
+Every audit stores the hash of the previous audit of its chain and a hash of
+its own content chained to it, so editing, inserting or deleting a row breaks
+the chain from that point on. verify_chain() streams a chain in sequence
+order, `chunk_size` rows per query over the (chain, sequence) index, and
+stores a checkpoint (last verified sequence and hash) after every clean
+chunk: the next run only reads the audits added since.
+
+On Postgres the table also gets a trigger rejecting UPDATEs, so rows can only
+be inserted, or deleted by retention and board deletion.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+
+from audits.models import Audit, AuditChain, GENESIS_HASH, audit_hash
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'VERIFY_CHUNK_SIZE': 10000,
+    'UNBOARDED_CHAINS': 16,
+}
+
+GUARD_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION lello_audit_append_only() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'audits are append-only';
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Statement level: also works on the partitioned table (audits.partitions).
+    """
+    CREATE TRIGGER audit_append_only BEFORE UPDATE ON {table}
+    FOR EACH STATEMENT EXECUTE PROCEDURE lello_audit_append_only()
+    """,
+]
+
+REMOVE_GUARD_SQL = [
+    'DROP TRIGGER IF EXISTS audit_append_only ON {table}',
+    'DROP FUNCTION IF EXISTS lello_audit_append_only()',
+]
+
+FIELDS = ('sequence', 'previous_hash', 'hash', 'board_id', 'httpMethod', 'url', 'user_id', 'created_at')
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'AUDIT_INTEGRITY', {}))
+
+
+def _run(schema_editor, statements, table):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in statements:
+        schema_editor.execute(statement.format(table = schema_editor.quote_name(table)))
+
+
+def install_guard(schema_editor, table=Audit._meta.db_table):
+    _run(schema_editor, GUARD_SQL, table)
+
+
+def remove_guard(schema_editor, table=Audit._meta.db_table):
+    _run(schema_editor, REMOVE_GUARD_SQL, table)
+
+
+def verify_chain(chain, chunk_size=None, full=False):
+    """
+    Checks the audits of `chain` added since its checkpoint (all of them with
+    full=True). Returns (audits checked, list of problems); the checkpoint
+    only moves forward over audits without problems.
+    """
+    chunk_size = chunk_size or get_config()['VERIFY_CHUNK_SIZE']
+    # Audits appended while verifying are left for the next run.
+    chain.refresh_from_db()
+    length = chain.length
+
+    if full:
+        sequence, expected = 0, GENESIS_HASH
+    else:
+        sequence, expected = chain.verified_sequence, chain.verified_hash
+
+    rows = Audit.objects.filter(chain = chain, sequence__lte = length).order_by('sequence')
+    checked = 0
+    problems = []
+
+    while sequence < length:
+        chunk = list(rows.filter(sequence__gt = sequence).values_list(*FIELDS)[:chunk_size])
+        if not chunk:
+            break
+        for number, previous, stored, board_id, method, url, user_id, created_at in chunk:
+            if number <= sequence:
+                problems.append('audit #{} repeated'.format(number))
+                continue
+            if number != sequence + 1:
+                if checked == 0 and number - 1 <= chain.verified_sequence:
+                    # The start of the chain was archived by retention, which
+                    # only removes audits that were already verified.
+                    expected = previous
+                else:
+                    problems.append('audits #{}-#{} missing'.format(sequence + 1, number - 1))
+            elif previous != expected:
+                problems.append('audit #{} does not follow #{}'.format(number, sequence))
+            if audit_hash(previous, number, board_id, method, url, user_id, created_at) != stored:
+                problems.append('audit #{} was modified'.format(number))
+
+            sequence, expected = number, stored
+            checked += 1
+
+        if not problems:
+            AuditChain.objects.filter(pk = chain.pk).update(
+                verified_sequence = sequence,
+                verified_hash = expected,
+                verified_at = timezone.now()
+            )
+
+    if sequence < length:
+        problems.append('audits #{}-#{} missing'.format(sequence + 1, length))
+    return checked, problems
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from audits.partitions import drop_empty_partitions, ensure_partitions, is_partitioned
+from audits.retention import archive_expired, get_config
+
+
+class Command(BaseCommand):
+    help = 'Moves audits older than their retention time to monthly JSONL.gz archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive-dir', help='Defaults to AUDIT_RETENTION["ARCHIVE_DIR"]')
+        parser.add_argument('--batch-size', type=int, help='Rows archived and deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to wait between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired audits')
+
+    def handle(self, *args, **options):
+        totals = archive_expired(
+            archive_dir = options['archive_dir'],
+            batch_size = options['batch_size'],
+            pause = options['pause'],
+            dry_run = options['dry_run'],
+            log = self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        for name, count in sorted(totals.items()):
+            self.stdout.write('{:>12} {}'.format(count, name))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('{} audits would be archived'.format(sum(totals.values()))))
+            return
+
+        if is_partitioned(connection):
+            for name in ensure_partitions(connection, get_config()['PARTITION_MONTHS_AHEAD']):
+                self.stdout.write('Created partition {}'.format(name))
+            for name in drop_empty_partitions(connection):
+                self.stdout.write('Dropped partition {}'.format(name))
+
+        self.stdout.write(self.style.SUCCESS('{} audits archived'.format(sum(totals.values()))))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from audits.partitions import convert, ensure_partitions, is_partitioned
+from audits.retention import get_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Partitions the audit table by created_at month (PostgreSQL only). '
+        'The first run rebuilds the table and locks it while copying the rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            help='Future months to create partitions for. Defaults to AUDIT_RETENTION["PARTITION_MONTHS_AHEAD"]',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Audit partitioning needs PostgreSQL')
+
+        months_ahead = options['months_ahead']
+        if months_ahead is None:
+            months_ahead = get_config()['PARTITION_MONTHS_AHEAD']
+
+        if not is_partitioned(connection):
+            convert(connection, months_ahead)
+            self.stdout.write(self.style.SUCCESS('Audit table partitioned by month'))
+            return
+
+        for name in ensure_partitions(connection, months_ahead):
+            self.stdout.write('Created partition {}'.format(name))
+        self.stdout.write(self.style.SUCCESS('Audit partitions up to date'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from audits.integrity import verify_chain
+from audits.models import Audit, AuditChain
+
+
+class Command(BaseCommand):
+    help = 'Verifies the audit hash chains from their last checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', type=int, help='Only verify the chain of this board')
+        parser.add_argument('--chunk-size', type=int, help='Audits read per query')
+        parser.add_argument('--full', action='store_true', help='Verify from the start instead of the checkpoint')
+        parser.add_argument('--strict', action='store_true', help='Also fail when there are audits outside any chain')
+
+    def handle(self, *args, **options):
+        chains = AuditChain.objects.order_by('pk')
+        if options['board'] is not None:
+            chains = chains.filter(board_id = options['board'])
+
+        total = 0
+        failed = 0
+        for chain in chains.iterator():
+            checked, problems = verify_chain(chain, options['chunk_size'], options['full'])
+            total += checked
+            if problems:
+                failed += 1
+                label = 'board {}'.format(chain.board_id) if chain.board_id else 'no board'
+                for problem in problems:
+                    self.stderr.write('Chain {} ({}): {}'.format(chain.pk, label, problem))
+
+        unchained = Audit.objects.filter(chain__isnull = True).count()
+        if unchained:
+            self.stdout.write('{} audits outside any chain (written before chaining or with it disabled)'.format(unchained))
+
+        if failed or (options['strict'] and unchained):
+            raise CommandError('{} audit chains failed verification'.format(failed))
+        self.stdout.write(self.style.SUCCESS('{} audits verified'.format(total)))
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audits', '0005_auto_20200604_0616'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='audit',
+            index=models.Index(fields=['url'], name='audit_url_idx'),
+        ),
+    ]
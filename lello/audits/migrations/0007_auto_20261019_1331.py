@@ -0,0 +1,96 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+from audits import integrity
+
+
+def create_unboarded_chain(apps, schema_editor):
+    # Created up front: there's no unique key to stop two first audits
+    # without board from each creating one.
+    AuditChain = apps.get_model('audits', 'AuditChain')
+    AuditChain.objects.using(schema_editor.connection.alias).get_or_create(board = None)
+
+
+def install_guard(apps, schema_editor):
+    integrity.install_guard(schema_editor)
+
+
+def remove_guard(apps, schema_editor):
+    integrity.remove_guard(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('boards', '0005_auto_20261019_1325'),
+        ('audits', '0006_auto_20261019_1325'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditChain',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('length', models.BigIntegerField(default=0)),
+                ('last_hash', models.CharField(default='0000000000000000000000000000000000000000000000000000000000000000', max_length=64)),
+                ('verified_sequence', models.BigIntegerField(default=0)),
+                ('verified_hash', models.CharField(default='0000000000000000000000000000000000000000000000000000000000000000', max_length=64)),
+                ('verified_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='auditchain',
+            name='board',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to='boards.board'),
+        ),
+        migrations.AddField(
+            model_name='audit',
+            name='chain',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='audits.auditchain'),
+        ),
+        migrations.AddField(
+            model_name='audit',
+            name='sequence',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='audit',
+            name='previous_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='audit',
+            name='hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='audit',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='audit',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='audit',
+            index=models.Index(fields=['board', 'created_at'], name='audit_board_idx'),
+        ),
+        migrations.AlterField(
+            model_name='audit',
+            name='board',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='boards.board'),
+        ),
+        migrations.AddIndex(
+            model_name='audit',
+            index=models.Index(fields=['chain', 'sequence'], name='audit_chain_idx'),
+        ),
+        migrations.RunPython(create_unboarded_chain, migrations.RunPython.noop),
+        migrations.RunPython(install_guard, remove_guard),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audits', '0007_auto_20261019_1331'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='audit',
+            index=models.Index(fields=['httpMethod', 'created_at'], name='audit_method_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.12 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+def fill_keys(apps, schema_editor):
+    # The chain without board keeps its audits as the first unboarded chain.
+    AuditChain = apps.get_model('audits', 'AuditChain')
+    chains = AuditChain.objects.using(schema_editor.connection.alias)
+    for chain in chains.filter(key = None):
+        chain.key = 'unboarded-0' if chain.board_id is None else 'board-{}'.format(chain.board_id)
+        chain.save(update_fields = ['key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audits', '0008_auto_20261019_1346'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditchain',
+            name='key',
+            field=models.CharField(max_length=40, null=True),
+        ),
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='auditchain',
+            name='key',
+            field=models.CharField(max_length=40, unique=True),
+        ),
+    ]
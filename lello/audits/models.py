@@ -1,9 +1,126 @@
-from django.db import models
+import hashlib
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from boards.models import Board
 
+
+GENESIS_HASH = '0' * 64
+
+
+class AuditImmutableError(Exception):
+    pass
+
+
+def chain_enabled():
+    return getattr(settings, 'AUDIT_INTEGRITY', {}).get('ENABLED', True)
+
+
+def chain_key(board_id, user_id):
+    """
+    Audits of a board form its chain; audits without board are spread over
+    UNBOARDED_CHAINS chains by user, so they don't all wait on one row lock.
+    """
+    if board_id is not None:
+        return 'board-{}'.format(board_id)
+    shards = getattr(settings, 'AUDIT_INTEGRITY', {}).get('UNBOARDED_CHAINS', 16)
+    return 'unboarded-{}'.format((user_id or 0) % shards)
+
+
+def audit_hash(previous_hash, sequence, board_id, method, url, user_id, created_at):
+    content = json.dumps(
+        [sequence, board_id, method, url, user_id, created_at.isoformat()],
+        separators = (',', ':')
+    )
+    return hashlib.sha256((previous_hash + content).encode()).hexdigest()
+
+
+class AuditChain(models.Model):
+    # See chain_key(). Unique and never null, so two first audits of a chain
+    # can't each create it.
+    key = models.CharField(
+        max_length = 40,
+        unique = True
+    )
+    board = models.OneToOneField(
+        Board,
+        null = True,
+        on_delete = models.CASCADE
+    )
+    length = models.BigIntegerField(
+        default = 0
+    )
+    last_hash = models.CharField(
+        max_length = 64,
+        default = GENESIS_HASH
+    )
+    # Where the last verification stopped (see audits.integrity).
+    verified_sequence = models.BigIntegerField(
+        default = 0
+    )
+    verified_hash = models.CharField(
+        max_length = 64,
+        default = GENESIS_HASH
+    )
+    verified_at = models.DateTimeField(
+        null = True
+    )
+
+    @classmethod
+    def lock(cls, key, board_id):
+        """The chain `key`, created if needed and locked until the transaction ends."""
+        chains = cls.objects.select_for_update()
+        chain = chains.filter(key = key).first()
+        if chain is None:
+            try:
+                with transaction.atomic():
+                    chain = cls.objects.create(key = key, board_id = board_id)
+            except IntegrityError:
+                # Created by a concurrent request.
+                chain = chains.get(key = key)
+        return chain
+
+
+def link(audits):
+    """Appends new audits to their chains (sequence and hashes)."""
+    by_chain = defaultdict(list)
+    for audit in audits:
+        by_chain[chain_key(audit.board_id, audit.user_id)].append(audit)
+
+    # Same lock order everywhere, so concurrent bulk inserts can't deadlock.
+    for key in sorted(by_chain):
+        chain = AuditChain.lock(key, by_chain[key][0].board_id)
+        for audit in by_chain[key]:
+            chain.length += 1
+            audit.chain = chain
+            audit.sequence = chain.length
+            audit.previous_hash = chain.last_hash
+            audit.hash = audit.compute_hash()
+            chain.last_hash = audit.hash
+        chain.save(update_fields = ['length', 'last_hash'])
+
+
+class AuditQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        raise AuditImmutableError('Audits are append-only')
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if not chain_enabled():
+            return super().bulk_create(objs, *args, **kwargs)
+        objs = list(objs)
+        # No savepoint: a failed audit fails the whole request.
+        with transaction.atomic(using = self.db, savepoint = False):
+            link(objs)
+            return super().bulk_create(objs, *args, **kwargs)
+
+
 class Audit(models.Model):
 
     class HttpMethod(models.TextChoices):
@@ -11,7 +128,7 @@ class Audit(models.Model):
         POST 	= 'POST',   _('POST')
         PUT     = 'PUT',    _('PUT')
         DELETE  = 'DELETE', _('DELETE')
-    
+
     httpMethod = models.CharField(
         choices = HttpMethod.choices,
         max_length = 20,
@@ -21,17 +138,75 @@ class Audit(models.Model):
     url = models.CharField(
         max_length = 300,
     )
+    # Audits outlive their user: no cascade (it would break the chains),
+    # the id is kept.
     user = models.ForeignKey(
         User,
-        null = False,
+        null = True,
         blank = False,
-        on_delete = models.CASCADE
+        on_delete = models.DO_NOTHING,
+        db_constraint = False
     )
     board = models.ForeignKey(
         Board,
         on_delete = models.CASCADE,
-        null = True
+        null = True,
+        db_index = False
     )
+    # Set here instead of auto_now_add: the value is part of the hash,
+    # which is computed before the insert.
     created_at = models.DateTimeField(
-        auto_now_add = True
+        default = timezone.now,
+        editable = False
+    )
+    chain = models.ForeignKey(
+        'audits.AuditChain',
+        null = True,
+        editable = False,
+        on_delete = models.CASCADE,
+        db_index = False
+    )
+    sequence = models.BigIntegerField(
+        null = True,
+        editable = False
+    )
+    previous_hash = models.CharField(
+        max_length = 64,
+        null = True,
+        editable = False
     )
+    hash = models.CharField(
+        max_length = 64,
+        null = True,
+        editable = False
+    )
+
+    objects = AuditQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Board audits look up entries by the url of the board, its lists
+            # and cards.
+            models.Index(fields = ['url'], name = 'audit_url_idx'),
+            models.Index(fields = ['board', 'created_at'], name = 'audit_board_idx'),
+            # Filtering by method and date (audits.filters), and the retention
+            # TTLs per method.
+            models.Index(fields = ['httpMethod', 'created_at'], name = 'audit_method_created_idx'),
+            # Verification walks each chain in order.
+            models.Index(fields = ['chain', 'sequence'], name = 'audit_chain_idx'),
+        ]
+
+    def compute_hash(self):
+        return audit_hash(
+            self.previous_hash, self.sequence, self.board_id,
+            self.httpMethod, self.url, self.user_id, self.created_at
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise AuditImmutableError('Audits are append-only')
+        if not chain_enabled():
+            return super().save(*args, **kwargs)
+        with transaction.atomic(savepoint = False):
+            link([self])
+            super().save(*args, **kwargs)
@@ -0,0 +1,152 @@
+"""
+Optional Postgres declarative partitioning of the audit table by created_at
+month (audits_audit_2026_01, ...).
+
+convert() turns the regular table into a partitioned one. It copies every row
+while holding a lock on the table, so run it once in a maintenance window.
+After that, ensure_partitions() keeps the coming months created and
+drop_empty_partitions() removes the past months the retention command
+emptied, so old data goes away without row-by-row deletes or vacuum.
+"""
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+
+from audits.integrity import install_guard
+from audits.models import Audit
+
+
+TABLE = Audit._meta.db_table
+DEFAULT_PARTITION = TABLE + '_default'
+PARTITION_NAME = re.compile(r'^{}_(\d{{4}})_(\d{{2}})$'.format(TABLE))
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo = dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo = dt_timezone.utc)
+
+
+def partition_name(month):
+    return '{}_{:%Y_%m}'.format(TABLE, month)
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection):
+    """month -> name of the existing monthly partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s AND pg_table_is_visible(p.oid)',
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo = dt_timezone.utc)] = name
+    return months
+
+
+def create_partitions(executor, quote, first, last):
+    """Monthly partitions from `first` to `last` (month starts, inclusive)."""
+    month = first
+    while month <= last:
+        executor(
+            'CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)'.format(
+                quote(partition_name(month)), quote(TABLE)
+            ),
+            [month, add_months(month, 1)]
+        )
+        month = add_months(month, 1)
+
+
+def ensure_partitions(connection, months_ahead):
+    """Creates the partitions of this month and the next `months_ahead`; returns the new ones."""
+    existing = partitions(connection)
+    first = month_start(timezone.now())
+    last = add_months(first, months_ahead)
+    with connection.cursor() as cursor:
+        create_partitions(cursor.execute, connection.ops.quote_name, first, last)
+    return sorted(set(partitions(connection).values()) - set(existing.values()))
+
+
+def drop_empty_partitions(connection):
+    """Detaches and drops the empty partitions of past months; returns their names."""
+    quote = connection.ops.quote_name
+    current = month_start(timezone.now())
+    dropped = []
+    with connection.cursor() as cursor:
+        for month, name in sorted(partitions(connection).items()):
+            if month >= current:
+                continue
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM {})'.format(quote(name)))
+            if cursor.fetchone()[0]:
+                continue
+            cursor.execute('ALTER TABLE {} DETACH PARTITION {}'.format(quote(TABLE), quote(name)))
+            cursor.execute('DROP TABLE {}'.format(quote(name)))
+            dropped.append(name)
+    return dropped
+
+
+def convert(connection, months_ahead):
+    """Rebuilds the audit table as a table partitioned by created_at month."""
+    quote = connection.ops.quote_name
+    old = TABLE + '_unpartitioned'
+
+    with connection.schema_editor() as editor, connection.cursor() as cursor:
+        editor.execute('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE'.format(quote(TABLE)))
+        editor.execute('ALTER TABLE {} RENAME TO {}'.format(quote(TABLE), quote(old)))
+        editor.execute(
+            'CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'.format(
+                quote(TABLE), quote(old)
+            )
+        )
+        # The partition key has to be part of the primary key.
+        editor.execute('ALTER TABLE {} ADD PRIMARY KEY (id, created_at)'.format(quote(TABLE)))
+
+        # Keep the id sequence when the old table is dropped.
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [old, 'id'])
+        sequence = cursor.fetchone()[0]
+        editor.execute('ALTER SEQUENCE {} OWNED BY {}.id'.format(sequence, quote(TABLE)))
+
+        cursor.execute('SELECT min(created_at) FROM {}'.format(quote(old)))
+        oldest = cursor.fetchone()[0] or timezone.now()
+        first = month_start(oldest)
+        last = add_months(month_start(timezone.now()), months_ahead)
+        create_partitions(editor.execute, quote, first, last)
+        # Catches rows outside the monthly partitions instead of failing the
+        # insert if partitions stop being created.
+        editor.execute('CREATE TABLE {} PARTITION OF {} DEFAULT'.format(quote(DEFAULT_PARTITION), quote(TABLE)))
+
+        editor.execute('INSERT INTO {} SELECT * FROM {}'.format(quote(TABLE), quote(old)))
+        editor.execute('DROP TABLE {}'.format(quote(old)))
+
+        # Indexes and foreign keys as the migrations create them; indexes on
+        # the parent are created on every partition.
+        for statement in editor._model_indexes_sql(Audit):
+            editor.execute(statement)
+        for field in Audit._meta.local_fields:
+            if field.remote_field and field.db_constraint:
+                editor.execute(editor._create_fk_sql(Audit, field, '_fk_%(to_table)s_%(to_column)s'))
+        install_guard(editor)
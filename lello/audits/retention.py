@@ -0,0 +1,128 @@
+"""
+Time-based retention for the audit log.
+
+Audits older than the TTL of their HTTP method (AUDIT_RETENTION['TTL_DAYS'])
+are moved, in small batches, to one gzipped JSON-lines file per month in
+ARCHIVE_DIR and deleted from the table. Every batch is its own short
+transaction, so the table is never locked for long and the command can be
+stopped and resumed at any point.
+
+A batch is written to the archive before its rows are deleted: if the delete
+fails the rows are archived again by the next run, so readers of the archive
+should dedupe by `id`. Chained audits (audits.integrity) are only archived
+once verified, and keep their hashes in the archive.
+"""
+
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from audits.models import Audit
+from lello.metrics import audits_archived
+
+
+DEFAULTS = {
+    # Days to keep audits per HTTP method, None keeps them forever.
+    'TTL_DAYS': {},
+    'DEFAULT_TTL_DAYS': None,
+    'ARCHIVE_DIR': 'archive/audits',
+    'BATCH_SIZE': 1000,
+    'PARTITION_MONTHS_AHEAD': 3,
+}
+
+FIELDS = (
+    'id', 'httpMethod', 'url', 'user_id', 'board_id', 'created_at',
+    'chain_id', 'sequence', 'previous_hash', 'hash',
+)
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'AUDIT_RETENTION', {}))
+
+
+def expired(now=None, config=None):
+    """Audits past the TTL of their method."""
+    config = config or get_config()
+    now = now or timezone.now()
+    ttls = config['TTL_DAYS']
+
+    condition = Q(pk__in = [])
+    for method, days in ttls.items():
+        if days is not None:
+            condition |= Q(httpMethod = method, created_at__lt = now - timedelta(days = days))
+    if config['DEFAULT_TTL_DAYS'] is not None:
+        condition |= (
+            ~Q(httpMethod__in = list(ttls)) &
+            Q(created_at__lt = now - timedelta(days = config['DEFAULT_TTL_DAYS']))
+        )
+    verified = Q(chain__isnull = True) | Q(sequence__lte = F('chain__verified_sequence'))
+    return Audit.objects.filter(condition & verified)
+
+
+def archive_path(directory, created_at):
+    return os.path.join(directory, 'audits-{:%Y-%m}.jsonl.gz'.format(created_at))
+
+
+def write_archive(directory, rows):
+    """Appends rows to their monthly files; returns {file name: rows written}."""
+    by_file = defaultdict(list)
+    for row in rows:
+        by_file[archive_path(directory, row['created_at'])].append(row)
+
+    written = {}
+    for path, file_rows in by_file.items():
+        # Appending adds a new gzip member; gzip readers see one stream.
+        with gzip.open(path, 'at', encoding = 'utf-8') as archive:
+            for row in file_rows:
+                archive.write(json.dumps(dict(row, created_at = row['created_at'].isoformat())) + '\n')
+            archive.flush()
+            os.fsync(archive.fileno())
+        written[os.path.basename(path)] = len(file_rows)
+    return written
+
+
+def archive_expired(archive_dir=None, batch_size=None, pause=0, dry_run=False, now=None, log=None):
+    """
+    Moves expired audits to the archive and deletes them, batch by batch.
+    Returns {archive file name: rows archived}.
+    """
+    config = get_config()
+    archive_dir = archive_dir or config['ARCHIVE_DIR']
+    batch_size = batch_size or config['BATCH_SIZE']
+    queryset = expired(now, config)
+    totals = defaultdict(int)
+
+    if dry_run:
+        for row in queryset.values('created_at'):
+            totals[os.path.basename(archive_path(archive_dir, row['created_at']))] += 1
+        return dict(totals)
+
+    os.makedirs(archive_dir, exist_ok = True)
+    while True:
+        with transaction.atomic():
+            # Expired rows are the oldest ones, at the start of the primary
+            # key index: each batch reads little more than what it deletes.
+            rows = list(queryset.order_by('pk').values(*FIELDS)[:batch_size])
+            if not rows:
+                break
+            written = write_archive(archive_dir, rows)
+            Audit.objects.filter(pk__in = [row['id'] for row in rows]).delete()
+
+        for name, count in written.items():
+            totals[name] += count
+        for row in rows:
+            audits_archived.inc(method = row['httpMethod'])
+        if log:
+            log('Archived {} audits'.format(len(rows)))
+        if pause:
+            time.sleep(pause)
+
+    return dict(totals)
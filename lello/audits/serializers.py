@@ -1,10 +1,9 @@
-from rest_framework import serializers
-
+from lello.serializers import DynamicFieldsModelSerializer
 from audits.models import Audit
 from users.serializers import UserSerializer
 
 
-class AuditSerializer(serializers.ModelSerializer):
+class AuditSerializer(DynamicFieldsModelSerializer):
     user = UserSerializer()
 
     class Meta:
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from audits.models import Audit
+from lello.metrics import audits_created
+
+
+@receiver(post_save, sender=Audit)
+def count_audit(sender, instance, created, **kwargs):
+    if created:
+        audits_created.inc(method = instance.httpMethod)
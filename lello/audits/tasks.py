@@ -0,0 +1,26 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.queue import task
+from audits.models import Audit
+from boards.deletion import exclude_deleting
+from boards.models import Board
+
+
+# Ahead of other jobs, so audits stay close to the order of their requests.
+@task(priority = 10)
+def create_audit(httpMethod, url, user_id, board_id=None, created_at=None):
+    # created_at is the time of the request, not of the job.
+    if isinstance(created_at, str):
+        created_at = parse_datetime(created_at)
+    if board_id is not None and not exclude_deleting(Board.all_objects.filter(pk = board_id)).exists():
+        # The board is gone or being deleted: an audit inserted now could
+        # land after the deletion went past the audits table.
+        return
+    Audit.objects.create(
+        httpMethod = httpMethod,
+        url = url,
+        user_id = user_id,
+        board_id = board_id,
+        created_at = created_at or timezone.now()
+    )
@@ -1,3 +1,164 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import models
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from audits.integrity import verify_chain
+from audits.models import Audit, AuditChain, AuditImmutableError, chain_key
+from audits.retention import archive_expired, expired
+from boards.models import Board
+from users.models import Team
+
+
+RETENTION = {
+    'TTL_DAYS': {'GET': 30, 'POST': 365, 'DELETE': None},
+    'DEFAULT_TTL_DAYS': 90,
+}
+
+
+def tamper(queryset, **values):
+    # Audit.objects.update() refuses to run.
+    return models.QuerySet.update(queryset, **values)
+
+
+def verify_all():
+    return [verify_chain(chain) for chain in AuditChain.objects.order_by('pk')]
+
+
+@override_settings(AUDIT_RETENTION = RETENTION)
+class RetentionTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username = 'auditor')
+        self.now = timezone.now()
+
+    def audit(self, method, days):
+        return Audit.objects.create(
+            httpMethod = method,
+            url = '/boards/',
+            user = self.user,
+            created_at = self.now - timedelta(days = days)
+        ).pk
+
+    def test_ttl_per_method(self):
+        old_get = self.audit('GET', 31)
+        self.audit('GET', 29)
+        old_post = self.audit('POST', 400)
+        self.audit('POST', 200)
+        self.audit('DELETE', 4000)
+        old_patch = self.audit('PATCH', 100)
+        self.audit('PATCH', 80)
+        verify_all()
+
+        self.assertEqual(
+            set(expired(self.now).values_list('pk', flat = True)),
+            {old_get, old_post, old_patch}
+        )
+
+    def test_only_verified_audits_expire(self):
+        old = self.audit('GET', 31)
+        self.assertFalse(expired(self.now).exists())
+        verify_all()
+        self.assertEqual(list(expired(self.now).values_list('pk', flat = True)), [old])
+
+    def test_archive_moves_expired_rows_to_monthly_files(self):
+        archived = {self.audit('GET', days) for days in (77, 76, 75, 41, 40)}
+        kept = self.audit('GET', 1)
+        verify_all()
+
+        with tempfile.TemporaryDirectory() as directory:
+            totals = archive_expired(archive_dir = directory, batch_size = 2, now = self.now)
+
+            rows = []
+            for name in totals:
+                with gzip.open(os.path.join(directory, name), 'rt') as archive:
+                    rows.extend(json.loads(line) for line in archive)
+
+        self.assertEqual(sum(totals.values()), len(archived))
+        self.assertEqual({row['id'] for row in rows}, archived)
+        self.assertTrue(all(row['hash'] for row in rows))
+        self.assertTrue(all(name.startswith('audits-') and name.endswith('.jsonl.gz') for name in totals))
+        self.assertEqual(list(Audit.objects.values_list('pk', flat = True)), [kept])
+
+        # The rest of the chain still verifies from the start.
+        self.assertEqual([problems for _, problems in verify_all() if problems], [])
+        chain = AuditChain.objects.get(key = chain_key(None, self.user.pk))
+        self.assertEqual(verify_chain(chain, full = True), (1, []))
+
+
+class IntegrityTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username = 'auditor')
+        team = Team.objects.create(name = 'Team')
+        self.boards = [
+            Board.objects.create(name = 'Board {}'.format(index), owner = self.user, team = team)
+            for index in range(2)
+        ]
+        for index in range(5):
+            for board in self.boards:
+                Audit.objects.create(url = '/boards/{}/'.format(index), user = self.user, board = board)
+        Audit.objects.bulk_create([
+            Audit(url = '/cards/{}/'.format(index), user = self.user, board = self.boards[0])
+            for index in range(5)
+        ])
+        self.chain = AuditChain.objects.get(board = self.boards[0])
+
+    def test_chains_per_board(self):
+        self.assertEqual(self.chain.length, 10)
+        self.assertEqual(
+            list(self.chain.audit_set.order_by('sequence').values_list('sequence', flat = True)),
+            list(range(1, 11))
+        )
+        self.assertEqual(verify_all()[1:], [(10, []), (5, [])])
+
+    def test_verification_resumes_from_checkpoint(self):
+        self.assertEqual(verify_chain(self.chain, chunk_size = 3), (10, []))
+        self.assertEqual(verify_chain(self.chain), (0, []))
+        Audit.objects.create(url = '/lists/1/', user = self.user, board = self.boards[0])
+        self.assertEqual(verify_chain(self.chain), (1, []))
+
+    def test_detects_modified_audits(self):
+        tamper(self.chain.audit_set.filter(sequence = 4), url = '/boards/99/')
+        checked, problems = verify_chain(self.chain, chunk_size = 3)
+        self.assertEqual(problems, ['audit #4 was modified'])
+        # The checkpoint stays before the chunk with the modified audit.
+        self.assertEqual(AuditChain.objects.get(pk = self.chain.pk).verified_sequence, 3)
+
+    def test_detects_deleted_audits(self):
+        self.chain.audit_set.filter(sequence__in = [5, 10]).delete()
+        _, problems = verify_chain(self.chain)
+        self.assertEqual(problems, ['audits #5-#5 missing', 'audits #10-#10 missing'])
+
+    def test_audits_are_append_only(self):
+        audit = self.chain.audit_set.first()
+        audit.url = '/boards/99/'
+        with self.assertRaises(AuditImmutableError):
+            audit.save()
+        with self.assertRaises(AuditImmutableError):
+            Audit.objects.filter(pk = audit.pk).update(url = '/boards/99/')
+
+    def test_a_chain_created_concurrently_is_not_forked(self):
+        Audit.objects.create(url = '/users/', user = self.user)
+        existing = AuditChain.objects.filter(board = None).count()
+        # Another request created the chain between the lookup and the insert.
+        with mock.patch('django.db.models.QuerySet.first', return_value = None):
+            chain = AuditChain.lock(chain_key(None, self.user.pk), None)
+        self.assertEqual(chain.length, 1)
+        self.assertEqual(AuditChain.objects.filter(board = None).count(), existing)
+
+    @override_settings(AUDIT_INTEGRITY = {'UNBOARDED_CHAINS': 2})
+    def test_audits_without_board_are_spread_by_user(self):
+        other = User.objects.create(username = 'other auditor', pk = self.user.pk + 1)
+        for user in (self.user, other, self.user):
+            Audit.objects.create(url = '/users/', user = user)
+        chains = AuditChain.objects.filter(key__in = [chain_key(None, self.user.pk), chain_key(None, other.pk)])
+        self.assertEqual(sorted(chains.values_list('length', flat = True)), [1, 2])
+        self.assertEqual([problems for _, problems in verify_all() if problems], [])
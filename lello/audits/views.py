@@ -1,14 +1,17 @@
 from django.shortcuts import render
 from rest_framework import viewsets
 
+from audits.filters import AuditFilter
 from audits.models import Audit
 from audits.serializers import AuditSerializer
 from users.permissions import APIPermissionClassFactory
+from lello.db import ReadReplicaMixin
 
 
-class AuditViewSet(viewsets.ModelViewSet):
-    queryset = Audit.objects.all()
+class AuditViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
+    queryset = Audit.objects.select_related('user')
     serializer_class = AuditSerializer
+    filterset_class = AuditFilter
     permission_classes = (
         APIPermissionClassFactory(
             name='AuditPermission',
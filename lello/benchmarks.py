@@ -0,0 +1,429 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from boards.deletion import run_deletion, schedule, team_subtree
+from boards.models import Board, List, Card, Deletion
+from boards.serializers import CardSerializer, ListSerializer
+from calendars.models import Event
+from calendars.serializers import EventSerializer
+from checklists.models import Checklist, Element
+from checklists.serializers import ElementSerializer
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer
+from audits.models import Audit
+from audits.serializers import AuditSerializer
+from lello.fast_serializers import serialize
+from init_data import SyntheticDataGenerator
+from users.models import Team
+
+
+CASES = {}
+
+
+def case(name):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+class BenchmarkContext:
+    """
+    Picks the objects every case works on (the biggest board, list, etc.) and
+    holds an authenticated API client.
+    """
+
+    def __init__(self):
+        self.board = Board.objects.annotate(
+            cards = Count('list__card')
+        ).order_by('-cards', 'pk').first()
+        self.lista = List.objects.annotate(
+            cards = Count('card')
+        ).order_by('-cards', 'pk').first()
+        self.card = Checklist.objects.filter(
+            card__isnull = False
+        ).annotate(
+            elements = Count('element')
+        ).order_by('-elements', 'pk').first().card
+        self.user = User.objects.annotate(
+            received = Count('receiver')
+        ).order_by('-received', 'pk').first()
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
+        self.password = 'admin'
+        self.created = 0
+
+    def get(self, path):
+        return self.client.get(path)
+
+    def post(self, path, data, client=None):
+        return (client or self.client).post(path, data, format = 'json')
+
+
+@case('board_lists')
+def board_lists(ctx):
+    return ctx.get('/api/boards/{}/lists/'.format(ctx.board.id))
+
+
+@case('board_audits')
+def board_audits(ctx):
+    return ctx.get('/api/boards/{}/audits/'.format(ctx.board.id))
+
+
+@case('list_cards')
+def list_cards(ctx):
+    return ctx.get('/api/lists/{}/cards/'.format(ctx.lista.id))
+
+
+@case('card_create')
+def card_create(ctx):
+    ctx.created += 1
+    return ctx.post('/api/cards/', {
+        'title': 'Benchmark {}'.format(ctx.created),
+        'lista': ctx.lista.id,
+    })
+
+
+@case('card_checklists')
+def card_checklists(ctx):
+    return ctx.get('/api/cards/{}/checklists/'.format(ctx.card.id))
+
+
+@case('user_notifications')
+def user_notifications(ctx):
+    return ctx.get('/api/users/{}/notifications/'.format(ctx.user.id))
+
+
+@case('token_auth')
+def token_auth(ctx):
+    return ctx.post(
+        '/api/token-auth/',
+        {'username': ctx.user.username, 'password': ctx.password},
+        client = ctx.anonymous,
+    )
+
+
+def _percentile(samples, percent):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def run_case(name, ctx, iterations=50, warmup=5):
+    func = CASES[name]
+    for _ in range(warmup):
+        func(ctx)
+
+    # The query log is a bounded deque: empty it first or a full log makes
+    # CaptureQueriesContext report zero queries.
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        response = func(ctx)
+    status = getattr(response, 'status_code', 200)
+    if status >= 400:
+        return {'name': name, 'error': 'HTTP {}'.format(status)}
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        reset_queries()
+        start = time.perf_counter()
+        func(ctx)
+        samples.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'name': name,
+        'iterations': iterations,
+        'queries': len(queries.captured_queries),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(_percentile(samples, 50), 3),
+        'p95_ms': round(_percentile(samples, 95), 3),
+        'min_ms': round(min(samples), 3),
+        'max_ms': round(max(samples), 3),
+        'throughput_rps': round(iterations / elapsed, 1),
+    }
+
+
+def run(names=None, iterations=50, warmup=5, dataset=None, log=None):
+    log = log or (lambda message: None)
+    startup = import_profile()
+    log('{:<20} {:>9.2f}ms wall {:>9.2f}ms imports {:>7.2f}ms project'.format(
+        'startup', startup['wall_ms'], startup['import_ms'], startup['project_ms']
+    ))
+
+    ctx = BenchmarkContext()
+    results = []
+    for name in names or CASES:
+        try:
+            result = run_case(name, ctx, iterations, warmup)
+        except Exception as error:
+            result = {'name': name, 'error': repr(error)}
+
+        if 'error' in result:
+            log('{name:<20} failed: {error}'.format(**result))
+        else:
+            log('{name:<20} {mean_ms:>9.2f}ms mean {p95_ms:>9.2f}ms p95 {queries:>5} queries'.format(**result))
+        results.append(result)
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'dataset': dataset or {},
+        'startup': startup,
+        'results': results,
+    }
+
+
+# Packages of this project, to tell its own import time from its dependencies'.
+PROJECT_PACKAGES = ('lello', 'audits', 'boards', 'calendars', 'checklists', 'notifications', 'users')
+
+STARTUP_SCRIPT = 'import django; django.setup(); import lello.urls'
+
+
+def _parse_importtime(output):
+    """(module, self us, cumulative us, nesting level) per `-X importtime` line."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative), level))
+    return modules
+
+
+def import_profile(environ=None, repeat=3, top=10):
+    """
+    Boots a fresh interpreter under `python -X importtime` the way a worker
+    does (django.setup() and the URLconf, so every viewset) and returns the
+    median run: wall time, time spent importing, the part of it spent in this
+    project's own modules and the slowest top-level imports.
+    """
+    command = [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT]
+    env = dict(os.environ, **(environ or {}))
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            command, env = env, cwd = cwd, check = True,
+            stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, universal_newlines = True,
+        )
+        runs.append(((time.perf_counter() - start) * 1000, _parse_importtime(completed.stderr)))
+
+    runs.sort(key = lambda run: run[0])
+    wall, modules = runs[len(runs) // 2]
+    roots = sorted(
+        (module for module in modules if module[3] == 0),
+        key = lambda module: -module[2],
+    )
+    return {
+        'wall_ms': round(wall, 1),
+        'import_ms': round(sum(module[2] for module in roots) / 1000, 1),
+        'project_ms': round(sum(
+            module[1] for module in modules
+            if module[0].split('.')[0] in PROJECT_PACKAGES
+        ) / 1000, 1),
+        'slowest': [
+            {'module': module[0], 'cumulative_ms': round(module[2] / 1000, 1)}
+            for module in roots[:top]
+        ],
+    }
+
+
+def compare_stacks(names=None, iterations=50, warmup=5, log=None):
+    """
+    Runs the cases with the full middleware stack and with the API-only one
+    (see API_ONLY in settings), and times worker startup in both modes.
+    """
+    log = log or (lambda message: None)
+    stacks = {
+        'full': ({'LELLO_API_ONLY': '0'}, settings.MIDDLEWARE),
+        'api': ({'LELLO_API_ONLY': '1'}, [
+            middleware for middleware in settings.MIDDLEWARE
+            if middleware not in settings.BROWSER_MIDDLEWARE
+        ]),
+    }
+    report = {}
+    for stack, (environ, middleware) in stacks.items():
+        log('{} stack ({} middleware)'.format(stack, len(middleware)))
+        # The test client builds its middleware chain on the first request,
+        # so every stack gets fresh clients.
+        with override_settings(MIDDLEWARE = middleware):
+            ctx = BenchmarkContext()
+            results = []
+            for name in names or CASES:
+                result = run_case(name, ctx, iterations, warmup)
+                if 'error' not in result:
+                    log('  {name:<20} {mean_ms:>9.2f}ms mean {p95_ms:>9.2f}ms p95'.format(**result))
+                results.append(result)
+        report[stack] = {
+            'middleware': len(middleware),
+            'startup': import_profile(environ),
+            'results': results,
+        }
+        log('  {:<20} {:>9.1f}ms'.format('startup', report[stack]['startup']['wall_ms']))
+    return report
+
+
+# Querysets prefetched the way the API reads them.
+SERIALIZERS = [
+    (CardSerializer, Card.objects.prefetch_related('assigned_to')),
+    (ListSerializer, List.objects.prefetch_related('card_set__assigned_to')),
+    (EventSerializer, Event.objects.all()),
+    (ElementSerializer, Element.objects.all()),
+    (NotificationSerializer, Notification.objects.all()),
+    (AuditSerializer, Audit.objects.select_related('user')),
+]
+
+
+def compare_serializers(rows=10000, repeat=3, log=None):
+    """
+    Times serializing up to `rows` rows of each model with the DRF serializer
+    and with the .values() fast path, checking both render the same bytes.
+    """
+    log = log or (lambda message: None)
+    renderer = JSONRenderer()
+    results = []
+    for serializer_class, queryset in SERIALIZERS:
+        queryset = queryset.order_by('pk')[:rows]
+        timings = {}
+        for name, func in (
+            ('drf', lambda: serializer_class(queryset.all(), many = True).data),
+            ('fast', lambda: serialize(serializer_class, queryset.all())),
+        ):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = func()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = (min(samples), renderer.render(data))
+
+        result = {
+            'name': serializer_class.__name__,
+            'rows': queryset.count(),
+            'drf_ms': round(timings['drf'][0], 2),
+            'fast_ms': round(timings['fast'][0], 2),
+            'speedup': round(timings['drf'][0] / max(timings['fast'][0], 0.001), 1),
+            'identical': timings['drf'][1] == timings['fast'][1],
+        }
+        log('{name:<24} {rows:>6} rows {drf_ms:>9.2f}ms drf {fast_ms:>9.2f}ms fast {speedup:>5}x identical={identical}'.format(**result))
+        results.append(result)
+    return results
+
+
+def compare_deletion(rows=1000000, batch_size=None, log=None):
+    """
+    Peak Python memory and time of deleting a generated team of about `rows`
+    rows with the chunked deleter (boards.deletion) and with Django's
+    collector (team.delete()), each on its own copy of the team. Timings are
+    taken under tracemalloc, so they are only comparable with each other.
+    """
+    log = log or (lambda message: None)
+    boards, lists = 10, 20
+    # About 2.5 rows per card: the card, its assignees, checklists and
+    # elements.
+    cards_per_list = max(1, int(rows / (boards * lists * 2.5)))
+    results = []
+    for name in ('chunked', 'collector'):
+        SyntheticDataGenerator(
+            prefix = 'deletion-{}'.format(name),
+            boards_per_team = boards,
+            lists_per_board = lists,
+            cards_per_list = cards_per_list,
+        ).run()
+        team = Team.objects.order_by('-pk').first()
+        total = sum(queryset.count() for queryset in team_subtree(Team.objects.filter(pk = team.pk)))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        if name == 'chunked':
+            run_deletion(schedule(Deletion.Target.team, team), batch_size)
+        else:
+            with transaction.atomic():
+                team.delete()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = {
+            'name': name,
+            'rows': total,
+            'seconds': round(elapsed, 2),
+            'peak_mb': round(peak / 2 ** 20, 1),
+        }
+        log('{name:<10} {rows:>9} rows {seconds:>9.2f}s {peak_mb:>9.1f}MB peak'.format(**result))
+        results.append(result)
+    return results
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Returns the cases that got slower than `threshold` (relative mean latency)
+    or that now run more queries than in `baseline`, plus startup when
+    importing the project got slower by more than `threshold`.
+    """
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    if 'startup' in baseline and 'startup' in current:
+        before, after = baseline['startup']['import_ms'], current['startup']['import_ms']
+        if after > before * (1 + threshold):
+            regressions.append({'name': 'startup', 'mean_ms': [before, after], 'queries': [0, 0]})
+    for result in current['results']:
+        before = previous.get(result['name'])
+        if before is None or 'error' in before:
+            continue
+        if 'error' in result:
+            regressions.append({
+                'name': result['name'],
+                'mean_ms': [before['mean_ms'], None],
+                'queries': [before['queries'], None],
+            })
+            continue
+        slower = result['mean_ms'] > before['mean_ms'] * (1 + threshold)
+        if slower or result['queries'] > before['queries']:
+            regressions.append({
+                'name': result['name'],
+                'mean_ms': [before['mean_ms'], result['mean_ms']],
+                'queries': [before['queries'], result['queries']],
+            })
+    return regressions
+
+
+def over_budget(report, max_ms):
+    """Cases whose p95 latency is above `max_ms`, or that failed."""
+    return [
+        result for result in report['results']
+        if 'error' in result or result['p95_ms'] > max_ms
+    ]
+
+
+def dump(report, path):
+    with open(path, 'w') as output:
+        json.dump(report, output, indent = 2)
+
+
+def load(path):
+    with open(path) as source:
+        return json.load(source)
@@ -0,0 +1,241 @@
+"""
+Chunked deletion of teams, boards, lists and cards with everything under them.
+
+Django's collector loads every related object into memory and deletes the
+whole tree in one transaction, which on a big team means millions of model
+instances and row locks held until the end. Here a subtree is a list of
+querysets ordered leaves first; each one is emptied with raw
+`DELETE ... WHERE id IN (...)` statements of BATCH_SIZE ids, one short
+transaction each, so memory stays at one batch of ids and the work can be
+stopped and resumed at any point. Nothing is cascaded by the database or by
+Django: a table is only reached once the tables pointing at it are empty.
+
+Deleting a team (or a board, with ?permanent=true) through the API only
+records a Deletion; `manage.py run_deletions` works through them in the
+background and keeps their progress up to date. A worker refreshes
+heartbeat_at after every batch; when it dies, the deletion is claimed again
+LOCK_TIMEOUT seconds after its last heartbeat and starts over with what is
+left.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils import timezone
+
+from audits.models import Audit, AuditChain
+from boards.models import Board, List, Card, Label, Deletion
+from calendars.models import Calendar, Event
+from checklists.models import Checklist, Element
+from users.models import Team, Member
+
+
+DEFAULTS = {
+    'BATCH_SIZE': 1000,
+    'PAUSE': 0,
+    'LOCK_TIMEOUT': 600,
+}
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'CASCADE_DELETION', {}))
+
+
+def card_subtree(cards):
+    """Querysets to delete, in order, to delete `cards`."""
+    return [
+        Element.objects.filter(checklist__card__in = cards),
+        Checklist.objects.filter(card__in = cards),
+        Card.assigned_to.through.objects.filter(card__in = cards),
+        cards,
+    ]
+
+
+def list_subtree(lists):
+    return card_subtree(Card.all_objects.filter(lista__in = lists)) + [lists]
+
+
+def board_subtree(boards):
+    return list_subtree(List.all_objects.filter(board__in = boards)) + [
+        Event.objects.filter(calendar__board__in = boards),
+        Calendar.objects.filter(board__in = boards),
+        Label.objects.filter(board__in = boards),
+        Audit.objects.filter(board__in = boards),
+        AuditChain.objects.filter(board__in = boards),
+        boards,
+    ]
+
+
+def team_subtree(teams):
+    return board_subtree(Board.all_objects.filter(team__in = teams)) + [
+        Member.objects.filter(team__in = teams),
+        teams,
+    ]
+
+
+def delete_in_batches(queryset, batch_size, pause=0, progress=None):
+    """
+    Deletes the rows of queryset, batch_size per transaction, without loading
+    them; returns how many. progress(count) is called after every batch.
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = 'DELETE FROM {} WHERE {} IN ({{}})'.format(
+        quote(model._meta.db_table),
+        quote(model._meta.pk.column)
+    )
+    pks = queryset.using(using).order_by().values_list('pk', flat = True)
+    deleted = 0
+    while True:
+        with transaction.atomic(using = using):
+            batch = list(pks[:batch_size])
+            if not batch:
+                break
+            with connection.cursor() as cursor:
+                cursor.execute(sql.format(', '.join(['%s'] * len(batch))), batch)
+        deleted += len(batch)
+        if progress:
+            progress(len(batch))
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def exclude_deleting(queryset, board=''):
+    """
+    queryset without the rows of boards (or teams) waiting for their deletion;
+    `board` is the lookup from its model to the board, '' for boards.
+    """
+    prefix = board + '__' if board else ''
+    return queryset.exclude(
+        **{(board or 'pk') + '__in': Deletion.objects.pending(Deletion.Target.board)}
+    ).exclude(
+        **{prefix + 'team__in': Deletion.objects.pending(Deletion.Target.team)}
+    )
+
+
+# Lookup from each model rows get attached to, to its board.
+BOARD_LOOKUPS = {
+    Board: '',
+    List: 'board',
+    Card: 'lista__board',
+    Checklist: 'card__lista__board',
+    Calendar: 'board',
+}
+
+
+def check_not_deleting(parent):
+    """
+    Raises Http404 when `parent`, the team, board, list, card, checklist or
+    calendar a new row is being attached to, waits for its deletion: a row
+    inserted after the worker went past its table would make the raw deletes
+    of the tables above it fail.
+    """
+    if parent is None:
+        return
+    model = type(parent)
+    if model is Team:
+        deleting = Deletion.objects.pending(Deletion.Target.team).filter(object_id = parent.pk).exists()
+    else:
+        queryset = model._base_manager.filter(pk = parent.pk)
+        deleting = not exclude_deleting(queryset, BOARD_LOOKUPS[model]).exists()
+    if deleting:
+        raise Http404()
+
+
+def schedule(target, instance, user=None):
+    """Records the deletion of a team or board; the API stops showing it right away."""
+    return Deletion.objects.create(
+        target = target,
+        object_id = instance.pk,
+        requested_by = user if user is not None and user.is_authenticated else None
+    )
+
+
+def subtree(deletion):
+    if deletion.target == Deletion.Target.team:
+        return team_subtree(Team.objects.filter(pk = deletion.object_id))
+    return board_subtree(Board.all_objects.filter(pk = deletion.object_id))
+
+
+def run_deletion(deletion, batch_size=None, pause=None, log=None):
+    """Deletes the target of `deletion`, recording its progress on the row."""
+    config = get_config()
+    batch_size = batch_size or config['BATCH_SIZE']
+    pause = config['PAUSE'] if pause is None else pause
+    record = Deletion.objects.filter(pk = deletion.pk)
+
+    querysets = subtree(deletion)
+    record.update(
+        status = Deletion.Status.running,
+        started_at = timezone.now(),
+        heartbeat_at = timezone.now(),
+        total = sum(queryset.count() for queryset in querysets),
+        deleted = 0,
+        error = ''
+    )
+    try:
+        for queryset in querysets:
+            name = queryset.model.__name__
+            record.update(step = name, heartbeat_at = timezone.now())
+            count = delete_in_batches(
+                queryset,
+                batch_size,
+                pause,
+                lambda count: record.update(deleted = F('deleted') + count, heartbeat_at = timezone.now())
+            )
+            if log and count:
+                log('Deleted {} {}'.format(count, name))
+    except Exception as error:
+        record.update(status = Deletion.Status.failed, error = str(error), finished_at = timezone.now())
+        raise
+    record.update(status = Deletion.Status.done, step = '', finished_at = timezone.now())
+    deletion.refresh_from_db()
+    return deletion
+
+
+def claim():
+    """
+    The oldest pending deletion, or a running one whose worker stopped
+    sending heartbeats, marked running so no other worker takes it.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds = get_config()['LOCK_TIMEOUT'])
+    claimable = Deletion.objects.filter(
+        Q(status = Deletion.Status.pending) |
+        Q(status = Deletion.Status.running, heartbeat_at__lt = stale) |
+        Q(status = Deletion.Status.running, heartbeat_at__isnull = True)
+    ).order_by('created_at', 'pk')
+    for pk, status, heartbeat_at in claimable.values_list('pk', 'status', 'heartbeat_at')[:10]:
+        # Only one worker wins: the row must still be as it was read.
+        won = Deletion.objects.filter(pk = pk, status = status, heartbeat_at = heartbeat_at).update(
+            status = Deletion.Status.running,
+            heartbeat_at = now
+        )
+        if won:
+            return Deletion.objects.get(pk = pk)
+    return None
+
+
+def run_pending(batch_size=None, pause=None, log=None):
+    """Runs pending deletions until there are none left; returns them."""
+    finished = []
+    while True:
+        deletion = claim()
+        if deletion is None:
+            return finished
+        if log:
+            log('Deleting {}'.format(deletion))
+        try:
+            finished.append(run_deletion(deletion, batch_size, pause, log))
+        except Exception as error:
+            if log:
+                log('Failed: {}'.format(error))
+            deletion.refresh_from_db()
+            finished.append(deletion)
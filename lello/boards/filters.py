@@ -0,0 +1,24 @@
+from django.db.models import F, Q
+from django_filters import rest_framework as filters
+
+from boards.models import Card, Label
+
+
+class CardFilter(filters.FilterSet):
+    # Ids instead of model choices: no query to validate them.
+    label = filters.NumberFilter(field_name = 'label')
+    assigned_to = filters.NumberFilter(field_name = 'assigned_to')
+    priority = filters.ChoiceFilter(field_name = 'label__priority', choices = Label.Priority.choices)
+    # ?deadline_after=...&deadline_before=...
+    deadline = filters.IsoDateTimeFromToRangeFilter()
+    # Every checklist element done (cards without elements are never done).
+    done = filters.BooleanFilter(method = 'filter_done')
+    ordering = filters.OrderingFilter(fields = ('deadline', 'created_at', 'number', 'title'))
+
+    class Meta:
+        model = Card
+        fields = []
+
+    def filter_done(self, queryset, name, value):
+        done = Q(checklist_total_count__gt = 0, checklist_done_count = F('checklist_total_count'))
+        return queryset.filter(done) if value else queryset.exclude(done)
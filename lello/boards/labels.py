@@ -0,0 +1,35 @@
+"""
+Per-board label catalog.
+
+The catalog is read on every board page and changes rarely, so it's cached
+under a key that includes Board.labels_version: label writes bump the
+version (Label.save() and delete()) and readers simply stop asking for the
+old key, which works the same with one cache per process or a shared one.
+"""
+
+from django.core.cache import cache
+
+from boards.models import Label
+
+
+CACHE_TTL = 60 * 60
+FIELDS = ('id', 'name', 'color', 'priority')
+
+
+def cache_key(board):
+    return 'board-labels:{}:{}'.format(board.pk, board.labels_version)
+
+
+def catalog(board):
+    """Labels of the board as dicts, ordered by name."""
+    key = cache_key(board)
+    labels = cache.get(key)
+    if labels is None:
+        labels = list(Label.objects.filter(board = board).order_by('name', 'pk').values(*FIELDS))
+        cache.set(key, labels, CACHE_TTL)
+    return labels
+
+
+def label_ids(board, priority):
+    """Ids of the board's labels with that priority, from the catalog."""
+    return [label['id'] for label in catalog(board) if label['priority'] == priority]
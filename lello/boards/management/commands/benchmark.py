@@ -0,0 +1,128 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+import benchmarks
+from init_data import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Measures latency, throughput and query counts of the API hot paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cases', nargs='*', help='Cases to run (default: all)')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='JSON report to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative slowdown')
+        parser.add_argument(
+            '--max-p95-ms',
+            type=float,
+            help='Exit with an error when a case has a p95 latency above this many milliseconds',
+        )
+        parser.add_argument(
+            '--stacks',
+            action='store_true',
+            help='Also compare the full middleware stack with the API-only one (LELLO_API_ONLY)',
+        )
+        parser.add_argument(
+            '--serializers',
+            type=int,
+            metavar='ROWS',
+            help='Also time DRF serializers against the .values() fast path on up to ROWS rows per model',
+        )
+        parser.add_argument(
+            '--deletion',
+            type=int,
+            metavar='ROWS',
+            help='Also compare the peak memory of deleting a team of about ROWS rows in chunks and with the collector',
+        )
+        parser.add_argument(
+            '--existing',
+            action='store_true',
+            help='Run against the configured database as-is instead of a throwaway test database',
+        )
+        parser.add_argument('--teams', type=int, default=2)
+        parser.add_argument('--boards-per-team', type=int, default=3)
+        parser.add_argument('--lists-per-board', type=int, default=8)
+        parser.add_argument('--cards-per-list', type=int, default=40)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        unknown = set(options['cases']) - set(benchmarks.CASES)
+        if unknown:
+            raise CommandError('Unknown cases: {}'.format(', '.join(sorted(unknown))))
+
+        dataset = {
+            'teams': options['teams'],
+            'boards_per_team': options['boards_per_team'],
+            'lists_per_board': options['lists_per_board'],
+            'cards_per_list': options['cards_per_list'],
+            'seed': options['seed'],
+        }
+
+        setup_test_environment()
+        if not options['existing']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity = 0, autoclobber = True, serialize = False)
+        try:
+            if options['existing']:
+                dataset = {'existing': True}
+            else:
+                SyntheticDataGenerator(log = self.stdout.write, **dataset).run()
+
+            report = benchmarks.run(
+                names = options['cases'],
+                iterations = options['iterations'],
+                warmup = options['warmup'],
+                dataset = dataset,
+                log = self.stdout.write,
+            )
+            if options['serializers']:
+                report['serializers'] = benchmarks.compare_serializers(
+                    rows = options['serializers'],
+                    log = self.stdout.write,
+                )
+            if options['deletion']:
+                report['deletion'] = benchmarks.compare_deletion(
+                    rows = options['deletion'],
+                    log = self.stdout.write,
+                )
+            if options['stacks']:
+                report['stacks'] = benchmarks.compare_stacks(
+                    names = options['cases'],
+                    iterations = options['iterations'],
+                    warmup = options['warmup'],
+                    log = self.stdout.write,
+                )
+        finally:
+            if not options['existing']:
+                connection.creation.destroy_test_db(old_name, verbosity = 0)
+            teardown_test_environment()
+
+        if options['output']:
+            benchmarks.dump(report, options['output'])
+
+        if options['compare']:
+            regressions = benchmarks.compare(
+                report,
+                benchmarks.load(options['compare']),
+                options['threshold'],
+            )
+            for regression in regressions:
+                self.stderr.write('Regression in {name}: {mean_ms[0]}ms -> {mean_ms[1]}ms, {queries[0]} -> {queries[1]} queries'.format(**regression))
+            if regressions:
+                sys.exit(1)
+
+        if options['max_p95_ms'] is not None:
+            slow = benchmarks.over_budget(report, options['max_p95_ms'])
+            for result in slow:
+                self.stderr.write('Over budget {}: {}'.format(
+                    result['name'],
+                    result.get('error') or '{}ms p95'.format(result['p95_ms']),
+                ))
+            if slow:
+                sys.exit(1)
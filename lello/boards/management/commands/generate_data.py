@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from init_data import SyntheticDataGenerator, create_initial_data
+
+
+class Command(BaseCommand):
+    help = 'Generates synthetic teams, boards, lists, cards and activity for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=1)
+        parser.add_argument('--users-per-team', type=int, default=5)
+        parser.add_argument('--boards-per-team', type=int, default=3)
+        parser.add_argument('--lists-per-board', type=int, default=5, help='Mean lists per board')
+        parser.add_argument('--cards-per-list', type=int, default=20, help='Mean cards per list')
+        parser.add_argument('--checklist-ratio', type=float, default=0.3, help='Share of cards with a checklist')
+        parser.add_argument('--elements-per-checklist', type=int, default=4, help='Mean elements per checklist')
+        parser.add_argument('--events-per-board', type=int, default=10, help='Mean events per board')
+        parser.add_argument('--audits-per-board', type=int, default=50, help='Mean audits per board')
+        parser.add_argument('--notifications-per-user', type=int, default=10, help='Mean notifications per user')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Prefix for generated usernames and team names')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--demo',
+            action='store_true',
+            help='Only create the demo accounts (admin/admin, willi, luca) and their boards',
+        )
+
+    def handle(self, *args, **options):
+        if options['demo']:
+            create_initial_data()
+            self.stdout.write(self.style.SUCCESS('Demo data imported'))
+            return
+
+        generator = SyntheticDataGenerator(
+            teams = options['teams'],
+            users_per_team = options['users_per_team'],
+            boards_per_team = options['boards_per_team'],
+            lists_per_board = options['lists_per_board'],
+            cards_per_list = options['cards_per_list'],
+            checklist_ratio = options['checklist_ratio'],
+            elements_per_checklist = options['elements_per_checklist'],
+            events_per_board = options['events_per_board'],
+            audits_per_board = options['audits_per_board'],
+            notifications_per_user = options['notifications_per_user'],
+            seed = options['seed'],
+            prefix = options['prefix'],
+            batch_size = options['batch_size'],
+            log = self.stdout.write,
+        )
+        totals = generator.run()
+
+        for model, count in sorted(totals.items()):
+            self.stdout.write('{:>12} {}'.format(count, model))
+        self.stdout.write(self.style.SUCCESS('Synthetic data generated'))
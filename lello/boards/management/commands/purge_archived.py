@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from boards.purge import purge_archived
+
+
+class Command(BaseCommand):
+    help = 'Deletes archived boards, lists and cards (and everything under them) in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after-days', type=int, help='Defaults to ARCHIVE_PURGE["AFTER_DAYS"]')
+        parser.add_argument('--batch-size', type=int, help='Rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to wait between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows to delete')
+
+    def handle(self, *args, **options):
+        totals = purge_archived(
+            after_days = options['after_days'],
+            batch_size = options['batch_size'],
+            pause = options['pause'],
+            dry_run = options['dry_run'],
+            log = self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        for name, count in totals.items():
+            self.stdout.write('{:>12} {}'.format(count, name))
+
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS('{} rows {}'.format(sum(totals.values()), verb)))
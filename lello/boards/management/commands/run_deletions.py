@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from boards.deletion import run_pending
+from boards.models import Deletion
+
+
+class Command(BaseCommand):
+    help = 'Deletes the teams and boards waiting for their background deletion, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Rows deleted per transaction')
+        parser.add_argument('--pause', type=float, help='Seconds to wait between batches')
+        parser.add_argument('--interval', type=float, default=0, help='Keep polling for new deletions every INTERVAL seconds')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue the failed deletions again first')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = Deletion.objects.filter(status = Deletion.Status.failed).update(status = Deletion.Status.pending)
+            self.stdout.write('{} failed deletions queued again'.format(retried))
+
+        while True:
+            for deletion in run_pending(
+                batch_size = options['batch_size'],
+                pause = options['pause'],
+                log = self.stdout.write if options['verbosity'] > 1 else None,
+            ):
+                message = '{} {}: {} of {} rows deleted'.format(deletion, deletion.status, deletion.deleted, deletion.total)
+                if deletion.status == Deletion.Status.done:
+                    self.stdout.write(self.style.SUCCESS(message))
+                else:
+                    self.stderr.write('{} ({})'.format(message, deletion.error))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0004_remove_card_checklist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(label__isnull=False), fields=['label'], name='card_label_partial_idx'),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='label',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='boards.label'),
+        ),
+    ]
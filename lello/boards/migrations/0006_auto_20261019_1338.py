@@ -0,0 +1,23 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_auto_20261019_1325'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='checklist_done_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='checklist_total_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def scope_labels(apps, schema_editor):
+    # Each global label goes to the board of its cards; a label used on
+    # several boards is copied for every other board. Unused labels stay
+    # global.
+    alias = schema_editor.connection.alias
+    Label = apps.get_model('boards', 'Label')
+    Card = apps.get_model('boards', 'Card')
+    for label in Label.objects.using(alias).filter(board__isnull = True):
+        cards = Card.objects.using(alias).filter(label = label)
+        board_ids = sorted(set(cards.values_list('lista__board_id', flat = True)))
+        if not board_ids:
+            continue
+        label.board_id = board_ids[0]
+        label.save(update_fields = ['board'])
+        for board_id in board_ids[1:]:
+            copy = Label.objects.using(alias).create(
+                name = label.name,
+                color = label.color,
+                priority = label.priority,
+                board_id = board_id
+            )
+            cards.filter(lista__board_id = board_id).update(label = copy)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0006_auto_20261019_1338'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='labels_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='label',
+            name='board',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='boards.board'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['lista', 'label'], name='card_list_label_idx'),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='lista',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='boards.list'),
+        ),
+        migrations.RunPython(scope_labels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0007_auto_20261019_1342'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['lista', 'deadline'], name='card_list_deadline_idx'),
+        ),
+    ]
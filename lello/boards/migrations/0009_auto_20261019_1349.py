@@ -0,0 +1,71 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_auto_20261019_1346'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='card',
+            name='card_list_deadline_idx',
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='archived_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='is_archived',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='archived_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='is_archived',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='archived_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='is_archived',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='board',
+            index=models.Index(condition=models.Q(is_archived=False), fields=['team'], name='board_team_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='board',
+            index=models.Index(condition=models.Q(is_archived=True), fields=['archived_at'], name='board_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(is_archived=False), fields=['lista', 'deadline'], name='card_list_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(is_archived=True), fields=['archived_at'], name='card_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='list',
+            index=models.Index(condition=models.Q(is_archived=False), fields=['board'], name='list_board_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='list',
+            index=models.Index(condition=models.Q(is_archived=True), fields=['archived_at'], name='list_archived_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.12 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0010_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletion',
+            name='heartbeat_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
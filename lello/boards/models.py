@@ -1,11 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 
 from users.models import Team
+from lello.archive import ArchivableMixin, LiveManager
+from lello.counters import CounterFieldsMixin
 
 
-class Board(models.Model):
+class Board(ArchivableMixin, CounterFieldsMixin, models.Model):
     name =  models.CharField(
         max_length = 50,
         null = False, 
@@ -30,6 +33,21 @@ class Board(models.Model):
         null = False,
         on_delete = models.CASCADE
     )
+    # Bumped on every change to the board's labels: part of the cache key of
+    # the label catalog (boards.labels), so old entries are never read again.
+    labels_version = models.PositiveIntegerField(
+        default = 0,
+        editable = False
+    )
+    # Soft delete (lello.archive): hidden from `objects`, purged later.
+    is_archived = models.BooleanField(
+        default = False,
+        editable = False
+    )
+    archived_at = models.DateTimeField(
+        null = True,
+        editable = False
+    )
     created_at = models.DateTimeField(
         auto_now_add = True
     )
@@ -37,10 +55,28 @@ class Board(models.Model):
         auto_now = True
     )
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    counter_fields = ('labels_version',)
+
+    class Meta:
+        indexes = [
+            # Live boards of a team; the purge reads archived rows by date.
+            models.Index(fields = ['team'], name = 'board_team_live_idx', condition = models.Q(is_archived = False)),
+            models.Index(fields = ['archived_at'], name = 'board_archived_idx', condition = models.Q(is_archived = True)),
+        ]
+
     def __str__(self):
         return self.name
 
-class List(models.Model):
+    def archived_descendants(self):
+        return [
+            List.all_objects.filter(board = self),
+            Card.all_objects.filter(lista__board = self),
+        ]
+
+class List(ArchivableMixin, models.Model):
     name = models.CharField(
         max_length = 20,
         null = False,
@@ -61,6 +97,15 @@ class List(models.Model):
         max_digits = 4,
         default = 0,
     )
+    # Soft delete (lello.archive): hidden from `objects`, purged later.
+    is_archived = models.BooleanField(
+        default = False,
+        editable = False
+    )
+    archived_at = models.DateTimeField(
+        null = True,
+        editable = False
+    )
     created_at = models.DateTimeField(
         auto_now_add = True
     )
@@ -68,10 +113,22 @@ class List(models.Model):
         auto_now = True
     )
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields = ['board'], name = 'list_board_live_idx', condition = models.Q(is_archived = False)),
+            models.Index(fields = ['archived_at'], name = 'list_archived_idx', condition = models.Q(is_archived = True)),
+        ]
+
     def __str__(self):
         return self.name
 
-class Card(models.Model):
+    def archived_descendants(self):
+        return [Card.all_objects.filter(lista = self)]
+
+class Card(ArchivableMixin, CounterFieldsMixin, models.Model):
     title = models.CharField(
         max_length = 75,
         null = False,
@@ -81,6 +138,7 @@ class Card(models.Model):
         List,
         null = False,
         on_delete = models.CASCADE,
+        db_index = False
     )
     number = models.IntegerField(null=True)
     description = models.CharField(
@@ -103,9 +161,29 @@ class Card(models.Model):
     label = models.ForeignKey(
         'boards.Label',
         null = True,
-        on_delete = models.SET_NULL
+        on_delete = models.SET_NULL,
+        db_index = False
     )
     assigned_to = models.ManyToManyField( User, blank = True )
+    # Sums of the counters of the card's checklists (see checklists.models),
+    # so cards show progress without reading checklists or elements.
+    checklist_done_count = models.PositiveIntegerField(
+        default = 0,
+        editable = False
+    )
+    checklist_total_count = models.PositiveIntegerField(
+        default = 0,
+        editable = False
+    )
+    # Soft delete (lello.archive): hidden from `objects`, purged later.
+    is_archived = models.BooleanField(
+        default = False,
+        editable = False
+    )
+    archived_at = models.DateTimeField(
+        null = True,
+        editable = False
+    )
     created_at = models.DateTimeField(
         auto_now_add = True
     )
@@ -113,6 +191,33 @@ class Card(models.Model):
         auto_now = True
     )
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    counter_fields = ('checklist_done_count', 'checklist_total_count')
+
+    class Meta:
+        indexes = [
+            # Most cards have no label: only index the ones that do (used when
+            # a label is deleted and its cards are set to null).
+            models.Index(
+                fields = ['label'],
+                name = 'card_label_partial_idx',
+                condition = models.Q(label__isnull = False)
+            ),
+            # Cards of a list, and of a list with a label (board filtering);
+            # also serves the lista foreign key.
+            models.Index(fields = ['lista', 'label'], name = 'card_list_label_idx'),
+            # Deadline ranges and ordering within a list (boards.filters),
+            # live cards only.
+            models.Index(
+                fields = ['lista', 'deadline'],
+                name = 'card_list_deadline_idx',
+                condition = models.Q(is_archived = False)
+            ),
+            models.Index(fields = ['archived_at'], name = 'card_archived_idx', condition = models.Q(is_archived = True)),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -137,6 +242,118 @@ class Label(models.Model):
         editable = True,
         default = 'L',
     )
+    # Board whose catalog the label belongs to; null for the global labels
+    # created before labels were scoped.
+    board = models.ForeignKey(
+        Board,
+        null = True,
+        on_delete = models.CASCADE
+    )
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint = False):
+            previous = None
+            if not self._state.adding:
+                previous = Label.objects.filter(pk = self.pk).values_list('board_id', flat = True).first()
+            super().save(*args, **kwargs)
+            bump_labels_version([self.board_id, previous])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint = False):
+            result = super().delete(*args, **kwargs)
+            bump_labels_version([self.board_id])
+        return result
+
+
+def bump_labels_version(board_ids):
+    board_ids = set(board_ids) - {None}
+    if board_ids:
+        Board.all_objects.filter(pk__in = board_ids).update(labels_version = F('labels_version') + 1)
+
+
+class DeletionQuerySet(models.QuerySet):
+
+    def pending(self, target):
+        """Ids of the `target` rows waiting for (or in) their deletion."""
+        return self.filter(
+            target = target,
+            status__in = [Deletion.Status.pending, Deletion.Status.running]
+        ).values('object_id')
+
+
+class Deletion(models.Model):
+    """
+    Background deletion of a team or a board with everything under it
+    (boards.deletion). The target is kept as plain ids: the row outlives it.
+    """
+
+    class Target(models.TextChoices):
+        team    = 'team', _('Team')
+        board   = 'board', _('Board')
+
+    class Status(models.TextChoices):
+        pending = 'pending', _('Pending')
+        running = 'running', _('Running')
+        done    = 'done', _('Done')
+        failed  = 'failed', _('Failed')
+
+    target = models.CharField(
+        choices = Target.choices,
+        max_length = 10
+    )
+    object_id = models.PositiveIntegerField()
+    status = models.CharField(
+        choices = Status.choices,
+        max_length = 10,
+        default = Status.pending
+    )
+    requested_by = models.ForeignKey(
+        User,
+        null = True,
+        on_delete = models.SET_NULL,
+        db_index = False
+    )
+    # Progress: rows to delete (counted when the job starts), rows deleted
+    # so far and the model being deleted.
+    total = models.BigIntegerField(
+        null = True
+    )
+    deleted = models.BigIntegerField(
+        default = 0
+    )
+    step = models.CharField(
+        max_length = 50,
+        blank = True
+    )
+    error = models.TextField(
+        blank = True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add = True
+    )
+    started_at = models.DateTimeField(
+        null = True
+    )
+    finished_at = models.DateTimeField(
+        null = True
+    )
+    # Refreshed by the worker after every batch; a running deletion without
+    # news for LOCK_TIMEOUT seconds belongs to a dead worker and is taken over.
+    heartbeat_at = models.DateTimeField(
+        null = True
+    )
+
+    objects = DeletionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Hiding targets that are being deleted, and the worker's queue.
+            models.Index(fields = ['target', 'object_id'], name = 'deletion_target_idx'),
+            models.Index(fields = ['status', 'created_at'], name = 'deletion_status_idx'),
+        ]
+
+    def __str__(self):
+        return '{} {}'.format(self.target, self.object_id)
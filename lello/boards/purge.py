@@ -0,0 +1,56 @@
+"""
+Hard delete of archived boards, lists and cards (lello.archive).
+
+Each archived subtree is deleted leaves first with the chunked deleter of
+boards.deletion, BATCH_SIZE rows per short transaction, so no statement
+holds more than a batch of row locks and the command can be stopped and
+resumed at any point.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from boards.deletion import board_subtree, card_subtree, delete_in_batches, list_subtree
+from boards.models import Board, List, Card
+
+
+DEFAULTS = {
+    'AFTER_DAYS': 30,
+    'BATCH_SIZE': 500,
+}
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'ARCHIVE_PURGE', {}))
+
+
+def purge_archived(after_days=None, batch_size=None, pause=0, dry_run=False, now=None, log=None):
+    """
+    Deletes what was archived more than `after_days` ago, with everything
+    under it. Returns {model name: rows deleted (or to delete, dry_run)}.
+    """
+    config = get_config()
+    after_days = config['AFTER_DAYS'] if after_days is None else after_days
+    batch_size = batch_size or config['BATCH_SIZE']
+    cutoff = (now or timezone.now()) - timedelta(days = after_days)
+    archived = lambda model: model.all_objects.filter(is_archived = True, archived_at__lt = cutoff)
+
+    totals = {}
+    # Rows under an archived parent go with the parent's subtree.
+    for querysets in (
+        card_subtree(archived(Card).exclude(lista__is_archived = True)),
+        list_subtree(archived(List).exclude(board__is_archived = True)),
+        board_subtree(archived(Board)),
+    ):
+        for queryset in querysets:
+            name = queryset.model.__name__
+            if dry_run:
+                count = queryset.count()
+            else:
+                count = delete_in_batches(queryset, batch_size, pause)
+                if log and count:
+                    log('Deleted {} {}'.format(count, name))
+            totals[name] = totals.get(name, 0) + count
+    return totals
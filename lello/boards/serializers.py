@@ -1,15 +1,20 @@
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
-from boards.models import Board, List, Card, Label
+from lello.serializers import DynamicFieldsModelSerializer
+from boards.models import Board, List, Card, Label, Deletion
 from users.serializers import TeamSerializer, UserSerializer
 from checklists.serializers import ChecklistSerializer
 from calendars.models import Calendar
+from calendars.serializers import CalendarSerializer
 
 
-class BoardSerializer(serializers.ModelSerializer):
-    # team = TeamSerializer()
-    # owner = UserSerializer(read_only = True)
-    # calendar = CalendarSerializer()
+class BoardSerializer(DynamicFieldsModelSerializer):
+    expandable_fields = {
+        'team': (TeamSerializer, {}),
+        'owner': (UserSerializer, {}),
+        'calendar': (CalendarSerializer, {}),
+    }
 
     class Meta:
         model = Board
@@ -23,22 +28,53 @@ class BoardSerializer(serializers.ModelSerializer):
         )
         return board
 
-class LabelSerializer(serializers.ModelSerializer):
+class LabelSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Label
         fields = '__all__'
+        # New labels always belong to a board.
+        extra_kwargs = {'board': {'required': True, 'allow_null': False}}
 
-class CardSerializer(serializers.ModelSerializer):
-    # checklist = ChecklistSerializer(read_only=True)
-    # label = LabelSerializer(read_only=True)
-    # assigned_to = UserSerializer(many=True, read_only=True)
+class CardSerializer(DynamicFieldsModelSerializer):
+    expandable_fields = {
+        'checklists': (ChecklistSerializer, {'many': True}),
+        'label': (LabelSerializer, {}),
+        'assigned_to': (UserSerializer, {'many': True}),
+    }
 
     class Meta:
         model = Card
         fields = '__all__'
 
-class ListSerializer(serializers.ModelSerializer):
+    def validate(self, data):
+        if 'label' not in data and 'lista' not in data:
+            return data
+        if 'label' in data:
+            label = data['label']
+        else:
+            label = self.instance.label if self.instance is not None and self.instance.label_id else None
+        lista = data['lista'] if 'lista' in data else self.instance.lista
+        # Labels of another board can't be used; global ones still can.
+        if label is not None and label.board_id is not None and label.board_id != lista.board_id:
+            raise serializers.ValidationError({'label': ['Label of another board.']})
+        return data
+
+class ListSerializer(DynamicFieldsModelSerializer):
     card_set = CardSerializer(many=True, read_only=True)
+    # to_representation below doesn't change the output (lello/fast_serializers.py)
+    plain_representation = True
+
     class Meta:
         model = List
         fields = '__all__'
+
+    def to_representation(self, instance):
+        # No-op when the viewset already prefetched; covers instances that
+        # DRF hands back without the cache (e.g. after an update).
+        prefetch_related_objects([instance], 'card_set__assigned_to')
+        return super().to_representation(instance)
+
+class DeletionSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = Deletion
+        fields = '__all__'
@@ -0,0 +1,165 @@
+from django.db import transaction
+
+from boards.models import Board, List, Card, Label
+from calendars.models import Calendar
+from checklists.models import Checklist, Element
+
+
+BULK_BATCH_SIZE = 1000
+
+
+def bulk_create_with_ids(model, objs, queryset, batch_size=BULK_BATCH_SIZE):
+    # Postgres returns the new ids from the INSERT. Backends that can't (SQLite)
+    # leave them empty, so we read them back in insertion order: `queryset`
+    # must match exactly the rows just inserted, so ids line up 1:1.
+    objs = model.objects.bulk_create(objs, batch_size = batch_size)
+    if objs and objs[0].pk is None:
+        ids = queryset.order_by('pk').values_list('pk', flat = True)
+        for obj, pk in zip(objs, ids):
+            obj.pk = pk
+    return objs
+
+
+@transaction.atomic
+def duplicate_board(board, owner, name=None):
+    new_board = Board.objects.create(
+        name = name or board.name,
+        descriptiom = board.descriptiom,
+        owner = owner,
+        is_private = board.is_private,
+        team = board.team,
+    )
+    Calendar.objects.create(
+        board = new_board
+    )
+
+    # Source rows are read with .values() so we never pay for building (and
+    # parsing the timestamps of) model instances we are only going to copy.
+    lists = list(
+        List.objects.filter(board = board).order_by('pk').values(
+            'id', 'name', 'hours_estimated', 'hours_done'
+        )
+    )
+    new_lists = bulk_create_with_ids(
+        List,
+        [
+            List(
+                name = lista['name'],
+                board = new_board,
+                hours_estimated = lista['hours_estimated'],
+                hours_done = lista['hours_done'],
+            )
+            for lista in lists
+        ],
+        List.objects.filter(board = new_board),
+    )
+    list_ids = {old['id']: new.pk for old, new in zip(lists, new_lists)}
+
+    # The board's labels are copied; global ones are shared.
+    labels = list(
+        Label.objects.filter(board = board).order_by('pk').values('id', 'name', 'color', 'priority')
+    )
+    new_labels = bulk_create_with_ids(
+        Label,
+        [
+            Label(
+                name = label['name'],
+                color = label['color'],
+                priority = label['priority'],
+                board = new_board,
+            )
+            for label in labels
+        ],
+        Label.objects.filter(board = new_board),
+    )
+    label_ids = {old['id']: new.pk for old, new in zip(labels, new_labels)}
+
+    # Archived lists and cards (lello.archive) aren't copied, nor is anything
+    # under them.
+    cards = list(
+        Card.objects.filter(lista__board = board, lista__is_archived = False).order_by('pk').values(
+            'id', 'title', 'lista_id', 'number', 'description',
+            'hours_estimated', 'hours_done', 'deadline', 'label_id',
+            'checklist_done_count', 'checklist_total_count'
+        )
+    )
+    new_cards = bulk_create_with_ids(
+        Card,
+        [
+            Card(
+                title = card['title'],
+                lista_id = list_ids[card['lista_id']],
+                number = card['number'],
+                description = card['description'],
+                hours_estimated = card['hours_estimated'],
+                hours_done = card['hours_done'],
+                deadline = card['deadline'],
+                label_id = label_ids.get(card['label_id'], card['label_id']),
+                checklist_done_count = card['checklist_done_count'],
+                checklist_total_count = card['checklist_total_count'],
+            )
+            for card in cards
+        ],
+        Card.objects.filter(lista__board = new_board),
+    )
+    card_ids = {old['id']: new.pk for old, new in zip(cards, new_cards)}
+
+    Assignment = Card.assigned_to.through
+    Assignment.objects.bulk_create(
+        [
+            Assignment(card_id = card_ids[card_id], user_id = user_id)
+            for card_id, user_id in Assignment.objects.filter(
+                card__lista__board = board,
+                card__is_archived = False,
+                card__lista__is_archived = False
+            ).values_list('card_id', 'user_id')
+        ],
+        batch_size = BULK_BATCH_SIZE,
+    )
+
+    checklists = list(
+        Checklist.objects.filter(
+            card__lista__board = board,
+            card__is_archived = False,
+            card__lista__is_archived = False
+        ).order_by('pk').values(
+            'id', 'name', 'card_id', 'rank', 'done_count', 'total_count'
+        )
+    )
+    new_checklists = bulk_create_with_ids(
+        Checklist,
+        [
+            Checklist(
+                name = checklist['name'],
+                card_id = card_ids[checklist['card_id']],
+                rank = checklist['rank'],
+                # The elements below are bulk created: copy the counters.
+                done_count = checklist['done_count'],
+                total_count = checklist['total_count'],
+            )
+            for checklist in checklists
+        ],
+        Checklist.objects.filter(card__lista__board = new_board),
+    )
+    checklist_ids = {old['id']: new.pk for old, new in zip(checklists, new_checklists)}
+
+    Element.objects.bulk_create(
+        [
+            Element(
+                title = element['title'],
+                checklist_id = checklist_ids[element['checklist_id']],
+                is_done = element['is_done'],
+                rank = element['rank'],
+                assigned_to_id = element['assigned_to_id'],
+                deadline = element['deadline'],
+            )
+            for element in Element.objects.filter(
+                checklist__card__lista__board = board,
+                checklist__card__is_archived = False,
+                checklist__card__lista__is_archived = False
+            ).values('title', 'checklist_id', 'is_done', 'rank', 'assigned_to_id', 'deadline')
+        ],
+        batch_size = BULK_BATCH_SIZE,
+    )
+
+    return new_board
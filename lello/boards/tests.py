@@ -1,3 +1,840 @@
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.conf import settings
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from guardian.shortcuts import assign_perm
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from lello.fast_serializers import get_plan, serialize
+from lello.serializers import DynamicFieldsModelSerializer
+from lello.urls import router
+from users.models import UserDetail, Team, Member
+from boards.filters import CardFilter
+from boards.labels import catalog
+from boards.purge import purge_archived
+from boards.deletion import board_subtree, card_subtree, claim, delete_in_batches, list_subtree, run_pending, team_subtree
+from boards.models import Board, List, Card, Label, Deletion
+from boards.serializers import ListSerializer, CardSerializer
+from calendars.filters import EventFilter
+from calendars.models import Calendar, Event
+from calendars.serializers import EventSerializer
+from checklists.models import Checklist, Element
+from checklists.ranking import RANK_GAP
+from checklists.serializers import ChecklistElementsSerializer, ElementSerializer
+from notifications.filters import NotificationFilter
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer
+from audits.filters import AuditFilter
+from audits.models import Audit
+from audits.serializers import AuditSerializer
+
+
+SMALL = 2
+LARGE = 6
+
+# Queries allowed per (route name, HTTP method). Every route registered on the
+# router must be listed here; the count has to be the same for both dataset
+# sizes, so a serializer or loop that queries per row fails the test even if it
+# stays under its budget.
+QUERY_BUDGETS = {
+    ('user-list', 'get'): 1,
+    ('user-list', 'post'): 5,
+    ('user-detail', 'get'): 1,
+    ('user-detail', 'put'): 3,
+    ('user-detail', 'patch'): 3,
+    ('user-detail', 'delete'): 36,
+    ('user-notifications', 'get'): 2,
+    ('userdetail-list', 'get'): 0,
+    ('userdetail-list', 'post'): 2,
+    ('userdetail-detail', 'get'): 1,
+    ('userdetail-detail', 'put'): 3,
+    ('userdetail-detail', 'patch'): 3,
+    ('userdetail-detail', 'delete'): 2,
+    ('team-list', 'get'): 2,
+    ('team-list', 'post'): 12,
+    ('team-detail', 'get'): 2,
+    ('team-detail', 'put'): 4,
+    ('team-detail', 'patch'): 4,
+    ('team-detail', 'delete'): 10,
+    ('team-boards', 'get'): 3,
+    ('team-members', 'get'): 2,
+    ('board-list', 'get'): 0,
+    ('board-list', 'post'): 15,
+    ('board-detail', 'get'): 1,
+    ('board-detail', 'put'): 4,
+    ('board-detail', 'patch'): 4,
+    ('board-detail', 'delete'): 11,
+    ('board-audits', 'get'): 2,
+    ('board-calendar-events', 'get'): 3,
+    ('board-duplicate', 'post'): 35,
+    ('board-labels', 'get'): 2,
+    ('board-cards', 'get'): 3,
+    ('board-lists', 'get'): 4,
+    ('board-restore', 'post'): 11,
+    ('list-list', 'get'): 0,
+    ('list-list', 'post'): 6,
+    ('list-detail', 'get'): 4,
+    ('list-detail', 'put'): 9,
+    ('list-detail', 'patch'): 9,
+    ('list-detail', 'delete'): 9,
+    ('list-cards', 'get'): 6,
+    ('list-restore', 'post'): 9,
+    ('card-list', 'get'): 0,
+    ('card-list', 'post'): 9,
+    ('card-detail', 'get'): 2,
+    ('card-detail', 'put'): 5,
+    ('card-detail', 'patch'): 5,
+    ('card-detail', 'delete'): 5,
+    ('card-checklists', 'get'): 3,
+    ('card-restore', 'post'): 7,
+    ('deletion-list', 'get'): 1,
+    ('deletion-detail', 'get'): 1,
+    ('label-list', 'get'): 0,
+    ('label-list', 'post'): 7,
+    ('label-detail', 'get'): 1,
+    ('label-detail', 'put'): 5,
+    ('label-detail', 'patch'): 5,
+    ('label-detail', 'delete'): 8,
+    ('checklist-list', 'get'): 1,
+    ('checklist-list', 'post'): 7,
+    ('checklist-detail', 'get'): 1,
+    ('checklist-detail', 'put'): 6,
+    ('checklist-detail', 'patch'): 6,
+    ('checklist-detail', 'delete'): 8,
+    ('checklist-toggle', 'post'): 8,
+    ('checklist-elements', 'get'): 2,
+    ('checklist-move', 'post'): 7,
+    ('element-list', 'get'): 1,
+    ('element-list', 'post'): 9,
+    ('element-detail', 'get'): 1,
+    ('element-detail', 'put'): 4,
+    ('element-detail', 'patch'): 4,
+    ('element-detail', 'delete'): 8,
+    ('element-move', 'post'): 8,
+    ('calendar-list', 'get'): 0,
+    ('calendar-list', 'post'): 0,
+    ('calendar-detail', 'get'): 1,
+    ('calendar-detail', 'put'): 0,
+    ('calendar-detail', 'patch'): 0,
+    ('calendar-detail', 'delete'): 0,
+    ('calendar-events', 'get'): 2,
+    ('event-list', 'get'): 1,
+    ('event-list', 'post'): 6,
+    ('event-detail', 'get'): 1,
+    ('event-detail', 'put'): 0,
+    ('event-detail', 'patch'): 0,
+    ('event-detail', 'delete'): 0,
+    ('notification-list', 'get'): 1,
+    ('notification-list', 'post'): 6,
+    ('notification-detail', 'get'): 1,
+    ('notification-detail', 'put'): 0,
+    ('notification-detail', 'patch'): 0,
+    ('notification-detail', 'delete'): 5,
+    ('audit-list', 'get'): 1,
+    ('audit-list', 'post'): 0,
+    ('audit-detail', 'get'): 1,
+    ('audit-detail', 'put'): 0,
+    ('audit-detail', 'patch'): 0,
+    ('audit-detail', 'delete'): 0,
+}
+
+# Routes that need their target in some state first.
+PREPARE = {
+    'board-restore': lambda fixture: fixture['board'].archive(),
+    'list-restore': lambda fixture: fixture['lista'].archive(),
+    'card-restore': lambda fixture: fixture['card'].archive(),
+}
+
+# Object each basename's detail routes act on.
+TARGETS = {
+    'user': 'user',
+    'userdetail': 'detail',
+    'team': 'team',
+    'board': 'board',
+    'list': 'lista',
+    'card': 'card',
+    'label': 'label',
+    'deletion': 'deletion',
+    'checklist': 'checklist',
+    'element': 'element',
+    'calendar': 'calendar',
+    'event': 'event',
+    'notification': 'notification',
+    'audit': 'audit',
+}
+
+
+def build_fixture(size):
+    """
+    A team with one board where every collection the API can return (members,
+    lists, cards per list, assignees, checklist elements, events, audits,
+    notifications) has `size` rows.
+    """
+    User.objects.bulk_create([
+        User(username = 'user{}'.format(index), email = 'user{}@lello.test'.format(index))
+        for index in range(size)
+    ])
+    users = list(User.objects.filter(username__startswith = 'user').order_by('pk'))
+    user = users[0]
+    detail = UserDetail.objects.create(user = user, gender = 'M')
+    Team.objects.bulk_create([Team(name = 'Team {}'.format(index)) for index in range(size)])
+    teams = list(Team.objects.all())
+    team = teams[0]
+    Member.objects.bulk_create([
+        Member(team = member_team, user = member) for member_team in teams for member in users
+    ])
+    assign_perm('users.delete_team', user, team)
+
+    board = Board.objects.create(name = 'Board', owner = user, team = team)
+    assign_perm('boards.delete_board', user, board)
+    Board.objects.bulk_create([
+        Board(name = 'Board {}'.format(index), owner = user, team = team)
+        for index in range(size - 1)
+    ])
+    calendar = Calendar.objects.create(board = board)
+
+    Label.objects.bulk_create([
+        Label(name = 'Label {}'.format(index), board = board, priority = 'HML'[index % 3])
+        for index in range(size)
+    ])
+    labels = list(Label.objects.all())
+    List.objects.bulk_create([
+        List(name = 'Lista {}'.format(index), board = board) for index in range(size)
+    ])
+    lists = list(board.list_set.all())
+    Card.objects.bulk_create([
+        Card(title = 'Card {}'.format(index), lista = lista, label = labels[index])
+        for lista in lists
+        for index in range(size)
+    ])
+    cards = list(Card.objects.filter(lista__board = board))
+    Assignment = Card.assigned_to.through
+    Assignment.objects.bulk_create([
+        Assignment(card = card, user = member) for card in cards for member in users
+    ])
+
+    card = cards[0]
+    Checklist.objects.bulk_create(
+        [Checklist(card = checklist_card, rank = RANK_GAP) for checklist_card in cards[1:size]] +
+        [Checklist(card = card, rank = (index + 1) * RANK_GAP) for index in range(size)]
+    )
+    checklists = list(Checklist.objects.all())
+    checklist = card.checklists.first()
+    Element.objects.bulk_create([
+        Element(
+            title = 'Tarea {}'.format(index), checklist = element_checklist,
+            rank = (index + 1) * RANK_GAP, assigned_to = user
+        )
+        for element_checklist in checklists
+        for index in range(size)
+    ])
+    Checklist.objects.recount()
+
+    Event.objects.bulk_create([
+        Event(calendar = calendar, title = 'Evento {}'.format(index), date = timezone.now() + timedelta(days = index))
+        for index in range(size)
+    ])
+    Audit.objects.bulk_create(
+        [Audit(url = '/boards/{}/'.format(board.id), user = user, board = board) for _ in range(size)] +
+        [Audit(url = '/lists/{}/'.format(lista.id), user = user) for lista in lists] +
+        [Audit(url = '/cards/{}/'.format(card.id), user = user) for card in cards]
+    )
+    Notification.objects.bulk_create([
+        Notification(title = 'Notificacion', transmitter = member, receiver = user)
+        for member in users
+    ])
+    # Finished: hides nothing.
+    deletion = Deletion.objects.create(
+        target = Deletion.Target.team, object_id = teams[-1].pk, requested_by = user, status = Deletion.Status.done
+    )
+
+    return {
+        'user': user,
+        'other': users[-1],
+        'detail': detail,
+        'team': team,
+        'board': board,
+        'calendar': calendar,
+        'lista': lists[0],
+        'card': card,
+        'spare_card': cards[-1],
+        'label': labels[0],
+        'checklist': checklist,
+        'element': checklist.element_set.first(),
+        'event': calendar.event_set.first(),
+        'notification': Notification.objects.filter(receiver = user).first(),
+        'audit': Audit.objects.first(),
+        'deletion': deletion,
+    }
+
+
+def payload(name, basename, fixture):
+    now = timezone.now().isoformat()
+    # Actions that don't take the model's fields.
+    actions = {
+        'checklist-toggle': lambda: {
+            'elements': list(fixture['checklist'].element_set.values_list('pk', flat = True)),
+            'is_done': True,
+        },
+        'checklist-move': lambda: {'after': None},
+        'element-move': lambda: {'after': fixture['checklist'].element_set.last().id},
+    }
+    if name in actions:
+        return actions[name]()
+    return {
+        'user': {'username': 'nuevo', 'email': 'nuevo@lello.test', 'password': 'admin'},
+        'userdetail': {'user': fixture['user'].id, 'gender': 'F'},
+        'team': {'name': 'Nuevo team'},
+        'board': {'name': 'Nuevo board', 'owner': fixture['user'].id, 'team': fixture['team'].id},
+        'list': {'name': 'Nueva lista', 'board': fixture['board'].id},
+        'card': {'title': 'Nueva card', 'lista': fixture['lista'].id},
+        'label': {'name': 'Nuevo label', 'board': fixture['board'].id},
+        'checklist': {'name': 'Nueva checklist', 'card': fixture['spare_card'].id},
+        'element': {'title': 'Nueva tarea', 'checklist': fixture['checklist'].id},
+        'calendar': {'board': fixture['board'].id},
+        'event': {'calendar': fixture['calendar'].id, 'title': 'Nuevo evento', 'date': now},
+        'notification': {
+            'title': 'Nueva notificacion',
+            'transmitter': fixture['other'].id,
+            'receiver': fixture['user'].id,
+        },
+        'audit': {'url': '/boards/', 'user': fixture['user'].id},
+    }[basename]
+
+
+def routes():
+    """
+    Yields (route name, HTTP method, basename, is detail route) for every
+    action registered on the API router.
+    """
+    for pattern in router.urls:
+        if 'format' in pattern.pattern.regex.groupindex:
+            continue
+        basename = pattern.name.split('-')[0]
+        detail = 'pk' in pattern.pattern.regex.groupindex
+        for method in getattr(pattern.callback, 'actions', ()):
+            yield pattern.name, method, basename, detail
+
+
+def expandable_fields():
+    """Every relation some serializer can expand with ?expand=."""
+    names = set()
+    pending = [DynamicFieldsModelSerializer]
+    while pending:
+        serializer = pending.pop()
+        names.update(serializer.expandable_fields)
+        pending.extend(serializer.__subclasses__())
+    return sorted(names)
+
+
+# Side effects queued as jobs, like in production.
+@override_settings(JOBS = dict(settings.JOBS, EAGER = False))
+class QueryBudgetTest(TestCase):
+    databases = '__all__'
+
+    def measure(self, name, method, basename, detail, size, query=''):
+        # Cached reads keyed by ids would survive the rollback below.
+        cache.clear()
+        with transaction.atomic():
+            fixture = build_fixture(size)
+            client = APIClient()
+            client.force_authenticate(fixture['user'])
+
+            if name in PREPARE:
+                PREPARE[name](fixture)
+            kwargs = {'pk': fixture[TARGETS[basename]].pk} if detail else {}
+            url = reverse(name, kwargs = kwargs) + query
+            data = payload(name, basename, fixture) if method in ('post', 'put', 'patch') else None
+
+            # Count queries on every alias so reads routed to a replica
+            # still show up.
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connections[alias]))
+                    for alias in connections
+                ]
+                response = getattr(client, method)(url, data, format = 'json')
+
+            # 403 is fine (actions disabled in the permission configuration),
+            # 400/404 mean the fixture or payload is broken and nothing real
+            # was measured.
+            self.assertNotIn(response.status_code, (400, 404), response.content)
+            self.assertLess(response.status_code, 500, response.content)
+            transaction.set_rollback(True)
+
+        return sum(len(queries.captured_queries) for queries in captured)
+
+    def test_every_route_has_constant_queries(self):
+        for name, method, basename, detail in routes():
+            with self.subTest(route = name, method = method):
+                small = self.measure(name, method, basename, detail, SMALL)
+                large = self.measure(name, method, basename, detail, LARGE)
+
+                self.assertIn((name, method), QUERY_BUDGETS, 'No query budget recorded')
+                self.assertEqual(small, large, 'Query count grows with data size')
+                self.assertLessEqual(large, QUERY_BUDGETS[(name, method)])
+
+    def test_expanded_routes_have_constant_queries(self):
+        # Each route expands the relations its serializer knows and ignores
+        # the rest.
+        query = '?expand={}'.format(','.join(expandable_fields()))
+        for name, method, basename, detail in routes():
+            if method != 'get':
+                continue
+            with self.subTest(route = name, expand = True):
+                small = self.measure(name, method, basename, detail, SMALL, query)
+                large = self.measure(name, method, basename, detail, LARGE, query)
+
+                self.assertEqual(small, large, 'Query count grows with data size')
+
+
+def explain(queryset):
+    """
+    Query plan of queryset as text. On Postgres sequential scans are turned
+    off while planning, so the tiny test tables still show which index the
+    planner is able to use.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    try:
+        return queryset.explain()
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = on')
+
+
+@skipUnless(connections['default'].vendor in ('postgresql', 'sqlite'), 'EXPLAIN output not supported')
+class IndexUsageTest(TestCase):
+
+    def assertUsesIndex(self, queryset, name):
+        plan = explain(queryset)
+        self.assertIn(name, plan, plan)
+
+    def test_hot_queries_use_indexes(self):
+        fixture = build_fixture(SMALL)
+        user, board, team = fixture['user'], fixture['board'], fixture['team']
+        # (index, query as the views and authentication run it); FK columns
+        # without a Meta index keep Django's <table>_<column> one.
+        cases = [
+            ('list_board_live_idx', board.list_set.all()),
+            # Either (lista, ...) index serves the cards of a list.
+            ('card_list_', fixture['lista'].card_set.all()),
+            ('card_label_partial_idx', Card.objects.filter(label = fixture['label'])),
+            ('card_list_label_idx', fixture['lista'].card_set.filter(label = fixture['label'])),
+            ('notification_receiver_idx', Notification.objects.filter(receiver = user)),
+            ('audit_url_idx', Audit.objects.filter(url = '/boards/{}/'.format(board.id))),
+            ('audit_url_idx', Audit.objects.filter(url__in = ['/lists/1/', '/cards/1/'])),
+            ('event_calendar_date_idx', fixture['calendar'].event_set.all()),
+            ('checklist_card_rank_idx', fixture['card'].checklists.all()),
+            ('element_checklist_rank_idx', fixture['checklist'].element_set.all()),
+            ('member_team_user_idx', Member.objects.filter(team = team)),
+            ('member_user_team_idx', Member.objects.filter(user__in = [user])),
+        ]
+        for name, queryset in cases:
+            with self.subTest(index = name, query = str(queryset.query)):
+                self.assertUsesIndex(queryset, name)
+
+    def test_filters_use_indexes(self):
+        fixture = build_fixture(SMALL)
+        user, board = fixture['user'], fixture['board']
+        since = (timezone.now() - timedelta(days = 7)).isoformat()
+        cards = fixture['lista'].card_set.all()
+        # (index, filter set, query parameters, queryset as the action builds it)
+        cases = [
+            ('card_list_label_idx', CardFilter, {'label': fixture['label'].id}, cards),
+            ('card_list_deadline_idx', CardFilter, {'deadline_after': since, 'ordering': 'deadline'}, cards),
+            ('boards_card_assigned_to_user_id', CardFilter, {'assigned_to': user.id}, Card.objects.all()),
+            ('event_calendar_date_idx', EventFilter, {'date_after': since}, fixture['calendar'].event_set.all()),
+            ('notification_receiver_idx', NotificationFilter, {'receiver': user.id, 'created_at_after': since}, Notification.objects.all()),
+            ('audit_board_idx', AuditFilter, {'board': board.id, 'created_at_after': since}, Audit.objects.all()),
+            ('audit_method_created_idx', AuditFilter, {'httpMethod': 'GET', 'created_at_after': since}, Audit.objects.all()),
+        ]
+        for name, filterset_class, params, queryset in cases:
+            with self.subTest(index = name, params = params):
+                filterset = filterset_class(params, queryset = queryset)
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                self.assertUsesIndex(filterset.qs, name)
+
+
+class FastSerializerTest(TestCase):
+
+    def context(self, query=''):
+        return {'request': Request(APIRequestFactory().get('/' + query))}
+
+    def test_same_output_as_serializers(self):
+        build_fixture(SMALL)
+        renderer = JSONRenderer()
+        # Ordered: joins for expansions may change the order of unordered rows.
+        cases = [
+            (CardSerializer, Card.objects.order_by('pk'), ''),
+            (CardSerializer, Card.objects.order_by('pk'), '?expand=label,checklists&fields=id,label,checklists,assigned_to'),
+            (CardSerializer, Card.objects.order_by('pk'), '?expand=assigned_to'),
+            (ListSerializer, List.objects.order_by('pk'), ''),
+            (EventSerializer, Event.objects.order_by('pk'), ''),
+            (ElementSerializer, Element.objects.order_by('pk'), '?expand=assigned_to'),
+            (ChecklistElementsSerializer, Checklist.objects.all(), ''),
+            (NotificationSerializer, Notification.objects.order_by('pk'), ''),
+            (AuditSerializer, Audit.objects.order_by('pk'), ''),
+        ]
+        for serializer_class, queryset, query in cases:
+            with self.subTest(serializer = serializer_class.__name__, query = query):
+                context = self.context(query)
+                expected = serializer_class(queryset, many = True, context = context).data
+                self.assertEqual(
+                    renderer.render(serialize(serializer_class, queryset, context)),
+                    renderer.render(expected),
+                )
+
+    def test_hot_serializers_have_plans(self):
+        for serializer_class in (CardSerializer, ListSerializer, EventSerializer,
+                                 ElementSerializer, NotificationSerializer, AuditSerializer):
+            with self.subTest(serializer = serializer_class.__name__):
+                self.assertIsNotNone(get_plan(serializer_class()))
+
+
+class LabelCatalogTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.fixture = build_fixture(SMALL)
+        self.board = self.fixture['board']
+        self.client = APIClient()
+        self.client.force_authenticate(self.fixture['user'])
+
+    def labels(self):
+        return self.client.get(reverse('board-labels', kwargs = {'pk': self.board.pk})).data
+
+    def test_catalog_is_cached_until_labels_change(self):
+        names = [label['name'] for label in self.labels()]
+        self.assertEqual(names, sorted(names))
+        board = Board.objects.get(pk = self.board.pk)
+        with self.assertNumQueries(0):
+            catalog(board)
+
+        label = Label.objects.create(name = 'AAA', board = self.board)
+        self.assertEqual(self.labels()[0]['name'], 'AAA')
+        label.name = 'ZZZ'
+        label.save()
+        self.assertEqual(self.labels()[-1]['name'], 'ZZZ')
+        label.delete()
+        self.assertEqual([label['name'] for label in self.labels()], names)
+
+    def test_cards_by_label_and_priority(self):
+        url = reverse('board-cards', kwargs = {'pk': self.board.pk})
+        label = self.fixture['label']
+        response = self.client.get(url, {'label': label.pk})
+        self.assertEqual({card['label'] for card in response.data}, {label.pk})
+        response = self.client.get(url, {'priority': 'H'})
+        self.assertEqual(
+            {card['id'] for card in response.data},
+            set(Card.objects.filter(lista__board = self.board, label__priority = 'H').values_list('pk', flat = True))
+        )
+        self.assertEqual(self.client.get(url, {'priority': 'X'}).status_code, 400)
+
+    def test_cards_only_take_labels_of_their_board(self):
+        other = Label.objects.create(name = 'Otro', board = Board.objects.exclude(pk = self.board.pk).first())
+        url = reverse('card-detail', kwargs = {'pk': self.fixture['card'].pk})
+        response = self.client.patch(url, {'label': other.pk}, format = 'json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(url, {'label': Label.objects.create(name = 'Global').pk}, format = 'json')
+        self.assertEqual(response.status_code, 200)
+
+
+class CardFilterTest(TestCase):
+
+    def setUp(self):
+        self.fixture = build_fixture(SMALL)
+        self.client = APIClient()
+        self.client.force_authenticate(self.fixture['user'])
+
+    def get(self, name, pk, **params):
+        response = self.client.get(reverse(name, kwargs = {'pk': pk}), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_list_cards(self):
+        lista = self.fixture['lista']
+        done = lista.card_set.first()
+        Card.objects.filter(pk = done.pk).update(checklist_done_count = 2, checklist_total_count = 2)
+        Card.objects.filter(pk = done.pk).update(deadline = timezone.now() + timedelta(days = 2))
+
+        self.assertEqual([card['id'] for card in self.get('list-cards', lista.pk, done = 'true')], [done.pk])
+        self.assertNotIn(done.pk, [card['id'] for card in self.get('list-cards', lista.pk, done = 'false')])
+        cards = self.get('list-cards', lista.pk, deadline_after = timezone.now().isoformat())
+        self.assertEqual([card['id'] for card in cards], [done.pk])
+        titles = [card['title'] for card in self.get('list-cards', lista.pk, ordering = '-title')]
+        self.assertEqual(titles, sorted(titles, reverse = True))
+
+    def test_board_lists_filter_their_cards(self):
+        label = self.fixture['label']
+        lists = self.get('board-lists', self.fixture['board'].pk, label = label.id)
+        self.assertEqual(len(lists), self.fixture['board'].list_set.count())
+        self.assertEqual(
+            {card['label'] for lista in lists for card in lista['card_set']},
+            {label.id}
+        )
+
+    def test_invalid_values(self):
+        response = self.client.get(reverse('list-cards', kwargs = {'pk': self.fixture['lista'].pk}), {'label': 'x'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('audit-list'), {'httpMethod': 'NOPE'})
+        self.assertEqual(response.status_code, 400)
+
+
+def board_contents(board_id):
+    """What duplicating a board has to copy, without the ids that change."""
+    cards = Card.objects.filter(lista__board = board_id)
+    return {
+        'lists': sorted(List.objects.filter(board = board_id).values_list('name', 'hours_estimated', 'hours_done')),
+        'labels': sorted(Label.objects.filter(board = board_id).values_list('name', 'color', 'priority')),
+        'cards': sorted(cards.values_list(
+            'lista__name', 'title', 'label__name', 'checklist_done_count', 'checklist_total_count'
+        )),
+        'assignments': sorted(Card.assigned_to.through.objects.filter(card__in = cards).values_list(
+            'card__lista__name', 'card__title', 'user_id'
+        )),
+        'checklists': sorted(Checklist.objects.filter(card__in = cards).values_list(
+            'card__lista__name', 'card__title', 'rank', 'name', 'done_count', 'total_count'
+        )),
+        'elements': sorted(Element.objects.filter(checklist__card__in = cards).values_list(
+            'checklist__card__lista__name', 'checklist__card__title', 'checklist__rank',
+            'rank', 'title', 'is_done', 'assigned_to_id'
+        )),
+    }
+
+
+class DuplicateBoardTest(TestCase):
+
+    def duplicate(self, size):
+        with transaction.atomic():
+            fixture = build_fixture(size)
+            Element.objects.filter(pk = fixture['element'].pk).update(is_done = True)
+            Checklist.objects.recount()
+            client = APIClient()
+            client.force_authenticate(fixture['user'])
+            with CaptureQueriesContext(connections['default']) as queries:
+                response = client.post(reverse('board-duplicate', kwargs = {'pk': fixture['board'].pk}))
+            self.assertEqual(response.status_code, 201)
+            contents = board_contents(fixture['board'].pk), board_contents(response.data['id'])
+            transaction.set_rollback(True)
+        return len(queries.captured_queries), contents
+
+    def test_copies_everything_with_constant_queries(self):
+        small, _ = self.duplicate(SMALL)
+        large, (original, copy) = self.duplicate(LARGE)
+        self.assertEqual(small, large)
+        self.assertEqual(copy, original)
+        self.assertEqual(len(copy['elements']), LARGE * (2 * LARGE - 1))
+        self.assertTrue(any(card[3] for card in copy['cards']))
+
+
+class ArchiveTest(TestCase):
+
+    def setUp(self):
+        self.fixture = build_fixture(SMALL)
+        self.board = self.fixture['board']
+        self.client = APIClient()
+        self.client.force_authenticate(self.fixture['user'])
+
+    def test_delete_archives_and_restore_brings_back(self):
+        card = self.fixture['card']
+        card.archive()
+        response = self.client.delete(reverse('board-detail', kwargs = {'pk': self.board.pk}))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Board.objects.filter(pk = self.board.pk).exists())
+        self.assertFalse(List.objects.filter(board = self.board).exists())
+        self.assertFalse(Card.objects.filter(lista__board = self.board).exists())
+        self.assertEqual(Checklist.objects.filter(card = card).count(), SMALL)
+
+        response = self.client.post(reverse('card-restore', kwargs = {'pk': card.pk}))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('board-restore', kwargs = {'pk': self.board.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(List.objects.filter(board = self.board).count(), SMALL)
+        # Archived on its own before: stays archived.
+        self.assertEqual(Card.objects.filter(lista__board = self.board).count(), SMALL * SMALL - 1)
+        response = self.client.post(reverse('card-restore', kwargs = {'pk': card.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Card.objects.filter(lista__board = self.board).count(), SMALL * SMALL)
+
+    def test_duplicate_skips_archived(self):
+        card = self.fixture['card']
+        other = List.objects.filter(board = self.board).exclude(pk = self.fixture['lista'].pk).first()
+        self.client.delete(reverse('card-detail', kwargs = {'pk': card.pk}))
+        self.client.delete(reverse('list-detail', kwargs = {'pk': other.pk}))
+
+        response = self.client.post(reverse('board-duplicate', kwargs = {'pk': self.board.pk}))
+        self.assertEqual(response.status_code, 201)
+        copy = response.data['id']
+        self.assertEqual(List.all_objects.filter(board = copy).count(), SMALL - 1)
+        self.assertEqual(Card.all_objects.filter(lista__board = copy).count(), SMALL - 1)
+        self.assertFalse(Card.all_objects.filter(lista__board = copy, title = card.title, lista__name = card.lista.name).exists())
+        self.assertEqual(Checklist.objects.filter(card__lista__board = copy).count(), SMALL - 1)
+
+    def test_purge(self):
+        lista = self.fixture['lista']
+        lista.archive()
+        self.assertEqual(sum(purge_archived().values()), 0)
+        later = timezone.now() + timedelta(days = 31)
+        counts = purge_archived(dry_run = True, now = later)
+        self.assertEqual(counts['Card'], SMALL)
+        self.assertEqual(counts['List'], 1)
+
+        self.assertEqual(purge_archived(batch_size = 2, now = later), counts)
+        self.assertFalse(List.all_objects.filter(pk = lista.pk).exists())
+        self.assertFalse(Checklist.objects.filter(card__lista = lista.pk).exists())
+
+        self.board.archive()
+        purge_archived(batch_size = 2, now = later)
+        self.assertFalse(Board.all_objects.filter(pk = self.board.pk).exists())
+        self.assertFalse(Event.objects.filter(calendar = self.fixture['calendar'].pk).exists())
+
+
+class DeletionTest(TestCase):
+
+    def setUp(self):
+        self.fixture = build_fixture(SMALL)
+        self.board = self.fixture['board']
+        self.client = APIClient()
+        self.client.force_authenticate(self.fixture['user'])
+
+    def test_team_deletion_runs_in_background(self):
+        team = self.fixture['team']
+        response = self.client.delete(reverse('team-detail', kwargs = {'pk': team.pk}))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], Deletion.Status.pending)
+        # Gone for the API, still there until the worker runs.
+        self.assertEqual(self.client.get(reverse('team-detail', kwargs = {'pk': team.pk})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('board-detail', kwargs = {'pk': self.board.pk})).status_code, 404)
+        self.assertTrue(Team.objects.filter(pk = team.pk).exists())
+
+        [deletion] = run_pending(batch_size = 3)
+        self.assertEqual(deletion.status, Deletion.Status.done)
+        self.assertEqual(deletion.deleted, deletion.total)
+        self.assertFalse(Team.objects.filter(pk = team.pk).exists())
+        self.assertFalse(Board.all_objects.filter(team = team.pk).exists())
+        self.assertFalse(Element.objects.filter(checklist__card__lista__board = self.board.pk).exists())
+        self.assertFalse(Audit.objects.filter(board = self.board.pk).exists())
+        self.assertEqual(Member.objects.filter(team = team.pk).count(), 0)
+        self.assertEqual(run_pending(), [])
+
+        response = self.client.get(reverse('deletion-detail', kwargs = {'pk': deletion.pk}))
+        self.assertEqual(response.data['status'], Deletion.Status.done)
+
+    def test_permanent_board_deletion(self):
+        url = reverse('board-detail', kwargs = {'pk': self.board.pk})
+        response = self.client.delete(url + '?permanent=true')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        boards = self.client.get(reverse('team-boards', kwargs = {'pk': self.fixture['team'].pk})).data
+        self.assertNotIn(self.board.pk, [board['id'] for board in boards])
+
+        run_pending()
+        self.assertFalse(Board.all_objects.filter(pk = self.board.pk).exists())
+        self.assertFalse(Card.all_objects.filter(pk = self.fixture['card'].pk).exists())
+        self.assertTrue(Team.objects.filter(pk = self.fixture['team'].pk).exists())
+
+    def test_board_being_deleted_takes_no_new_rows(self):
+        lista = self.fixture['lista']
+        response = self.client.delete(reverse('board-detail', kwargs = {'pk': self.board.pk}) + '?permanent=true')
+        self.assertEqual(response.status_code, 202)
+        # The worker got past the cards already.
+        for queryset in list_subtree(List.all_objects.filter(board = self.board))[:-1]:
+            delete_in_batches(queryset, 100)
+
+        response = self.client.post(reverse('card-list'), {'title': 'Tarde', 'lista': lista.pk}, format = 'json')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('list-list'), {'name': 'Tarde', 'board': self.board.pk}, format = 'json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(reverse('list-detail', kwargs = {'pk': lista.pk})).status_code, 404)
+
+        [deletion] = run_pending()
+        self.assertEqual(deletion.status, Deletion.Status.done)
+        self.assertFalse(List.all_objects.filter(pk = lista.pk).exists())
+
+    def test_nothing_is_attached_to_boards_being_deleted(self):
+        other_board = Board.objects.create(name = 'Otro', owner = self.fixture['user'], team = self.fixture['team'])
+        other_card = Card.objects.create(title = 'Otra', lista = List.objects.create(name = 'Otra', board = other_board))
+        element = Element.objects.create(title = 'Otra', checklist = Checklist.objects.create(card = other_card))
+        response = self.client.delete(reverse('board-detail', kwargs = {'pk': self.board.pk}) + '?permanent=true')
+        self.assertEqual(response.status_code, 202)
+
+        querysets = [Label.objects.all(), Checklist.objects.all(), Element.objects.all(), Event.objects.all(), Audit.objects.filter(board = self.board)]
+        counts = [queryset.count() for queryset in querysets]
+        for basename in ('label', 'checklist', 'element', 'event'):
+            with self.subTest(basename = basename):
+                response = self.client.post(
+                    reverse('{}-list'.format(basename)),
+                    payload('{}-list'.format(basename), basename, self.fixture),
+                    format = 'json'
+                )
+                self.assertEqual(response.status_code, 404)
+        response = self.client.post(
+            reverse('element-move', kwargs = {'pk': element.pk}),
+            {'after': None, 'checklist': self.fixture['checklist'].pk},
+            format = 'json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual([queryset.count() for queryset in querysets], counts)
+
+        [deletion] = run_pending()
+        self.assertEqual(deletion.status, Deletion.Status.done)
+
+    def test_no_boards_are_added_to_teams_being_deleted(self):
+        team = self.fixture['team']
+        self.client.delete(reverse('team-detail', kwargs = {'pk': team.pk}))
+        response = self.client.post(reverse('board-list'), payload('board-list', 'board', self.fixture), format = 'json')
+        self.assertEqual(response.status_code, 404)
+        [deletion] = run_pending()
+        self.assertEqual(deletion.status, Deletion.Status.done)
+        self.assertFalse(Board.all_objects.filter(team = team.pk).exists())
+
+    def test_deletions_of_dead_workers_are_taken_over(self):
+        response = self.client.delete(reverse('board-detail', kwargs = {'pk': self.board.pk}) + '?permanent=true')
+        deletion = Deletion.objects.get(pk = response.data['id'])
+        # A worker claimed it, deleted part of it and was killed.
+        self.assertEqual(claim(), deletion)
+        delete_in_batches(Element.objects.filter(checklist__card__lista__board = self.board), 1)
+        self.assertIsNone(claim())
+        self.assertEqual(run_pending(), [])
+
+        with override_settings(CASCADE_DELETION = dict(settings.CASCADE_DELETION, LOCK_TIMEOUT = 60)):
+            Deletion.objects.update(heartbeat_at = timezone.now() - timedelta(seconds = 30))
+            self.assertIsNone(claim())
+            Deletion.objects.update(heartbeat_at = timezone.now() - timedelta(seconds = 90))
+            [deletion] = run_pending()
+        self.assertEqual(deletion.status, Deletion.Status.done)
+        self.assertEqual(deletion.deleted, deletion.total)
+        self.assertFalse(Board.all_objects.filter(pk = self.board.pk).exists())
 
-# Create your tests here.
+    def test_subtrees_delete_referencing_rows_first(self):
+        # Raw deletes don't cascade: every table pointing at a deleted one has
+        # to be emptied before it.
+        for querysets in (
+            card_subtree(Card.all_objects.none()),
+            list_subtree(List.all_objects.none()),
+            board_subtree(Board.all_objects.none()),
+            team_subtree(Team.objects.none()),
+        ):
+            deleted = []
+            for queryset in querysets:
+                for relation in queryset.model._meta.related_objects:
+                    if not relation.many_to_many:
+                        self.assertIn(relation.related_model, deleted, '{} before {}'.format(
+                            relation.related_model.__name__, queryset.model.__name__
+                        ))
+                deleted.append(queryset.model)
@@ -1,25 +1,75 @@
 import datetime
-from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.http import Http404
-from django.core.mail import send_mail
 from guardian.shortcuts import assign_perm
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat
 
-from boards.models import Board, List, Card, Label
-from boards.serializers import BoardSerializer, ListSerializer, CardSerializer, LabelSerializer
+from boards.models import Board, List, Card, Label, Deletion
+from boards.serializers import BoardSerializer, ListSerializer, CardSerializer, LabelSerializer, DeletionSerializer
+from boards.services import duplicate_board
+from boards.deletion import check_not_deleting, exclude_deleting, schedule
+from boards.filters import CardFilter
+from boards.labels import catalog, label_ids
 from users.permissions import APIPermissionClassFactory
+from lello.fast_serializers import serialize
+from lello.filters import filter_queryset
+from lello.db import ReadReplicaMixin
+from lello.serializers import DynamicFieldsViewSetMixin
+from django.utils import timezone
+
 from audits.models import Audit
-from audits.serializers import AuditSerializer
-from notifications.models import Notification
-from calendars.models import Event
-from calendars.serializers import EventSerializer
-from checklists.serializers import ElementSerializer
+from audits.tasks import create_audit
+from notifications.tasks import create_notification
+from calendars.tasks import create_event
+
+
+def _audit_urls(queryset, prefix):
+    # '/cards/12/' style urls for every row of queryset, as a subquery.
+    return queryset.annotate(
+        audit_url = Concat(Value(prefix), Cast('id', CharField()), Value('/'))
+    ).values('audit_url')
+
+
+class ArchiveViewSetMixin:
+    """
+    DELETE archives the row and its subtree (lello.archive) instead of
+    cascading; POST {id}/restore/ brings them back unless the parent
+    (`archive_parent`) is archived too.
+    """
+
+    archive_parent = None
+
+    def get_queryset(self):
+        if self.action == 'restore':
+            return self.queryset.model.all_objects.filter(is_archived = True)
+        return super().get_queryset()
+
+    def perform_destroy(self, instance):
+        instance.archive()
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        instance = self.get_object()
+        if self.archive_parent and getattr(instance, self.archive_parent).is_archived:
+            raise ValidationError({self.archive_parent: ['Archived, restore it first.']})
+        instance.restore()
+        Audit.objects.create(
+            httpMethod = request.method,
+            url = '/{}s/{}/restore/'.format(self.basename, instance.pk),
+            user = request.user
+        )
+
+        return Response(
+            self.get_serializer(instance).data
+        )
 
 
-class BoardViewSet(viewsets.ModelViewSet):
+class BoardViewSet(ReadReplicaMixin, ArchiveViewSetMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Board.objects.all()
     serializer_class = BoardSerializer
     permission_classes = (
@@ -35,9 +85,13 @@ class BoardViewSet(viewsets.ModelViewSet):
                     'update': lambda user, obj, req: user.is_authenticated,
                     'partial_update': lambda user, obj, req: user.is_authenticated,
                     'destroy': 'boards.delete_board',
+                    'restore': 'boards.delete_board',
                     'lists': lambda user, obj, req: user.is_authenticated,
                     'audits': lambda user, obj, req: user.is_authenticated,
                     'calendar_events': lambda user, obj, req: user.is_authenticated,
+                    'duplicate': lambda user, obj, req: user.is_authenticated,
+                    'labels': lambda user, obj, req: user.is_authenticated,
+                    'cards': lambda user, obj, req: user.is_authenticated,
                 }
             }
         ),
@@ -45,6 +99,7 @@ class BoardViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         user = self.request.user
+        check_not_deleting(serializer.validated_data['team'])
         board = serializer.save()
         assign_perm('boards.delete_board', user, board)
         Audit.objects.create(
@@ -54,10 +109,21 @@ class BoardViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
 
+    def get_queryset(self):
+        # Boards waiting for their background deletion (boards.deletion) are
+        # already gone for the API.
+        return exclude_deleting(super().get_queryset())
+
     def destroy(self, request, *args, **kwargs):
+        # ?permanent=true deletes the board for good in the background
+        # instead of archiving it.
+        deletion = None
         try:
             instance = self.get_object()
-            self.perform_destroy(instance)
+            if request.query_params.get('permanent') in ('1', 'true'):
+                deletion = schedule(Deletion.Target.board, instance, request.user)
+            else:
+                self.perform_destroy(instance)
             Audit.objects.create(
                 httpMethod = request.method,
                 url = '/boards/{}/'.format(kwargs['pk']),
@@ -65,56 +131,100 @@ class BoardViewSet(viewsets.ModelViewSet):
             )
         except Http404:
             pass
+        if deletion is not None:
+            return Response(DeletionSerializer(deletion).data, status=status.HTTP_202_ACCEPTED)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['get'])
     def lists(self, request, pk=None):
+        # Card filters (boards.filters.CardFilter) narrow the cards of
+        # every list.
         board = self.get_object()
-        lists = board.list_set.all()
+        cards = filter_queryset(CardFilter, Card.objects.prefetch_related('assigned_to'), request)
 
         return Response(
-            [ListSerializer(lista).data for lista in lists]
+            serialize(ListSerializer, board.list_set.all(), self.get_serializer_context(), related = {'card_set': cards})
         )
 
     @action(detail=True, methods=['get'])
     def audits(self, request, pk=None):
+        # Serializers of other apps are imported where used so loading this
+        # module doesn't pull those apps in.
+        from audits.filters import AuditFilter
+        from audits.serializers import AuditSerializer
+
         board = self.get_object()
-        lists = board.list_set.all()
 
         audits = Audit.objects.filter(
-            url = '/boards/{}/'.format(board.id)
+            Q(board = board) |
+            Q(url = '/boards/{}/'.format(board.id)) |
+            Q(url__in = _audit_urls(List.all_objects.filter(board = board), '/lists/')) |
+            Q(url__in = _audit_urls(Card.all_objects.filter(lista__board = board), '/cards/'))
+        ).select_related('user')
+        audits = filter_queryset(AuditFilter, audits, request)
+
+        return Response(
+            serialize(AuditSerializer, audits, self.get_serializer_context())
         )
 
-        for lista in lists:
-            audits = audits.union(Audit.objects.filter(
-                url = '/lists/{}/'.format(lista.id)
-            ))
+    @action(detail=True, url_path='calendar-events', methods=['get'])
+    def calendar_events(self, request, pk=None):
+        from calendars.filters import EventFilter
+        from calendars.serializers import EventSerializer
 
-            for card in lista.card_set.all():
-                audits = audits.union(Audit.objects.filter(
-                    url = '/cards/{}/'.format(card.id)
-                ))
+        board = self.get_object()
+        calendar = board.calendar
+        events = filter_queryset(EventFilter, calendar.event_set.all(), request)
 
-        audits = audits.union(board.audit_set.all())
-        print(audits)
+        return Response(
+            serialize(EventSerializer, events, self.get_serializer_context())
+        )
+
+    @action(detail=True, methods=['get'])
+    def labels(self, request, pk=None):
+        return Response(catalog(self.get_object()))
+
+    @action(detail=True, methods=['get'])
+    def cards(self, request, pk=None):
+        # Takes the CardFilter parameters; a valid ?priority=H resolves to
+        # label ids through the cached catalog so the query only reads
+        # card_list_label_idx. Invalid ones are left to CardFilter (400).
+        board = self.get_object()
+        params = request.query_params.copy()
+        cards = Card.objects.filter(lista__board = board)
+        if params.get('priority') in Label.Priority.values:
+            cards = cards.filter(label__in = label_ids(board, params.pop('priority')[-1]))
+        cards = filter_queryset(CardFilter, cards.prefetch_related('assigned_to'), request, params)
+        cards = CardSerializer.setup_queryset(cards, request)
 
         return Response(
-            [AuditSerializer(audit).data for audit in audits]
+            serialize(CardSerializer, cards, self.get_serializer_context())
         )
 
-    @action(detail=True, url_path='calendar-events', methods=['get'])
-    def calendar_events(self, request, pk=None):
+    @action(detail=True, methods=['post'])
+    def duplicate(self, request, pk=None):
         board = self.get_object()
-        calendar = board.calendar
-        events = calendar.event_set.all()
-        
+        new_board = duplicate_board(
+            board,
+            request.user,
+            name = request.data.get('name'),
+        )
+        assign_perm('boards.delete_board', request.user, new_board)
+        Audit.objects.create(
+            httpMethod = request.method,
+            url = '/boards/{}/duplicate/'.format(board.id),
+            user = request.user,
+            board = new_board
+        )
         return Response(
-            [EventSerializer(event).data for event in events]
+            BoardSerializer(new_board, context = self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED
         )
 
-class ListViewSet(viewsets.ModelViewSet):
-    queryset = List.objects.all()
+class ListViewSet(ReadReplicaMixin, ArchiveViewSetMixin, viewsets.ModelViewSet):
+    queryset = List.objects.prefetch_related('card_set__assigned_to')
     serializer_class = ListSerializer
+    archive_parent = 'board'
     permission_classes = (
         APIPermissionClassFactory(
             name='ListPermission',
@@ -129,26 +239,35 @@ class ListViewSet(viewsets.ModelViewSet):
                     'partial_update': lambda user, obj, req: user.is_authenticated,
                     'destroy': lambda user, obj, req: user.is_authenticated,
                     'cards': lambda user, obj, req: user.is_authenticated,
+                    'restore': lambda user, obj, req: user.is_authenticated,
                 }
             }
         ),
     )
 
-    def create(self, request):
-        board = Board.objects.get(pk = request.data['board'])
-        Audit.objects.create(
-            httpMethod = request.method,
-            url = '/lists/',
-            user = request.user,
-            board = board
-        )
-        Notification.objects.create(
-            title = "Nueva lista!",
-            description = "Tu nueva lista se llama {}".format(request.data['name']),
-            transmitter = request.user,
-            receiver = board.owner
-        )
-        return super().create(request)
+    def get_queryset(self):
+        return exclude_deleting(super().get_queryset(), 'board')
+
+    def perform_create(self, serializer):
+        # Side effects run in the job workers (jobs.queue); their jobs are
+        # only queued for a valid payload and commit with the list.
+        request = self.request
+        check_not_deleting(serializer.validated_data['board'])
+        with transaction.atomic(savepoint = False):
+            lista = serializer.save()
+            create_audit.delay(
+                httpMethod = request.method,
+                url = '/lists/',
+                user_id = request.user.pk,
+                board_id = lista.board_id,
+                created_at = timezone.now()
+            )
+            create_notification.delay(
+                title = "Nueva lista!",
+                description = "Tu nueva lista se llama {}".format(lista.name),
+                transmitter_id = request.user.pk,
+                receiver_id = lista.board.owner_id
+            )
 
     def destroy(self, request, *args, **kwargs):
         try:
@@ -168,15 +287,17 @@ class ListViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def cards(self, request, pk=None):
         lista = self.get_object()
-        cards = lista.card_set.all()
+        cards = filter_queryset(CardFilter, lista.card_set.prefetch_related('assigned_to'), request)
+        cards = CardSerializer.setup_queryset(cards, request)
 
         return Response(
-            [CardSerializer(card).data for card in cards]
+            serialize(CardSerializer, cards, self.get_serializer_context())
         )
 
-class CardViewSet(viewsets.ModelViewSet):
+class CardViewSet(ReadReplicaMixin, ArchiveViewSetMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Card.objects.all()
     serializer_class = CardSerializer
+    archive_parent = 'lista'
     permission_classes = (
         APIPermissionClassFactory(
             name='CardPermission',
@@ -190,39 +311,46 @@ class CardViewSet(viewsets.ModelViewSet):
                     'update': lambda user, obj, req: user.is_authenticated,
                     'partial_update': lambda user, obj, req: user.is_authenticated,
                     'destroy': lambda user, obj, req: user.is_authenticated,
-                    'checklist': lambda user, obj, req: user.is_authenticated,
+                    'checklists': lambda user, obj, req: user.is_authenticated,
+                    'restore': lambda user, obj, req: user.is_authenticated,
                 }
             }
         ),
     )
 
-    def create(self, request):
-        lista = List.objects.get(pk = request.data["lista"])
-        # tablero = Board.objects.select_related('board').get(lista.id)
-        tablero = lista.board
-        # tablero = lista.board_set.all()[0]
-        calendario = tablero.calendar
-        Audit.objects.create(
-            httpMethod = request.method,
-            url = '/cards/',
-            user = request.user,
-            board = tablero
-        )
-        lista = List.objects.get(pk = request.data['lista'])
-        board = Board.objects.get(pk = lista.board.id)
-        Notification.objects.create(
-            title = "Nueva Card!",
-            description = "La nueva card se llama {}".format(request.data['title']),
-            transmitter = request.user,
-            receiver = board.owner
-        )
-        Event.objects.create(
-            calendar = calendario,
-            title = 'Nueva tarjeta: {}'.format(request.data["title"]),
-            description = 'Tarjeta creada por: {}, {}, {}, {}'.format(request.user.username, lista.id, tablero.id, calendario.id),
-            date = datetime.datetime.now()
-        )
-        return super().create(request)
+    def get_queryset(self):
+        return exclude_deleting(super().get_queryset(), 'lista__board')
+
+    def perform_create(self, serializer):
+        # Side effects run in the job workers (jobs.queue); their jobs are
+        # only queued for a valid payload and commit with the card.
+        request = self.request
+        check_not_deleting(serializer.validated_data['lista'])
+        with transaction.atomic(savepoint = False):
+            card = serializer.save()
+            lista = card.lista
+            # tablero = Board.objects.select_related('board').get(lista.id)
+            tablero = lista.board
+            calendario = tablero.calendar
+            create_audit.delay(
+                httpMethod = request.method,
+                url = '/cards/',
+                user_id = request.user.pk,
+                board_id = tablero.pk,
+                created_at = timezone.now()
+            )
+            create_notification.delay(
+                title = "Nueva Card!",
+                description = "La nueva card se llama {}".format(card.title),
+                transmitter_id = request.user.pk,
+                receiver_id = tablero.owner_id
+            )
+            create_event.delay(
+                calendar_id = calendario.id,
+                title = 'Nueva tarjeta: {}'.format(card.title),
+                description = 'Tarjeta creada por: {}, {}, {}, {}'.format(request.user.username, lista.id, tablero.id, calendario.id),
+                date = datetime.datetime.now()
+            )
 
     def destroy(self, request, *args, **kwargs):
         try:
@@ -238,18 +366,14 @@ class CardViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['get'])
-    def checklist(self, request, pk=None):
+    def checklists(self, request, pk=None):
+        from checklists.serializers import ChecklistElementsSerializer
+
         card = self.get_object()
-        try:        
-            checklist = card.checklist
-            elements = checklist.element_set.all()
-            return Response({
-                'id': checklist.id,
-                'name': checklist.name,
-                'elements': [ElementSerializer(element).data for element in elements]
-            })
-        except ObjectDoesNotExist:
-            return Response([])
+        # Checklists and their elements in rank order, one query each.
+        return Response(
+            serialize(ChecklistElementsSerializer, card.checklists.all(), self.get_serializer_context())
+        )
 
 
 class LabelViewSet(viewsets.ModelViewSet):
@@ -273,23 +397,52 @@ class LabelViewSet(viewsets.ModelViewSet):
         ),
     )
 
-    def create(self, request):
+    def perform_create(self, serializer):
+        # The audit points at the board too: checked before writing either.
+        board = serializer.validated_data.get('board')
+        check_not_deleting(board)
         Audit.objects.create(
-            httpMethod = request.method,
+            httpMethod = self.request.method,
             url = '/labels/',
-            user = request.user
+            user = self.request.user,
+            board = board
         )
-        return super().create(request)
+        serializer.save()
 
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
+            board_id = instance.board_id
             self.perform_destroy(instance)
             Audit.objects.create(
                 httpMethod = request.method,
                 url = '/labels/{}/'.format(kwargs['pk']),
-                user = request.user
+                user = request.user,
+                board_id = board_id
             )
         except Http404:
             pass
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DeletionViewSet(viewsets.ReadOnlyModelViewSet):
+    # Progress of the background deletions (boards.deletion) a user asked for.
+    queryset = Deletion.objects.order_by('-created_at')
+    serializer_class = DeletionSerializer
+    permission_classes = (
+        APIPermissionClassFactory(
+            name='DeletionPermission',
+            permission_configuration={
+                'base': {
+                    'create': False,
+                    'list': lambda user, req: user.is_authenticated,
+                },
+                'instance': {
+                    'retrieve': lambda user, obj, req: obj.requested_by_id == user.pk,
+                }
+            }
+        ),
+    )
+
+    def get_queryset(self):
+        return super().get_queryset().filter(requested_by = self.request.user.pk)
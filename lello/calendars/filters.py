@@ -0,0 +1,14 @@
+from django_filters import rest_framework as filters
+
+from calendars.models import Event
+
+
+class EventFilter(filters.FilterSet):
+    calendar = filters.NumberFilter(field_name = 'calendar')
+    # ?date_after=...&date_before=...
+    date = filters.IsoDateTimeFromToRangeFilter()
+    ordering = filters.OrderingFilter(fields = ('date', 'created_at'))
+
+    class Meta:
+        model = Event
+        fields = []
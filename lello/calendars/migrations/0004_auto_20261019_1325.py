@@ -0,0 +1,23 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendars', '0003_auto_20200604_0541'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['calendar', 'date'], name='event_calendar_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='calendar',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='calendars.calendar'),
+        ),
+    ]
@@ -14,7 +14,8 @@ class Event(models.Model):
         'calendars.Calendar',
         null = False,
         blank = False,
-        on_delete = models.CASCADE
+        on_delete = models.CASCADE,
+        db_index = False
     )
     title = models.CharField(
         max_length = 150,
@@ -38,5 +39,11 @@ class Event(models.Model):
         auto_now = True
     )
 
+    class Meta:
+        indexes = [
+            # Events of a calendar by date.
+            models.Index(fields = ['calendar', 'date'], name = 'event_calendar_date_idx'),
+        ]
+
     def __str__(self):
         return self.title
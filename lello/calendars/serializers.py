@@ -1,14 +1,13 @@
-from rest_framework import serializers
-
+from lello.serializers import DynamicFieldsModelSerializer
 from calendars.models import Calendar, Event
 
 
-class CalendarSerializer(serializers.ModelSerializer):
+class CalendarSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Calendar
         fields = '__all__'
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Event
         fields = '__all__'
@@ -0,0 +1,19 @@
+from django.utils.dateparse import parse_datetime
+
+from jobs.queue import task
+from boards.deletion import exclude_deleting
+from calendars.models import Calendar, Event
+
+
+@task(priority = 5)
+def create_event(calendar_id, title, description, date):
+    if not exclude_deleting(Calendar.objects.filter(pk = calendar_id), 'board').exists():
+        # Same as create_audit: the board is gone or being deleted.
+        return
+    Event.objects.create(
+        calendar_id = calendar_id,
+        title = title,
+        description = description,
+        # Queued payloads are JSON: dates come back as strings.
+        date = parse_datetime(date) if isinstance(date, str) else date
+    )
@@ -5,12 +5,17 @@ from rest_framework.response import Response
 from django.http import Http404
 
 from calendars.models import Calendar, Event
+from calendars.filters import EventFilter
 from calendars.serializers import CalendarSerializer, EventSerializer
+from boards.deletion import check_not_deleting
 from users.permissions import APIPermissionClassFactory
+from lello.fast_serializers import serialize
+from lello.filters import filter_queryset
+from lello.db import ReadReplicaMixin
 from audits.models import Audit
 
 
-class CalendarViewSet(viewsets.ModelViewSet):
+class CalendarViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
     queryset = Calendar.objects.all()
     serializer_class = CalendarSerializer
     permission_classes = (
@@ -40,6 +45,10 @@ class CalendarViewSet(viewsets.ModelViewSet):
         )
         return super().create(request)
 
+    def perform_create(self, serializer):
+        check_not_deleting(serializer.validated_data['board'])
+        serializer.save()
+
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -56,15 +65,16 @@ class CalendarViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def events(self, request, pk=None):
         calendar = self.get_object()
-        events = calendar.event_set.all()
-        
+        events = filter_queryset(EventFilter, calendar.event_set.all(), request)
+
         return Response(
-            [EventSerializer(event).data for event in events]
+            serialize(EventSerializer, events, self.get_serializer_context())
         )
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    filterset_class = EventFilter
     permission_classes = (
         APIPermissionClassFactory(
             name='EventPermission',
@@ -91,6 +101,10 @@ class EventViewSet(viewsets.ModelViewSet):
         )
         return super().create(request)
 
+    def perform_create(self, serializer):
+        check_not_deleting(serializer.validated_data['calendar'])
+        serializer.save()
+
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
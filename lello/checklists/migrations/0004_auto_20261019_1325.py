@@ -0,0 +1,23 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklists', '0003_auto_20200605_0012'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='element',
+            index=models.Index(fields=['checklist', 'is_done'], name='element_checklist_done_idx'),
+        ),
+        migrations.AlterField(
+            model_name='element',
+            name='checklist',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='checklists.checklist'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_elements(apps, schema_editor):
+    Checklist = apps.get_model('checklists', 'Checklist')
+    Element = apps.get_model('checklists', 'Element')
+    elements = Element.objects.filter(checklist = OuterRef('pk')).order_by().values('checklist')
+    count = lambda queryset: Coalesce(Subquery(queryset.annotate(count = Count('pk')).values('count')), Value(0))
+    Checklist.objects.using(schema_editor.connection.alias).update(
+        total_count = count(elements),
+        done_count = count(elements.filter(is_done = True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklists', '0004_auto_20261019_1325'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklist',
+            name='done_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='checklist',
+            name='total_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_elements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:38
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+RANK_GAP = 2 ** 20
+
+
+def backfill(apps, schema_editor):
+    # Existing rows keep their creation order.
+    alias = schema_editor.connection.alias
+    Checklist = apps.get_model('checklists', 'Checklist')
+    Element = apps.get_model('checklists', 'Element')
+    Card = apps.get_model('boards', 'Card')
+    Checklist.objects.using(alias).update(rank = F('id') * RANK_GAP)
+    Element.objects.using(alias).update(rank = F('id') * RANK_GAP)
+
+    checklists = Checklist.objects.using(alias).filter(card = OuterRef('pk')).order_by().values('card')
+    total = lambda field: Coalesce(Subquery(checklists.annotate(total = Sum(field)).values('total')), Value(0))
+    Card.objects.using(alias).filter(checklists__isnull = False).update(
+        checklist_total_count = total('total_count'),
+        checklist_done_count = total('done_count'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0006_auto_20261019_1338'),
+        ('checklists', '0005_auto_20261019_1334'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='checklist',
+            options={'ordering': ['rank', 'pk']},
+        ),
+        migrations.AlterModelOptions(
+            name='element',
+            options={'ordering': ['rank', 'pk']},
+        ),
+        migrations.RemoveIndex(
+            model_name='element',
+            name='element_checklist_done_idx',
+        ),
+        migrations.AddField(
+            model_name='checklist',
+            name='rank',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='element',
+            name='rank',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='checklist',
+            name='card',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='checklists', to='boards.card'),
+        ),
+        migrations.AddIndex(
+            model_name='checklist',
+            index=models.Index(fields=['card', 'rank'], name='checklist_card_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='element',
+            index=models.Index(fields=['checklist', 'rank'], name='element_checklist_rank_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,78 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from boards.models import Card
+from checklists.ranking import next_rank, rank_after
+from lello.counters import CounterFieldsMixin
 
 
+class ChecklistQuerySet(models.QuerySet):
 
-class Checklist(models.Model):
+    def recount(self):
+        """Recomputes the counters from the elements, and those of their cards."""
+        elements = Element.objects.filter(checklist = OuterRef('pk')).order_by().values('checklist')
+        count = lambda queryset: Coalesce(Subquery(queryset.annotate(count = Count('pk')).values('count')), Value(0))
+        updated = self.update(
+            total_count = count(elements),
+            done_count = count(elements.filter(is_done = True)),
+        )
+
+        checklists = Checklist.objects.filter(card = OuterRef('pk')).order_by().values('card')
+        total = lambda field: Coalesce(Subquery(checklists.annotate(total = Sum(field)).values('total')), Value(0))
+        Card.all_objects.filter(pk__in = self.values('card_id')).update(
+            checklist_total_count = total('total_count'),
+            checklist_done_count = total('done_count'),
+        )
+        return updated
+
+
+def adjust_card_counts(cards, total=0, done=0):
+    if total or done:
+        cards.update(
+            checklist_total_count = F('checklist_total_count') + total,
+            checklist_done_count = F('checklist_done_count') + done
+        )
+
+
+def adjust_counts(checklist_id, total=0, done=0):
+    """Adds to the counters of a checklist and of its card."""
+    if checklist_id is not None and (total or done):
+        Checklist.objects.filter(pk = checklist_id).update(
+            total_count = F('total_count') + total,
+            done_count = F('done_count') + done
+        )
+        adjust_card_counts(Card.all_objects.filter(checklists = checklist_id), total, done)
+
+
+class Checklist(CounterFieldsMixin, models.Model):
     name = models.CharField(
         max_length = 50,
         default = "To do"
     )
-    card = models.OneToOneField(
+    card = models.ForeignKey(
         Card,
         null = True,
         on_delete = models.CASCADE,
-        related_name = 'checklist'
+        related_name = 'checklists',
+        db_index = False
+    )
+    # Position in the card (see checklists.ranking).
+    rank = models.BigIntegerField(
+        default = 0,
+        editable = False
+    )
+    # Kept up to date by Element.save() and delete() with F() updates, so
+    # progress can be shown without reading the elements.
+    done_count = models.PositiveIntegerField(
+        default = 0,
+        editable = False
+    )
+    total_count = models.PositiveIntegerField(
+        default = 0,
+        editable = False
     )
     created_at = models.DateTimeField(
         auto_now_add = True
@@ -23,9 +81,87 @@ class Checklist(models.Model):
         auto_now = True
     )
 
+    objects = ChecklistQuerySet.as_manager()
+
+    counter_fields = ('done_count', 'total_count')
+
+    class Meta:
+        ordering = ['rank', 'pk']
+        indexes = [
+            models.Index(fields = ['card', 'rank'], name = 'checklist_card_rank_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            if not self.rank:
+                self.rank = next_rank(Checklist.objects.filter(card_id = self.card_id))
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic(savepoint = False):
+            # Counters move with the checklist when it changes card.
+            previous = Checklist.objects.select_for_update().filter(pk = self.pk).values_list(
+                'card_id', 'total_count', 'done_count'
+            ).first()
+            super().save(*args, **kwargs)
+            if previous is not None and previous[0] != self.card_id:
+                adjust_card_counts(Card.all_objects.filter(pk = previous[0]), -previous[1], -previous[2])
+                adjust_card_counts(Card.all_objects.filter(pk = self.card_id), previous[1], previous[2])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint = False):
+            previous = Checklist.objects.select_for_update().filter(pk = self.pk).values_list(
+                'card_id', 'total_count', 'done_count'
+            ).first()
+            result = super().delete(*args, **kwargs)
+            if previous is not None:
+                adjust_card_counts(Card.all_objects.filter(pk = previous[0]), -previous[1], -previous[2])
+        return result
+
+    def toggle(self, element_ids, is_done=None):
+        """
+        Marks elements of this checklist as done or pending (flips each one
+        when is_done is None) with one UPDATE; returns how many changed.
+        """
+        elements = self.element_set.filter(pk__in = element_ids)
+        now = timezone.now()
+        with transaction.atomic(savepoint = False):
+            if is_done is None:
+                states = list(elements.select_for_update().values_list('is_done', flat = True))
+                changed = len(states)
+                done = states.count(False) - states.count(True)
+                elements.update(
+                    is_done = Case(
+                        When(is_done = True, then = Value(False)),
+                        default = Value(True),
+                        output_field = BooleanField()
+                    ),
+                    updated_at = now
+                )
+            else:
+                changed = elements.exclude(is_done = is_done).update(is_done = is_done, updated_at = now)
+                done = changed if is_done else -changed
+            adjust_counts(self.pk, done = done)
+        return changed
+
+    def move(self, after, card_id=None):
+        """
+        Places the checklist right after the checklist `after` (first when
+        None) of its card, or of `card_id`. False when `after` isn't there.
+        """
+        card_id = self.card_id if card_id is None else card_id
+        with transaction.atomic(savepoint = False):
+            rank = rank_after(Checklist.objects.filter(card_id = card_id).exclude(pk = self.pk), after)
+            if rank is None:
+                return False
+            self.card_id = card_id
+            self.rank = rank
+            self.save(update_fields = ['card', 'rank', 'updated_at'])
+        return True
+
+
 class Element(models.Model):
     title = models.CharField(
         max_length = 100,
@@ -36,11 +172,17 @@ class Element(models.Model):
         'checklists.Checklist',
         null = False,
         blank = False,
-        on_delete = models.CASCADE
+        on_delete = models.CASCADE,
+        db_index = False
     )
     is_done = models.BooleanField(
         default = False
     )
+    # Position in the checklist (see checklists.ranking).
+    rank = models.BigIntegerField(
+        default = 0,
+        editable = False
+    )
     assigned_to = models.ForeignKey(
         User,
         null = True,
@@ -56,5 +198,54 @@ class Element(models.Model):
         auto_now = True
     )
 
+    class Meta:
+        ordering = ['rank', 'pk']
+        indexes = [
+            # Elements of a checklist in order.
+            models.Index(fields = ['checklist', 'rank'], name = 'element_checklist_rank_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+    def _locked_state(self):
+        # What the counters currently reflect; the row stays locked so a
+        # concurrent change of the same element can't count twice.
+        return Element.objects.select_for_update().filter(pk = self.pk).values_list(
+            'checklist_id', 'is_done'
+        ).first()
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.rank:
+            self.rank = next_rank(Element.objects.filter(checklist_id = self.checklist_id))
+        with transaction.atomic(savepoint = False):
+            previous = None if self._state.adding else self._locked_state()
+            super().save(*args, **kwargs)
+            if previous == (self.checklist_id, self.is_done):
+                return
+            if previous is not None:
+                adjust_counts(previous[0], -1, -int(previous[1]))
+            adjust_counts(self.checklist_id, 1, int(self.is_done))
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint = False):
+            previous = self._locked_state()
+            result = super().delete(*args, **kwargs)
+            if previous is not None:
+                adjust_counts(previous[0], -1, -int(previous[1]))
+        return result
+
+    def move(self, after, checklist_id=None):
+        """
+        Places the element right after the element `after` (first when None)
+        of its checklist, or of `checklist_id`. False when `after` isn't there.
+        """
+        checklist_id = self.checklist_id if checklist_id is None else checklist_id
+        with transaction.atomic(savepoint = False):
+            rank = rank_after(Element.objects.filter(checklist_id = checklist_id).exclude(pk = self.pk), after)
+            if rank is None:
+                return False
+            self.checklist_id = checklist_id
+            self.rank = rank
+            self.save(update_fields = ['checklist', 'rank', 'updated_at'])
+        return True
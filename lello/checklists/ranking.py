@@ -0,0 +1,51 @@
+"""
+Manual ordering with sparse integer ranks.
+
+New rows go RANK_GAP after the last one and a moved row takes the midpoint
+between its new neighbours, so a move only writes the moved row. When two
+neighbours run out of room (about 20 moves into the same spot) the siblings
+are renumbered once with bulk_update.
+"""
+
+from django.db.models import Max
+
+
+RANK_GAP = 2 ** 20
+
+
+def next_rank(siblings):
+    last = siblings.aggregate(last = Max('rank'))['last']
+    return RANK_GAP if last is None else last + RANK_GAP
+
+
+def rebalance(siblings):
+    rows = list(siblings.order_by('rank', 'pk').only('pk', 'rank'))
+    for index, row in enumerate(rows):
+        row.rank = (index + 1) * RANK_GAP
+    siblings.model.objects.bulk_update(rows, ['rank'])
+
+
+def rank_after(siblings, after):
+    """
+    Rank that places a row right after the sibling with pk `after` (first
+    when None). `siblings` must not include the row being placed. Returns
+    None when `after` isn't one of the siblings.
+    """
+    siblings = siblings.order_by('rank', 'pk')
+    for attempt in range(2):
+        if after is None:
+            low = 0
+            following = siblings
+        else:
+            low = siblings.filter(pk = after).values_list('rank', flat = True).first()
+            if low is None:
+                return None
+            following = siblings.filter(rank__gte = low).exclude(pk = after)
+        high = following.values_list('rank', flat = True).first()
+        if high is None:
+            return low + RANK_GAP
+        if high - low >= 2:
+            return (low + high) // 2
+        # No room (or rows sharing a rank): renumber once and retry.
+        rebalance(siblings)
+    return None
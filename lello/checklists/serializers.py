@@ -1,14 +1,41 @@
 from rest_framework import serializers
 
+from lello.serializers import DynamicFieldsModelSerializer
+from boards.models import Card
 from checklists.models import Checklist, Element
+from users.serializers import UserSerializer
 
 
-class ChecklistSerializer(serializers.ModelSerializer):
+class ChecklistSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Checklist
         fields = '__all__'
 
-class ElementSerializer(serializers.ModelSerializer):
+class ElementToggleSerializer(serializers.Serializer):
+    elements = serializers.ListField(child = serializers.IntegerField(), allow_empty = False)
+    # Missing or null: every element flips. The default also applies to form
+    # data, where a plain BooleanField reads a missing key as False.
+    is_done = serializers.BooleanField(allow_null = True, default = None)
+
+class ChecklistMoveSerializer(serializers.Serializer):
+    # Checklist to place it after, null for first.
+    after = serializers.IntegerField(allow_null = True)
+    card = serializers.PrimaryKeyRelatedField(queryset = Card.objects.all(), required = False)
+
+class ElementMoveSerializer(serializers.Serializer):
+    # Element to place it after, null for first.
+    after = serializers.IntegerField(allow_null = True)
+    checklist = serializers.PrimaryKeyRelatedField(queryset = Checklist.objects.all(), required = False)
+
+class ElementSerializer(DynamicFieldsModelSerializer):
+    expandable_fields = {
+        'assigned_to': (UserSerializer, {}),
+    }
+
     class Meta:
         model = Element
         fields = '__all__'
+
+class ChecklistElementsSerializer(ChecklistSerializer):
+    # A card's checklists with their elements (CardViewSet.checklists).
+    elements = ElementSerializer(source = 'element_set', many = True, read_only = True)
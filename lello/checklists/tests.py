@@ -1,3 +1,169 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from boards.models import Board, List, Card
+from checklists.models import Checklist, Element
+from checklists.ranking import RANK_GAP
+from users.models import Team
+
+
+class ChecklistCountersTest(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username = 'owner')
+        board = Board.objects.create(name = 'Board', owner = user, team = Team.objects.create(name = 'Team'))
+        card = Card.objects.create(title = 'Card', lista = List.objects.create(name = 'Lista', board = board))
+        self.card = card
+        self.checklist = Checklist.objects.create(card = card)
+        self.elements = [
+            Element.objects.create(title = 'Tarea {}'.format(index), checklist = self.checklist, is_done = index < 2)
+            for index in range(5)
+        ]
+
+    def assertCounts(self, done, total):
+        self.checklist.refresh_from_db()
+        self.assertEqual((self.checklist.done_count, self.checklist.total_count), (done, total))
+
+    def assertCardCounts(self, card, done, total):
+        card.refresh_from_db()
+        self.assertEqual((card.checklist_done_count, card.checklist_total_count), (done, total))
+
+    def test_element_changes_update_counters(self):
+        self.assertCounts(2, 5)
+        element = self.elements[-1]
+        element.is_done = True
+        element.save()
+        self.assertCounts(3, 5)
+        element.title = 'Otra'
+        element.save()
+        self.assertCounts(3, 5)
+        element.delete()
+        self.assertCounts(2, 4)
+
+        other = Checklist.objects.create(card = Card.objects.create(title = 'Otra', lista = self.checklist.card.lista))
+        self.elements[0].checklist = other
+        self.elements[0].save()
+        self.assertCounts(1, 3)
+        other.refresh_from_db()
+        self.assertEqual((other.done_count, other.total_count), (1, 1))
+
+    def test_toggle(self):
+        ids = [element.pk for element in self.elements]
+        self.assertEqual(self.checklist.toggle(ids, True), 3)
+        self.assertCounts(5, 5)
+        self.assertEqual(self.checklist.toggle(ids[:2], False), 2)
+        self.assertCounts(3, 5)
+        self.assertEqual(self.checklist.toggle(ids[1:3]), 2)
+        self.assertCounts(3, 5)
+        self.assertEqual(
+            list(Element.objects.order_by('pk').values_list('is_done', flat = True)),
+            [False, True, False, True, True]
+        )
+
+    def test_toggle_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.checklist.card.lista.board.owner)
+        url = '/api/checklists/{}/toggle/'.format(self.checklist.pk)
+        ids = [element.pk for element in self.elements[1:3]]
+
+        # Form data without is_done flips each element, like JSON without it.
+        response = client.post(url, {'elements': ids})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['done_count'], 2)
+        self.assertEqual(
+            list(Element.objects.order_by('pk').values_list('is_done', flat = True)),
+            [True, False, True, False, False]
+        )
+        response = client.post(url, {'elements': ids, 'is_done': 'true'})
+        self.assertEqual(response.data['done_count'], 3)
+        response = client.post(url, {'elements': ids, 'is_done': None}, format = 'json')
+        self.assertEqual(response.data['done_count'], 1)
+
+    def test_recount(self):
+        Element.objects.bulk_create([Element(title = 'Extra', checklist = self.checklist, is_done = True)])
+        self.assertCounts(2, 5)
+        Card.objects.update(checklist_done_count = 0)
+        Checklist.objects.recount()
+        self.assertCounts(3, 6)
+        self.assertCardCounts(self.card, 3, 6)
+
+    def test_card_counters(self):
+        self.assertCardCounts(self.card, 2, 5)
+        second = Checklist.objects.create(card = self.card)
+        Element.objects.create(title = 'Extra', checklist = second, is_done = True)
+        self.assertCardCounts(self.card, 3, 6)
+        self.checklist.toggle([self.elements[-1].pk], True)
+        self.assertCardCounts(self.card, 4, 6)
+
+        # Saving the card doesn't write back the counters it loaded.
+        card = Card.objects.get(pk = self.card.pk)
+        Element.objects.create(title = 'Extra', checklist = second)
+        card.title = 'Renombrada'
+        card.save()
+        self.assertCardCounts(self.card, 4, 7)
+
+        other = Card.objects.create(title = 'Otra', lista = self.card.lista)
+        second.move(None, other.id)
+        self.assertCardCounts(self.card, 3, 5)
+        self.assertCardCounts(other, 1, 2)
+        second.delete()
+        self.assertCardCounts(other, 0, 0)
+
+
+class ChecklistOrderTest(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username = 'owner')
+        board = Board.objects.create(name = 'Board', owner = user, team = Team.objects.create(name = 'Team'))
+        self.card = Card.objects.create(title = 'Card', lista = List.objects.create(name = 'Lista', board = board))
+        self.checklist = Checklist.objects.create(card = self.card)
+        self.elements = [
+            Element.objects.create(title = 'Tarea {}'.format(index), checklist = self.checklist)
+            for index in range(4)
+        ]
+
+    def order(self, checklist=None):
+        return list((checklist or self.checklist).element_set.values_list('title', flat = True))
+
+    def test_new_rows_go_last(self):
+        self.assertEqual(self.order(), ['Tarea 0', 'Tarea 1', 'Tarea 2', 'Tarea 3'])
+        second = Checklist.objects.create(card = self.card)
+        self.assertEqual(list(self.card.checklists.all()), [self.checklist, second])
+
+    def test_move_writes_only_the_moved_row(self):
+        first, _, _, last = self.elements
+        ranks = dict(Element.objects.values_list('pk', 'rank'))
+        self.assertTrue(first.move(last.pk))
+        self.assertTrue(last.move(None))
+        self.assertEqual(self.order(), ['Tarea 3', 'Tarea 1', 'Tarea 2', 'Tarea 0'])
+        changed = [pk for pk, rank in Element.objects.values_list('pk', 'rank') if ranks[pk] != rank]
+        self.assertEqual(sorted(changed), sorted([first.pk, last.pk]))
+
+    def test_rebalances_without_room(self):
+        first, second, third, _ = self.elements
+        Element.objects.filter(pk__in = [first.pk, second.pk]).update(rank = 5)
+        Element.objects.filter(pk = third.pk).update(rank = 6)
+        self.assertTrue(self.elements[3].move(first.pk))
+        self.assertEqual(self.order(), ['Tarea 0', 'Tarea 3', 'Tarea 1', 'Tarea 2'])
+        ranks = list(self.checklist.element_set.values_list('rank', flat = True))
+        self.assertEqual(len(set(ranks)), 4)
+
+    def test_move_to_other_checklist(self):
+        other = Checklist.objects.create(card = self.card)
+        moved = Element.objects.create(title = 'Otra', checklist = other, is_done = True)
+        self.assertTrue(moved.move(self.elements[0].pk, self.checklist.pk))
+        self.assertEqual(self.order(), ['Tarea 0', 'Otra', 'Tarea 1', 'Tarea 2', 'Tarea 3'])
+        self.checklist.refresh_from_db()
+        self.assertEqual((self.checklist.done_count, self.checklist.total_count), (1, 5))
+        self.assertFalse(moved.move(self.elements[0].pk, other.pk))
+
+    def test_checklists_endpoint(self):
+        second = Checklist.objects.create(card = self.card, name = 'Segunda')
+        second.move(None)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username = 'owner'))
+        response = client.get('/api/cards/{}/checklists/'.format(self.card.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([checklist['name'] for checklist in response.data], ['Segunda', 'To do'])
+        self.assertEqual([element['title'] for element in response.data[1]['elements']], self.order())
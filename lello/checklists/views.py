@@ -1,12 +1,18 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.http import Http404
 
 from checklists.models import Checklist, Element
-from checklists.serializers import ChecklistSerializer, ElementSerializer
+from checklists.serializers import (
+    ChecklistSerializer, ChecklistMoveSerializer, ElementSerializer, ElementMoveSerializer, ElementToggleSerializer
+)
+from boards.deletion import check_not_deleting
 from users.permissions import APIPermissionClassFactory
+from lello.fast_serializers import serialize
+from lello.serializers import DynamicFieldsViewSetMixin
 from audits.models import Audit
 
 
@@ -27,6 +33,8 @@ class ChecklistViewSet(viewsets.ModelViewSet):
                     'partial_update': lambda user, obj, req: user.is_authenticated,
                     'destroy': lambda user, obj, req: user.is_authenticated,
                     'elements': lambda user, obj, req: user.is_authenticated,
+                    'toggle': lambda user, obj, req: user.is_authenticated,
+                    'move': lambda user, obj, req: user.is_authenticated,
                 }
             }
         ),
@@ -40,6 +48,10 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         )
         return super().create(request)
 
+    def perform_create(self, serializer):
+        check_not_deleting(serializer.validated_data['card'])
+        serializer.save()
+
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -56,13 +68,52 @@ class ChecklistViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def elements(self, request, pk=None):
         checklist = self.get_object()
-        elements = checklist.element_set.all()
+        elements = ElementSerializer.setup_queryset(checklist.element_set.all(), request)
+
+        return Response(
+            serialize(ElementSerializer, elements, self.get_serializer_context())
+        )
+
+    @action(detail=True, methods=['post'])
+    def toggle(self, request, pk=None):
+        # {"elements": [1, 2, 3], "is_done": true}: one UPDATE instead of a
+        # PATCH per element.
+        checklist = self.get_object()
+        data = ElementToggleSerializer(data = request.data)
+        data.is_valid(raise_exception = True)
+        checklist.toggle(data.validated_data['elements'], data.validated_data['is_done'])
+        Audit.objects.create(
+            httpMethod = request.method,
+            url = '/checklists/{}/toggle/'.format(checklist.id),
+            user = request.user
+        )
+        checklist.refresh_from_db(fields = ['done_count', 'total_count', 'updated_at'])
+
+        return Response(
+            ChecklistSerializer(checklist, context = self.get_serializer_context()).data
+        )
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        # {"after": 12, "card": 3}: only the moved checklist is written.
+        checklist = self.get_object()
+        data = ChecklistMoveSerializer(data = request.data)
+        data.is_valid(raise_exception = True)
+        card = data.validated_data.get('card')
+        check_not_deleting(card)
+        if not checklist.move(data.validated_data['after'], card.id if card else None):
+            raise ValidationError({'after': ['Not a checklist of the card.']})
+        Audit.objects.create(
+            httpMethod = request.method,
+            url = '/checklists/{}/move/'.format(checklist.id),
+            user = request.user
+        )
 
         return Response(
-            [ElementSerializer(element).data for element in elements]
+            ChecklistSerializer(checklist, context = self.get_serializer_context()).data
         )
 
-class ElementViewSet(viewsets.ModelViewSet):
+class ElementViewSet(DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Element.objects.all()
     serializer_class = ElementSerializer
     permission_classes = (
@@ -78,6 +129,7 @@ class ElementViewSet(viewsets.ModelViewSet):
                     'update': lambda user, obj, req: user.is_authenticated,
                     'partial_update': lambda user, obj, req: user.is_authenticated,
                     'destroy': lambda user, obj, req: user.is_authenticated,
+                    'move': lambda user, obj, req: user.is_authenticated,
                 }
             }
         ),
@@ -91,6 +143,10 @@ class ElementViewSet(viewsets.ModelViewSet):
         )
         return super().create(request)
 
+    def perform_create(self, serializer):
+        check_not_deleting(serializer.validated_data['checklist'])
+        serializer.save()
+
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -103,3 +159,23 @@ class ElementViewSet(viewsets.ModelViewSet):
         except Http404:
             pass
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        # {"after": 7, "checklist": 2}: only the moved element is written.
+        element = self.get_object()
+        data = ElementMoveSerializer(data = request.data)
+        data.is_valid(raise_exception = True)
+        checklist = data.validated_data.get('checklist')
+        check_not_deleting(checklist)
+        if not element.move(data.validated_data['after'], checklist.id if checklist else None):
+            raise ValidationError({'after': ['Not an element of the checklist.']})
+        Audit.objects.create(
+            httpMethod = request.method,
+            url = '/elements/{}/move/'.format(element.id),
+            user = request.user
+        )
+
+        return Response(
+            ElementSerializer(element, context = self.get_serializer_context()).data
+        )
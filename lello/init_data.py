@@ -1,13 +1,23 @@
-from django.http import JsonResponse
-
+import random
+import time
 from datetime import datetime, date, timedelta
 
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
 from users.models import UserDetail, Team, Member
-from boards.models import Board, List, Card
+from boards.models import Board, List, Card, Label
+from boards.services import bulk_create_with_ids
 from calendars.models import Calendar, Event
+from checklists.models import Checklist, Element
+from checklists.ranking import RANK_GAP
+from notifications.models import Notification
+from audits.models import Audit
 
-def create_initial_data(request):
+
+def create_initial_data():
 
     admin = User(
         username = "admin",
@@ -137,9 +147,237 @@ def create_initial_data(request):
         date = datetime.now(),
     )
 
-    data = {
-        'status': 'Ok',
-        'Data': 'Data imported',
-    }
+    return admin
+
+
+LABELS = (
+    ('Bug', '#e74c3c', Label.Priority.high),
+    ('Feature', '#3498db', Label.Priority.medium),
+    ('Mejora', '#2ecc71', Label.Priority.medium),
+    ('Docs', '#f1c40f', Label.Priority.low),
+    ('Urgente', '#8e44ad', Label.Priority.high),
+    ('Idea', '#95a5a6', Label.Priority.low),
+)
+
+AUDIT_URLS = ('/boards/{}/', '/lists/', '/cards/', '/checklists/', '/elements/')
+
+
+class SyntheticDataGenerator:
+    """
+    Generates synthetic tenants (teams with members, boards, lists, cards,
+    checklists, events, audits and notifications) with bulk inserts.
+
+    Every count is drawn from a seeded RNG, so the same options and seed
+    always produce the same shape of data. Work is committed one team at a
+    time to keep memory flat on multi-million row datasets.
+    """
+
+    def __init__(
+        self,
+        teams = 1,
+        users_per_team = 5,
+        boards_per_team = 3,
+        lists_per_board = 5,
+        cards_per_list = 20,
+        checklist_ratio = 0.3,
+        elements_per_checklist = 4,
+        events_per_board = 10,
+        audits_per_board = 50,
+        notifications_per_user = 10,
+        seed = 0,
+        prefix = 'synthetic',
+        batch_size = 1000,
+        log = None,
+    ):
+        self.teams = teams
+        self.users_per_team = users_per_team
+        self.boards_per_team = boards_per_team
+        self.lists_per_board = lists_per_board
+        self.cards_per_list = cards_per_list
+        self.checklist_ratio = checklist_ratio
+        self.elements_per_checklist = elements_per_checklist
+        self.events_per_board = events_per_board
+        self.audits_per_board = audits_per_board
+        self.notifications_per_user = notifications_per_user
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+        self.totals = {}
+
+    def _around(self, mean):
+        # Skewed counts: most containers are small, a few are very large,
+        # which is what real boards look like.
+        if mean <= 0:
+            return 0
+        return int(self.random.expovariate(1 / mean) + 0.5)
+
+    def _bulk(self, model, objs, queryset=None):
+        self.totals[model.__name__] = self.totals.get(model.__name__, 0) + len(objs)
+        if queryset is None:
+            return model.objects.bulk_create(objs, batch_size = self.batch_size)
+        return bulk_create_with_ids(model, objs, queryset, batch_size = self.batch_size)
+
+    def run(self):
+        started = time.time()
+        self.password = make_password('admin')
+
+        for team_index in range(self.teams):
+            with transaction.atomic():
+                self._team(team_index)
+            self.log('Team {}/{} done ({:.1f}s)'.format(
+                team_index + 1,
+                self.teams,
+                time.time() - started
+            ))
+
+        return self.totals
+
+    def _team(self, team_index):
+        rand = self.random
+        last_user = User.objects.order_by('-pk').values_list('pk', flat = True).first() or 0
+        users = self._bulk(
+            User,
+            [
+                User(
+                    username = '{}-t{}-u{}'.format(self.prefix, team_index, user_index),
+                    email = '{}-t{}-u{}@lello.test'.format(self.prefix, team_index, user_index),
+                    password = self.password,
+                )
+                for user_index in range(self.users_per_team)
+            ],
+            User.objects.filter(pk__gt = last_user),
+        )
+        self._bulk(UserDetail, [
+            UserDetail(user = user, gender = rand.choice('MF'))
+            for user in users
+        ])
+
+        team = Team.objects.create(name = '{} team {}'.format(self.prefix, team_index))
+        self._bulk(Member, [Member(team = team, user = user) for user in users])
+
+        boards = self._bulk(
+            Board,
+            [
+                Board(
+                    name = 'Board {}'.format(board_index),
+                    owner = rand.choice(users),
+                    is_private = rand.random() < 0.3,
+                    team = team,
+                )
+                for board_index in range(self.boards_per_team)
+            ],
+            Board.objects.filter(team = team),
+        )
+        calendars = self._bulk(
+            Calendar,
+            [Calendar(board = board) for board in boards],
+            Calendar.objects.filter(board__team = team),
+        )
+
+        labels = self._bulk(
+            Label,
+            [
+                Label(name = name, color = color, priority = priority, board = board)
+                for board in boards
+                for name, color, priority in LABELS
+            ],
+            Label.objects.filter(board__team = team),
+        )
+        board_labels = {}
+        for label in labels:
+            board_labels.setdefault(label.board_id, []).append(label)
+
+        lists = self._bulk(
+            List,
+            [
+                List(name = 'Lista {}'.format(list_index), board = board)
+                for board in boards
+                for list_index in range(max(1, self._around(self.lists_per_board)))
+            ],
+            List.objects.filter(board__team = team),
+        )
+
+        cards = self._bulk(
+            Card,
+            [
+                Card(
+                    title = 'Card {}'.format(card_index),
+                    lista = lista,
+                    number = card_index,
+                    hours_estimated = rand.randint(0, 40),
+                    hours_done = rand.randint(0, 20),
+                    deadline = (
+                        self.now + timedelta(days = rand.randint(-30, 60))
+                        if rand.random() < 0.5 else None
+                    ),
+                    label = rand.choice(board_labels[lista.board_id]) if rand.random() < 0.6 else None,
+                )
+                for lista in lists
+                for card_index in range(self._around(self.cards_per_list))
+            ],
+            Card.objects.filter(lista__board__team = team),
+        )
+
+        Assignment = Card.assigned_to.through
+        self._bulk(Assignment, [
+            Assignment(card = card, user = user)
+            for card in cards
+            if rand.random() < 0.5
+            for user in rand.sample(users, min(len(users), rand.randint(1, 2)))
+        ])
+
+        checklists = self._bulk(
+            Checklist,
+            [
+                Checklist(card = card, rank = RANK_GAP)
+                for card in cards
+                if rand.random() < self.checklist_ratio
+            ],
+            Checklist.objects.filter(card__lista__board__team = team),
+        )
+        self._bulk(Element, [
+            Element(
+                title = 'Tarea {}'.format(element_index),
+                checklist = checklist,
+                is_done = rand.random() < 0.4,
+                rank = (element_index + 1) * RANK_GAP,
+                assigned_to = rand.choice(users) if rand.random() < 0.3 else None,
+            )
+            for checklist in checklists
+            for element_index in range(max(1, self._around(self.elements_per_checklist)))
+        ])
+        # bulk_create skips Element.save(), which keeps the counters.
+        Checklist.objects.filter(card__lista__board__team = team).recount()
+
+        self._bulk(Event, [
+            Event(
+                calendar = calendar,
+                title = 'Evento {}'.format(event_index),
+                date = self.now + timedelta(days = rand.randint(-60, 60)),
+            )
+            for calendar in calendars
+            for event_index in range(self._around(self.events_per_board))
+        ])
+
+        self._bulk(Audit, [
+            Audit(
+                httpMethod = rand.choice(Audit.HttpMethod.values),
+                url = rand.choice(AUDIT_URLS).format(board.id),
+                user = rand.choice(users),
+                board = board,
+            )
+            for board in boards
+            for _ in range(self._around(self.audits_per_board))
+        ])
 
-    return JsonResponse(data)
+        self._bulk(Notification, [
+            Notification(
+                title = 'Notificacion {}'.format(notification_index),
+                transmitter = rand.choice(users),
+                receiver = user,
+            )
+            for user in users
+            for notification_index in range(self._around(self.notifications_per_user))
+        ])
@@ -0,0 +1,61 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import work, worker_name
+from lello.metrics import registry
+
+
+def run_worker(options, write):
+    # SIGTERM/SIGINT finish the running job and put the rest of the batch back.
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: stopping.append(signum))
+
+    worker = worker_name()
+    try:
+        count = work(
+            worker = worker,
+            batch_size = options['batch_size'],
+            interval = options['interval'],
+            once = options['once'],
+            stop = lambda: bool(stopping),
+        )
+    finally:
+        # Forked workers leave with os._exit(), which skips atexit.
+        registry.flush()
+        connections.close_all()
+    write('{}: {} jobs run'.format(worker, count))
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (jobs.queue) in one or more worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes to start')
+        parser.add_argument('--batch-size', type=int, help='Jobs claimed at a time; defaults to JOBS["BATCH_SIZE"]')
+        parser.add_argument('--interval', type=float, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Stop when no job is due instead of polling')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            run_worker(options, self.stdout.write)
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target = run_worker, args = (options, self.stdout.write))
+            for _ in range(options['processes'])
+        ]
+        for process in workers:
+            process.start()
+
+        # Ctrl-C reaches the whole process group; SIGTERM is passed on.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda signum, frame: [process.terminate() for process in workers])
+        for process in workers:
+            process.join()
@@ -0,0 +1,65 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    A call to a registered task (jobs.queue) waiting for a worker. Finished
+    jobs are deleted; failed ones stay with their last error.
+    """
+
+    class Status(models.TextChoices):
+        queued  = 'queued', _('Queued')
+        running = 'running', _('Running')
+        failed  = 'failed', _('Failed')
+
+    task = models.CharField(
+        max_length = 100
+    )
+    payload = models.JSONField(
+        default = dict,
+        encoder = DjangoJSONEncoder
+    )
+    # Higher runs first.
+    priority = models.SmallIntegerField(
+        default = 0
+    )
+    status = models.CharField(
+        choices = Status.choices,
+        max_length = 10,
+        default = Status.queued
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default = 0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default = 3
+    )
+    # Not before: later on retries.
+    run_at = models.DateTimeField(
+        default = timezone.now
+    )
+    locked_by = models.CharField(
+        max_length = 100,
+        blank = True
+    )
+    locked_at = models.DateTimeField(
+        null = True
+    )
+    last_error = models.TextField(
+        blank = True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add = True
+    )
+
+    class Meta:
+        indexes = [
+            # What workers claim next.
+            models.Index(fields = ['status', '-priority', 'run_at'], name = 'job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return '{} #{}'.format(self.task, self.pk)
@@ -0,0 +1,187 @@
+"""
+Database-backed job queue.
+
+Request handlers enqueue side effects (emails, notifications, calendar events,
+audits) as Job rows once the row they follow from is saved, inside the same
+transaction.atomic() block, and return; `manage.py run_jobs` workers run
+them. A failed request leaves no jobs behind. Tasks are plain functions
+registered with @task in the tasks.py module of each app:
+
+    @task(priority = 5)
+    def create_notification(title, description, transmitter_id, receiver_id):
+        ...
+
+    create_notification.delay(title = ..., ...)
+
+Arguments are stored as JSON, so tasks take ids, not model instances.
+
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED where the database
+supports it; elsewhere (SQLite) each candidate is taken with a conditional
+UPDATE only one worker can win. A job that raises is retried after
+RETRY_DELAY * 2 ** (attempts - 1) seconds until max_attempts, then left
+failed. Jobs of a worker that died are claimed again after LOCK_TIMEOUT.
+"""
+
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+from lello.metrics import job_duration, job_wait, jobs_enqueued, jobs_finished, registry
+
+
+DEFAULTS = {
+    # Run tasks right away in enqueue(), e.g. when developing without a worker.
+    'EAGER': False,
+    'BATCH_SIZE': 10,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'LOCK_TIMEOUT': 600,
+}
+
+tasks = {}
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'JOBS', {}))
+
+
+def task(name=None, priority=0, max_attempts=None):
+    """Registers a function as a task and adds func.delay(**kwargs) to enqueue it."""
+    def register(func):
+        func.task_name = name or '{}.{}'.format(func.__module__.split('.')[0], func.__name__)
+        func.delay = lambda **kwargs: enqueue(
+            func.task_name,
+            kwargs,
+            priority = priority,
+            max_attempts = max_attempts
+        )
+        tasks[func.task_name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, priority=0, max_attempts=None, run_at=None):
+    """Queues a call of the task `name`; returns the Job (None when run eagerly)."""
+    config = get_config()
+    jobs_enqueued.inc(task = name)
+    if config['EAGER']:
+        tasks[name](**(payload or {}))
+        return None
+    return Job.objects.create(
+        task = name,
+        payload = payload or {},
+        priority = priority,
+        max_attempts = max_attempts or config['MAX_ATTEMPTS'],
+        run_at = run_at or timezone.now()
+    )
+
+
+def worker_name():
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+def claim(worker, limit):
+    """Marks up to `limit` due jobs as running by `worker` and returns them."""
+    config = get_config()
+    now = timezone.now()
+    running = {
+        'status': Job.Status.running,
+        'locked_by': worker,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    due = Job.objects.filter(
+        Q(status = Job.Status.queued, run_at__lte = now) |
+        Q(status = Job.Status.running, locked_at__lt = now - timedelta(seconds = config['LOCK_TIMEOUT']))
+    ).order_by('-priority', 'run_at', 'pk')
+
+    using = router.db_for_write(Job)
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using = using):
+            pks = list(due.select_for_update(skip_locked = True).values_list('pk', flat = True)[:limit])
+            Job.objects.filter(pk__in = pks).update(**running)
+    else:
+        pks = [
+            pk for pk, status, locked_at in due.values_list('pk', 'status', 'locked_at')[:limit]
+            if Job.objects.filter(pk = pk, status = status, locked_at = locked_at).update(**running)
+        ]
+    return list(Job.objects.filter(pk__in = pks, locked_by = worker).order_by('-priority', 'run_at', 'pk'))
+
+
+def run_job(job):
+    """Runs a claimed job; returns 'done', 'retry' or 'failed'."""
+    config = get_config()
+    job_wait.observe(max(0, (job.locked_at - job.run_at).total_seconds()), task = job.task)
+    mine = Job.objects.filter(pk = job.pk, locked_by = job.locked_by)
+    start = time.perf_counter()
+    try:
+        func = tasks.get(job.task)
+        if func is None:
+            raise LookupError('Unknown task {}'.format(job.task))
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception as error:
+        if job.attempts < job.max_attempts:
+            result = 'retry'
+            mine.update(
+                status = Job.Status.queued,
+                run_at = timezone.now() + timedelta(seconds = config['RETRY_DELAY'] * 2 ** (job.attempts - 1)),
+                locked_by = '',
+                locked_at = None,
+                last_error = repr(error)
+            )
+        else:
+            result = 'failed'
+            mine.update(status = Job.Status.failed, last_error = repr(error))
+    else:
+        result = 'done'
+        mine.delete()
+    job_duration.observe(time.perf_counter() - start, task = job.task)
+    jobs_finished.inc(task = job.task, result = result)
+    return result
+
+
+def release(jobs):
+    """Puts claimed jobs that won't be run back in the queue, untouched."""
+    for job in jobs:
+        Job.objects.filter(pk = job.pk, locked_by = job.locked_by).update(
+            status = Job.Status.queued,
+            locked_by = '',
+            locked_at = None,
+            attempts = F('attempts') - 1
+        )
+
+
+def work(worker=None, batch_size=None, interval=None, once=False, stop=None):
+    """
+    Claims and runs jobs until `stop()` says so, or, with `once`, until the
+    queue has nothing due. Returns how many jobs ran.
+    """
+    config = get_config()
+    worker = worker or worker_name()
+    batch_size = batch_size or config['BATCH_SIZE']
+    interval = config['POLL_INTERVAL'] if interval is None else interval
+    stop = stop or (lambda: False)
+    count = 0
+    while not stop():
+        jobs = claim(worker, batch_size)
+        for index, job in enumerate(jobs):
+            if stop():
+                release(jobs[index:])
+                break
+            run_job(job)
+            count += 1
+        registry.maybe_flush()
+        if not jobs:
+            if once:
+                break
+            time.sleep(interval)
+    return count
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from boards.models import Board, List
+from calendars.models import Calendar, Event
+from jobs.models import Job
+from jobs.queue import claim, enqueue, run_job, task, work
+from notifications.models import Notification
+from audits.models import Audit
+from users.models import Team
+
+
+calls = []
+
+
+@task(name = 'jobs.tests.record')
+def record(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise ValueError(value)
+
+
+@override_settings(JOBS = dict(settings.JOBS, EAGER = False, RETRY_DELAY = 10, MAX_ATTEMPTS = 2))
+class QueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_priorities_and_claiming(self):
+        record.delay(value = 'low')
+        enqueue('jobs.tests.record', {'value': 'high'}, priority = 5)
+        enqueue('jobs.tests.record', {'value': 'later'}, run_at = timezone.now() + timedelta(hours = 1))
+
+        jobs = claim('worker-a', 10)
+        self.assertEqual([job.payload['value'] for job in jobs], ['high', 'low'])
+        self.assertEqual(claim('worker-b', 10), [])
+        for job in jobs:
+            self.assertEqual(run_job(job), 'done')
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_retries_then_fails(self):
+        record.delay(value = 'boom', fail = True)
+        [job] = claim('worker', 10)
+        self.assertEqual(run_job(job), 'retry')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.queued)
+        self.assertIn('boom', job.last_error)
+        self.assertEqual(claim('worker', 10), [])
+
+        Job.objects.update(run_at = timezone.now())
+        [job] = claim('worker', 10)
+        self.assertEqual(run_job(job), 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.failed, 2))
+
+    def test_abandoned_jobs_are_claimed_again(self):
+        record.delay(value = 'lost')
+        claim('dead-worker', 10)
+        Job.objects.update(locked_at = timezone.now() - timedelta(hours = 1))
+        self.assertEqual(work(worker = 'worker', once = True), 1)
+        self.assertEqual(calls, ['lost'])
+
+    def test_create_views_enqueue_side_effects(self):
+        user = User.objects.create(username = 'owner')
+        board = Board.objects.create(name = 'Board', owner = user, team = Team.objects.create(name = 'Team'))
+        calendar = Calendar.objects.create(board = board)
+        lista = List.objects.create(name = 'Lista', board = board)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post('/api/cards/', {'title': 'Card', 'lista': lista.pk}, format = 'json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(Job.objects.count(), 3)
+
+        self.assertEqual(work(worker = 'worker', once = True), 3)
+        self.assertEqual(Notification.objects.get().receiver, user)
+        self.assertEqual(Event.objects.get().calendar, calendar)
+        self.assertEqual(Audit.objects.get().board, board)
+        self.assertFalse(Job.objects.exists())
+
+    def test_invalid_payloads_enqueue_nothing(self):
+        user = User.objects.create(username = 'owner')
+        board = Board.objects.create(name = 'Board', owner = user, team = Team.objects.create(name = 'Team'))
+        Calendar.objects.create(board = board)
+        lista = List.objects.create(name = 'Lista', board = board)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post('/api/cards/', {'lista': lista.pk, 'title': 'x' * 1000}, format = 'json')
+        self.assertEqual(response.status_code, 400)
+        response = client.post('/api/lists/', {'board': board.pk}, format = 'json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+        response = client.post('/api/lists/', {'board': board.pk, 'name': 'Otra'}, format = 'json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Job.objects.count(), 2)
@@ -0,0 +1,46 @@
+from django.db import models, transaction
+from django.utils import timezone
+
+
+class LiveManager(models.Manager):
+    """Default manager of archivable models: hides archived rows."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_archived = False)
+
+
+class ArchivableMixin:
+    """
+    Soft delete for models with `is_archived` and `archived_at`, `objects =
+    LiveManager()` and `all_objects = models.Manager()`.
+
+    archive() flags the row and its live descendants (archived_descendants())
+    with one UPDATE per table and the same timestamp, which restore() uses to
+    bring back exactly that subtree: descendants archived on their own before
+    stay archived. Archived rows are hard-deleted later, in batches, by
+    `manage.py purge_archived`.
+    """
+
+    def archived_descendants(self):
+        return []
+
+    def _subtree(self):
+        return self.archived_descendants() + [type(self).all_objects.filter(pk = self.pk)]
+
+    def archive(self):
+        now = timezone.now()
+        with transaction.atomic(savepoint = False):
+            for queryset in self._subtree():
+                queryset.filter(is_archived = False).update(is_archived = True, archived_at = now)
+        self.is_archived = True
+        self.archived_at = now
+
+    def restore(self):
+        with transaction.atomic(savepoint = False):
+            for queryset in self._subtree():
+                queryset.filter(is_archived = True, archived_at = self.archived_at).update(
+                    is_archived = False,
+                    archived_at = None
+                )
+        self.is_archived = False
+        self.archived_at = None
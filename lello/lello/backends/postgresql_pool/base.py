@@ -0,0 +1,119 @@
+"""
+PostgreSQL backend that borrows connections from an in-process pool.
+
+Meant for the ASGI path, where every request may run on a different thread
+and CONN_MAX_AGE can't keep a connection warm: closing a Django connection
+hands the psycopg2 connection back to the pool instead of tearing it down.
+With CONN_HEALTH_CHECKS, connections are pinged on checkout and broken ones
+(database restart, network drop) are discarded, since ConnectionHealthMiddleware
+only looks after persistent connections.
+
+    DATABASES['default']['ENGINE'] = 'lello.backends.postgresql_pool'
+    DATABASES['default']['POOL'] = {'MIN_SIZE': 1, 'MAX_SIZE': 10, 'TIMEOUT': 5}
+"""
+
+import threading
+
+import psycopg2.extras
+from psycopg2 import extensions, pool
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+
+
+POOL_DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 5,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """ThreadedConnectionPool that waits for a free slot instead of failing."""
+
+    def __init__(self, min_size, max_size, timeout, health_checks=False, **conn_params):
+        self.pool = pool.ThreadedConnectionPool(min_size, max_size, **conn_params)
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_checks = health_checks
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError('Timed out waiting for a pooled database connection')
+        try:
+            # Every idle connection may have gone bad at once (database
+            # restart); past those, the pool opens a new one.
+            for _ in range(self.max_size):
+                connection = self.pool.getconn()
+                if self.is_usable(connection):
+                    return connection
+                self.pool.putconn(connection, close=True)
+            return self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def is_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def putconn(self, connection):
+        try:
+            status = None if connection.closed else connection.info.transaction_status
+            # Never hand out a connection in the middle of a transaction; a
+            # closed one or one in an unknown state is discarded.
+            if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+                connection.rollback()
+                status = extensions.TRANSACTION_STATUS_IDLE
+            self.pool.putconn(connection, close=status != extensions.TRANSACTION_STATUS_IDLE)
+        finally:
+            self.slots.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = dict(POOL_DEFAULTS, **self.settings_dict.get('POOL', {}))
+                _pools[self.alias] = ConnectionPool(
+                    options['MIN_SIZE'],
+                    options['MAX_SIZE'],
+                    options['TIMEOUT'],
+                    health_checks=self.settings_dict.get('CONN_HEALTH_CHECKS', False),
+                    **conn_params
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).getconn()
+
+        # Same setup as the stock backend does after psycopg2.connect().
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                _pools[self.alias].putconn(self.connection)
@@ -0,0 +1,84 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli when the client
+accepts it and the brotli package is installed, gzip otherwise. Responses
+smaller than COMPRESSION['MIN_SIZE'] bytes are sent as they are, compressing
+them costs more CPU than it saves on the wire.
+"""
+
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+}
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'COMPRESSION', {}))
+
+
+def accepted_encodings(header):
+    """Encodings of an Accept-Encoding header, without the ones with q=0."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        match = re.search(r'q=([0-9.]+)', params)
+        if match and float(match.group(1)) == 0:
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class CompressionMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        self.encoders = [('gzip', self.gzip)]
+        if brotli is not None:
+            self.encoders.insert(0, ('br', self.brotli))
+
+    def gzip(self, content):
+        return gzip.compress(content, compresslevel = self.config['GZIP_LEVEL'], mtime = 0)
+
+    def brotli(self, content):
+        return brotli.compress(content, quality = self.config['BROTLI_QUALITY'])
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.config['MIN_SIZE']:
+            return response
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        for encoding, compress in self.encoders:
+            if encoding in accepted:
+                break
+        else:
+            return response
+
+        compressed = compress(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The bytes differ from the uncompressed representation.
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
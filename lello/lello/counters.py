@@ -0,0 +1,17 @@
+class CounterFieldsMixin:
+    """
+    Model mixin for denormalized counters kept with F() updates: save() on an
+    existing row leaves `counter_fields` out of the UPDATE, otherwise it would
+    write back the values loaded with the instance and undo the F() updates
+    made since.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        return super().save(*args, **kwargs)
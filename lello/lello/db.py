@@ -0,0 +1,188 @@
+"""
+Database connection management: read-replica routing and connection
+health checks for persistent connections.
+"""
+
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+REPLICA_DEFAULTS = {
+    'PIN_SECONDS': 5,
+    'MAX_LAG_SECONDS': 2,
+    'LAG_CHECK_INTERVAL': 1,
+}
+
+_use_replica = contextvars.ContextVar('lello_use_replica', default=False)
+
+
+def get_config():
+    return dict(REPLICA_DEFAULTS, **getattr(settings, 'REPLICA_ROUTING', {}))
+
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA', None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica while the current request allows it (see
+    ReadReplicaMixin); everything else goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+LAG_QUERIES = {
+    'postgresql': (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+
+
+class ReplicaLag:
+    """Replica lag in seconds, measured at most once per check interval."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.value = None
+
+    def measure(self, alias):
+        connection = connections[alias]
+        query = LAG_QUERIES.get(connection.vendor)
+        if query is None:
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            row = cursor.fetchone()
+        return float(row[0] or 0)
+
+    def get(self, alias, interval):
+        now = time.monotonic()
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < interval:
+                # None: the first measurement is still running in another
+                # thread; stay on the primary until it's known.
+                return float('inf') if self.value is None else self.value
+            self.checked_at = now
+        try:
+            value = self.measure(alias)
+        except DatabaseError:
+            # Unreachable replica: treat as infinitely behind.
+            value = float('inf')
+        self.value = value
+        return value
+
+
+replica_lag = ReplicaLag()
+
+
+def _pin_key(user):
+    return 'lello:replica-pin:{}'.format(user.pk)
+
+
+class ReadReplicaMixin:
+    """
+    Viewset mixin that serves safe-method requests from the replica.
+
+    Reads stay on the primary when the replica is further behind than
+    MAX_LAG_SECONDS (or unreachable), and for PIN_SECONDS after the user's
+    last successful write (see ReplicaPinMiddleware) so they always read
+    their own writes.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.should_use_replica(request):
+            self._replica_token = _use_replica.set(True)
+
+    def should_use_replica(self, request):
+        alias = replica_alias()
+        if alias is None or request.method not in SAFE_METHODS:
+            return False
+        config = get_config()
+        user = request.user
+        if user.is_authenticated and cache.get(_pin_key(user)):
+            return False
+        return replica_lag.get(alias, config['LAG_CHECK_INTERVAL']) <= config['MAX_LAG_SECONDS']
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """
+    Pins the user's reads to the primary for PIN_SECONDS after any
+    successful write, whichever view handled it. Runs on the response, so it
+    sees the user DRF authenticated (JWT) as well as the session one.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (
+            request.method not in SAFE_METHODS and
+            response.status_code < 400 and
+            user is not None and
+            user.is_authenticated and
+            replica_alias() is not None
+        ):
+            cache.set(_pin_key(user), True, get_config()['PIN_SECONDS'])
+        return response
+
+
+class ConnectionHealthMiddleware:
+    """
+    Closes persistent connections that went bad (database restart, network
+    drop) before the request gets to use them, so Django opens a fresh one
+    instead of failing the request. Enabled per alias with
+    CONN_HEALTH_CHECKS, like the setting of the same name in Django 4.1+.
+    """
+
+    def __init__(self, get_response):
+        self.aliases = [
+            alias for alias, database in settings.DATABASES.items()
+            if database.get('CONN_HEALTH_CHECKS') and database.get('CONN_MAX_AGE')
+        ]
+        if not self.aliases:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for alias in self.aliases:
+            connection = connections[alias]
+            if connection.connection is not None and not connection.is_usable():
+                connection.close()
+        return self.get_response(request)
@@ -0,0 +1,264 @@
+"""
+Read-only fast path for serializing large querysets.
+
+A ValuesPlan is compiled once from a DRF serializer's fields and then builds
+the output straight from `.values()` rows: no model instances, no per-field
+get_attribute() calls and no OrderedDicts, while keeping the exact output of
+the serializer it was built from (same keys, order and value formatting).
+Foreign keys come out as ids, nested serializers of a foreign key and dotted
+sources through foreign keys (like a card's `lista.name`) are joined
+into the same query, many-to-many ids and nested reverse relations (like a
+list's card_set) take one extra query each, never one per row.
+
+serialize() falls back to the regular serializer for anything the plan can't
+reproduce, e.g. expanded many-to-many relations.
+"""
+
+import threading
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.settings import api_settings
+
+from lello.instrumentation import serializer_timer
+
+
+# Fields whose to_representation() returns database values unchanged.
+PASSTHROUGH_FIELDS = (
+    drf_fields.CharField,
+    drf_fields.IntegerField,
+    drf_fields.BooleanField,
+    drf_fields.FloatField,
+    drf_fields.ChoiceField,
+    drf_fields.ReadOnlyField,
+)
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def _converter(field):
+    """
+    Function turning a database value into the field's representation, made
+    once per serialize() call so per-request state (the active timezone) is
+    looked up once instead of once per value.
+    """
+    iso = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if not isinstance(field, drf_fields.DateTimeField) or iso is None or iso.lower() != ISO_8601:
+        return field.to_representation
+
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+    if field_timezone is None:
+        return field.to_representation
+
+    def datetime_representation(value):
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return datetime_representation
+
+
+class ValuesPlan:
+
+    def __init__(self, serializer, prefix=''):
+        self.model = serializer.Meta.model
+        self.prefix = prefix
+        self.pk = prefix + 'pk'
+        self.lookups = [self.pk]
+        # One step per output key, in serializer order:
+        # ('column', key, lookup, DRF field or None when values pass through),
+        # ('nested', key, plan) or ('related', key) for relations loaded with
+        # their own query.
+        self.steps = []
+        self.related = []
+
+        # Custom representations can't be reproduced from the field list.
+        custom = type(serializer).to_representation is not serializers.Serializer.to_representation
+        if custom and not getattr(serializer, 'plain_representation', False):
+            raise UnsupportedField('to_representation')
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == '*':
+                raise UnsupportedField(name)
+            try:
+                self.add_field(name, field, source)
+            except (FieldDoesNotExist, AttributeError):
+                # properties, methods, ...
+                raise UnsupportedField(name)
+
+    def add_field(self, name, field, source):
+        prefix = self.prefix
+        if '.' in source and isinstance(field, (relations.RelatedField, relations.ManyRelatedField, serializers.BaseSerializer)):
+            raise UnsupportedField(name)
+        if isinstance(field, relations.ManyRelatedField):
+            if prefix:
+                raise UnsupportedField(name)
+            model_field = self.model._meta.get_field(source)
+            self.related.append((name, 'm2m', model_field))
+            self.steps.append(('related', name))
+        elif isinstance(field, serializers.ListSerializer):
+            if prefix:
+                raise UnsupportedField(name)
+            rel = getattr(self.model, source).rel
+            if rel.many_to_many:
+                raise UnsupportedField(name)
+            remote = rel.field
+            child = ValuesPlan(field.child)
+            if remote.attname not in child.lookups:
+                child.lookups.append(remote.attname)
+            self.related.append((name, 'reverse', (remote, child, source)))
+            self.steps.append(('related', name))
+        elif isinstance(field, relations.RelatedField):
+            model_field = self.model._meta.get_field(source)
+            lookup = prefix + model_field.attname
+            self.lookups.append(lookup)
+            self.steps.append(('column', name, lookup, None))
+        elif isinstance(field, serializers.Serializer):
+            model_field = self.model._meta.get_field(source)
+            if not model_field.many_to_one and not model_field.one_to_one:
+                raise UnsupportedField(name)
+            nested = ValuesPlan(field, prefix + source + '__')
+            self.lookups.extend(nested.lookups)
+            self.steps.append(('nested', name, nested))
+        else:
+            lookup = prefix + self.lookup_path(source)
+            self.lookups.append(lookup)
+            self.steps.append(('column', name, lookup, None if isinstance(field, PASSTHROUGH_FIELDS) else field))
+
+    def lookup_path(self, source):
+        """values() lookup of a source, dotted through foreign keys and one-to-ones."""
+        model = self.model
+        parts = source.split('.')
+        for part in parts[:-1]:
+            model_field = model._meta.get_field(part)
+            if not model_field.many_to_one and not model_field.one_to_one:
+                raise UnsupportedField(source)
+            model = model_field.related_model
+        model._meta.get_field(parts[-1])
+        return '__'.join(parts)
+
+    def converters(self):
+        """lookup -> converter for every column that needs one, nested plans included."""
+        converters = {}
+        for step in self.steps:
+            if step[0] == 'column' and step[3] is not None:
+                converters[step[2]] = _converter(step[3])
+            elif step[0] == 'nested':
+                converters.update(step[2].converters())
+        return converters
+
+    def build(self, row, related, converters):
+        if row[self.pk] is None:
+            return None
+        item = {}
+        for step in self.steps:
+            kind, name = step[0], step[1]
+            if kind == 'column':
+                value = row[step[2]]
+                if value is not None and step[3] is not None:
+                    value = converters[step[2]](value)
+                item[name] = value
+            elif kind == 'nested':
+                item[name] = step[2].build(row, None, converters)
+            else:
+                item[name] = related[name].get(row[self.pk], [])
+        return item
+
+    def load_related(self, queryset, querysets=None):
+        """
+        Per relation, a dict of row pk -> list of values, in one query each.
+        `querysets` (source -> queryset) replaces the related manager of
+        nested reverse relations, e.g. to filter a list's cards.
+        """
+        querysets = querysets or {}
+        loaded = {}
+        pks = queryset.values('pk')
+        for name, kind, data in self.related:
+            grouped = defaultdict(list)
+            if kind == 'm2m':
+                through = data.remote_field.through
+                source, target = data.m2m_field_name(), data.m2m_reverse_field_name()
+                # Ordered like the related manager reads them through the
+                # (source, target) unique index.
+                rows = through.objects.filter(
+                    **{source + '__in': pks}
+                ).order_by(target).values_list(source, target)
+                for owner, value in rows:
+                    grouped[owner].append(value)
+            else:
+                remote, child, source = data
+                children = querysets.get(source, child.model._default_manager.all())
+                children = children.prefetch_related(None).select_related(None).filter(**{remote.name + '__in': pks})
+                for owner, item in child.serialize_with_keys(children, remote.attname):
+                    grouped[owner].append(item)
+            loaded[name] = grouped
+        return loaded
+
+    def serialize_with_keys(self, queryset, key):
+        rows = list(queryset.values(*self.lookups))
+        related = self.load_related(queryset)
+        converters = self.converters()
+        return [(row[key], self.build(row, related, converters)) for row in rows]
+
+    def serialize(self, queryset, related=None):
+        queryset = queryset.prefetch_related(None).select_related(None)
+        rows = list(queryset.values(*self.lookups))
+        related = self.load_related(queryset, related) if self.related else None
+        converters = self.converters()
+        return [self.build(row, related, converters) for row in rows]
+
+
+_plans = {}
+_lock = threading.Lock()
+
+
+def get_plan(serializer):
+    """The cached plan of a serializer instance (None when unsupported)."""
+    key = (type(serializer),) + tuple(
+        (name, type(field), getattr(field, 'child', None).__class__)
+        for name, field in serializer.fields.items()
+    )
+    try:
+        return _plans[key]
+    except KeyError:
+        pass
+    try:
+        plan = ValuesPlan(serializer)
+    except UnsupportedField:
+        plan = None
+    with _lock:
+        _plans[key] = plan
+    return plan
+
+
+def serialize(serializer_class, queryset, context=None, related=None):
+    """
+    Same as serializer_class(queryset, many=True, context=context).data for
+    read requests, built from .values() rows when the serializer allows it.
+    `related` (source -> queryset) narrows nested reverse relations, like
+    Prefetch(source, queryset) would. The .values() path never touches
+    Serializer.data, so it is timed here for lello.instrumentation.
+    """
+    serializer = serializer_class(context = context or {})
+    plan = get_plan(serializer)
+    if plan is None:
+        if related:
+            queryset = queryset.prefetch_related(*(
+                Prefetch(source, queryset = related_queryset) for source, related_queryset in related.items()
+            ))
+        return serializer_class(queryset, many = True, context = context or {}).data
+    with serializer_timer():
+        return plan.serialize(queryset, related)
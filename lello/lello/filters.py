@@ -0,0 +1,17 @@
+from django_filters.utils import translate_validation
+
+
+def filter_queryset(filterset_class, queryset, request, data=None):
+    """
+    What DjangoFilterBackend does for a viewset's queryset, for the querysets
+    of custom actions (which are of other models): filters with the query
+    parameters (or `data`) and answers 400 on invalid values.
+    """
+    filterset = filterset_class(
+        request.query_params if data is None else data,
+        queryset = queryset,
+        request = request
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
@@ -0,0 +1,186 @@
+"""
+Opt-in per-request instrumentation.
+
+Enable it with INSTRUMENTATION['ENABLED'] in settings. Every request then gets
+a Server-Timing header and one structured log line on the
+'lello.instrumentation' logger with wall time, DB query count and time,
+serializer time and cache hits. A sample of requests can be run under
+cProfile; the ones slower than SLOW_REQUEST_MS are dumped to PROFILE_DIR.
+"""
+
+import cProfile
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+
+logger = logging.getLogger('lello.instrumentation')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SLOW_REQUEST_MS': 500,
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_DIR': 'profiles',
+}
+
+_current = contextvars.ContextVar('lello_instrumentation', default=None)
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'INSTRUMENTATION', {}))
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.in_serializer = False
+
+
+def current_metrics():
+    """Metrics of the request being handled, or None when not instrumented."""
+    return _current.get()
+
+
+def record_cache(hit):
+    """Count a cache lookup for the current request (no-op when disabled)."""
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def _query_timer(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Counts the block as serializer time of the current request; nested
+    blocks (a serializer inside another) are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.in_serializer:
+        yield
+        return
+    metrics.in_serializer = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.in_serializer = False
+
+
+def _timed_data(prop):
+    def data(self):
+        with serializer_timer():
+            return prop.fget(self)
+    data._instrumented = True
+    return property(data)
+
+
+def _instrument_serializers():
+    # DRF exposes serialization through the `data` property; wrapping it once
+    # catches both viewset responses and the serializers built by hand inside
+    # custom actions.
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, '_instrumented', False):
+            cls.data = _timed_data(cls.data)
+
+
+class InstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        _instrument_serializers()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+
+        profiler = None
+        if random.random() < self.config['PROFILE_SAMPLE_RATE']:
+            profiler = cProfile.Profile()
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_query_timer))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+        total = (time.perf_counter() - start) * 1000
+
+        response['Server-Timing'] = ', '.join([
+            'total;dur={:.1f}'.format(total),
+            'db;dur={:.1f};desc="{} queries"'.format(metrics.db_time * 1000, metrics.queries),
+            'serialize;dur={:.1f}'.format(metrics.serializer_time * 1000),
+            'cache;desc="{} hits, {} misses"'.format(metrics.cache_hits, metrics.cache_misses),
+        ])
+
+        match = getattr(request, 'resolver_match', None)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(total, 2),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'serializer_ms': round(metrics.serializer_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }))
+
+        if profiler and total >= self.config['SLOW_REQUEST_MS']:
+            self.dump_profile(profiler, request, total)
+
+        return response
+
+    def dump_profile(self, profiler, request, total):
+        directory = self.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = '{}-{}-{}-{:.0f}ms.prof'.format(
+            time.strftime('%Y%m%d-%H%M%S'),
+            request.method,
+            request.path.strip('/').replace('/', '_') or 'root',
+            total,
+        )
+        profiler.dump_stats(os.path.join(directory, name))
+
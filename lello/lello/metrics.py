@@ -0,0 +1,409 @@
+"""
+In-process metrics with a Prometheus text exposition endpoint.
+
+Counters and fixed-bucket histograms live in plain dicts guarded by one lock
+per metric; an update is a dict lookup and an addition. With several worker
+processes set METRICS['MULTIPROCESS_DIR']: every process periodically dumps
+its values to its own metrics-<pid>.json there and /metrics sums all the
+files. The files of processes that are gone are folded into
+metrics-exited.json, so totals survive worker restarts without the directory
+growing; pids are checked on the local host, so the directory must not be
+shared between machines or containers.
+
+/metrics answers staff users, the addresses in METRICS['ALLOWED_IPS'] and
+requests carrying `Authorization: Bearer <METRICS['TOKEN']>`.
+"""
+
+import atexit
+import bisect
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_INTERVAL': 1.0,
+    'ALLOWED_IPS': [],
+    'TOKEN': None,
+}
+
+EXITED = 'metrics-exited.json'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'METRICS', {}))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def _series(self, labels):
+        key = self._key(labels)
+        try:
+            return key, self.values[key]
+        except KeyError:
+            with self.lock:
+                return key, self.values.setdefault(key, self._new_value())
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(
+            '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+            for name, value in pairs
+        ) + '}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_value(self):
+        return 0.0
+
+    def inc(self, amount=1, **labels):
+        key, _ = self._series(labels)
+        with self.lock:
+            self.values[key] += amount
+
+    def merge(self, values, other):
+        for key, value in other.items():
+            values[key] = values.get(key, 0.0) + value
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            yield '{}{} {}'.format(self.name, self._format_labels(key), value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_value(self):
+        # One slot per bucket plus +Inf, then sum.
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value, **labels):
+        _, series = self._series(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series[index] += 1
+            series[-1] += value
+
+    def merge(self, values, other):
+        for key, series in other.items():
+            current = values.setdefault(key, self._new_value())
+            for index, value in enumerate(series):
+                current[index] += value
+
+    def render(self, values):
+        for key, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                yield '{}_bucket{} {}'.format(
+                    self.name,
+                    self._format_labels(key, [('le', str(bound))]),
+                    cumulative,
+                )
+            yield '{}_sum{} {}'.format(self.name, self._format_labels(key), series[-1])
+            yield '{}_count{} {}'.format(self.name, self._format_labels(key), cumulative)
+
+
+def _write(path, snapshot):
+    temporary = '{}.tmp'.format(path)
+    with open(temporary, 'w') as output:
+        json.dump(snapshot, output)
+    os.replace(temporary, path)
+
+
+def _read(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return {}
+
+
+def _pid(filename):
+    """Pid of a metrics-<pid>.json file, None for any other file."""
+    if filename.startswith('metrics-') and filename.endswith('.json'):
+        pid = filename[len('metrics-'):-len('.json')]
+        if pid.isdigit():
+            return int(pid)
+    return None
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user.
+        return True
+    return True
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def snapshot(self):
+        snapshot = {}
+        for name, metric in self.metrics.items():
+            with metric.lock:
+                snapshot[name] = {json.dumps(key): value for key, value in metric.values.items()}
+        return snapshot
+
+    def merge(self, total, snapshot):
+        """Adds snapshot (as written by flush) to total, in place."""
+        for name, values in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is not None:
+                metric.merge(total.setdefault(name, {}), values)
+        return total
+
+    def flush(self, directory=None):
+        directory = directory or get_config()['MULTIPROCESS_DIR']
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'metrics-{}.json'.format(os.getpid()))
+        _write(path, self.snapshot())
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        config = get_config()
+        if config['MULTIPROCESS_DIR'] and time.monotonic() - self.last_flush >= config['FLUSH_INTERVAL']:
+            self.flush(config['MULTIPROCESS_DIR'])
+
+    def collect(self):
+        """Values of every metric, summed over all processes when configured."""
+        directory = get_config()['MULTIPROCESS_DIR']
+        if not directory:
+            return {name: dict(metric.values) for name, metric in self.metrics.items()}
+
+        self.flush(directory)
+        self.compact(directory)
+        total = {}
+        for filename in os.listdir(directory):
+            if filename.endswith('.json'):
+                self.merge(total, _read(os.path.join(directory, filename)))
+        return {
+            name: {tuple(json.loads(key)): value for key, value in total.get(name, {}).items()}
+            for name in self.metrics
+        }
+
+    def compact(self, directory):
+        """Folds the files of processes that are no longer running into EXITED."""
+        with open(os.path.join(directory, '.lock'), 'a') as lock:
+            # Two processes folding the same file would count it twice.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                exited = [
+                    filename for filename in os.listdir(directory)
+                    if _pid(filename) is not None and not _running(_pid(filename))
+                ]
+                if not exited:
+                    return
+                path = os.path.join(directory, EXITED)
+                total = self.merge({}, _read(path))
+                for filename in exited:
+                    self.merge(total, _read(os.path.join(directory, filename)))
+                _write(path, total)
+                for filename in exited:
+                    os.remove(os.path.join(directory, filename))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def render(self):
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append('# HELP {} {}'.format(name, metric.help))
+            lines.append('# TYPE {} {}'.format(name, metric.kind))
+            lines.extend(metric.render(values))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'lello_http_requests_total',
+    'HTTP requests by route, viewset action and status.',
+    ('view', 'action', 'method', 'status'),
+)
+http_errors = registry.counter(
+    'lello_http_errors_total',
+    'Requests answered with a 5xx status or an unhandled exception.',
+    ('view', 'method'),
+)
+http_duration = registry.histogram(
+    'lello_http_request_duration_seconds',
+    'Request wall time by route and viewset action.',
+    ('view', 'action', 'method'),
+)
+db_duration = registry.histogram(
+    'lello_db_time_seconds',
+    'Time spent in database queries per request.',
+    ('view',),
+)
+permission_checks = registry.counter(
+    'lello_permission_checks_total',
+    'APIPermission decisions.',
+    ('permission', 'action', 'level', 'result'),
+)
+audits_created = registry.counter(
+    'lello_audits_created_total',
+    'Audit rows inserted.',
+    ('method',),
+)
+audits_archived = registry.counter(
+    'lello_audits_archived_total',
+    'Audit rows moved to the archive by the retention command.',
+    ('method',),
+)
+notifications_created = registry.counter(
+    'lello_notifications_created_total',
+    'Notification rows inserted.',
+)
+email_duration = registry.histogram(
+    'lello_email_send_duration_seconds',
+    'Time spent sending emails.',
+    ('result',),
+)
+jobs_enqueued = registry.counter(
+    'lello_jobs_enqueued_total',
+    'Background jobs queued (jobs.queue).',
+    ('task',),
+)
+jobs_finished = registry.counter(
+    'lello_jobs_finished_total',
+    'Background job runs, by result: done, retry or failed.',
+    ('task', 'result'),
+)
+job_duration = registry.histogram(
+    'lello_job_duration_seconds',
+    'Time spent running background jobs.',
+    ('task',),
+)
+job_wait = registry.histogram(
+    'lello_job_wait_seconds',
+    'Time background jobs waited in the queue once due.',
+    ('task',),
+    buckets = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+)
+
+atexit.register(registry.flush)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched', ''
+    # Viewsets routed by DRF keep their method -> action mapping on the view.
+    actions = getattr(match.func, 'actions', None) or {}
+    return match.view_name or match.url_name or '', actions.get(request.method.lower(), '')
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        if not get_config()['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_time = [0.0]
+
+        def query_timer(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_time[0] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        status = 500
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(query_timer))
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            view, action = _route(request)
+            http_requests.inc(view = view, action = action, method = request.method, status = status)
+            http_duration.observe(elapsed, view = view, action = action, method = request.method)
+            db_duration.observe(db_time[0], view = view)
+            if status >= 500:
+                http_errors.inc(view = view, method = request.method)
+            registry.maybe_flush()
+
+
+def _allowed(request, config):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    # REMOTE_ADDR: behind a proxy, the address of the proxy.
+    if request.META.get('REMOTE_ADDR') in config['ALLOWED_IPS']:
+        return True
+    token = config['TOKEN']
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(authorization, 'Bearer {}'.format(token))
+
+
+def metrics_view(request):
+    config = get_config()
+    if not config['ENABLED']:
+        raise Http404()
+    if not _allowed(request, config):
+        raise PermissionDenied()
+    return HttpResponse(
+        registry.render(),
+        content_type = 'text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,70 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _query_list(request, param):
+    """Comma separated values of a query parameter on read requests, else None."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer whose output the client can shape on read requests:
+
+    - ?fields=id,name keeps only those top-level fields.
+    - ?expand=label,assigned_to replaces those relations (the ones listed in
+      `expandable_fields`) with the nested object instead of its id.
+
+    Unknown names are ignored; writes always use the plain fields. Querysets
+    passed through setup_queryset() get the select_related/prefetch_related
+    the requested expansions need.
+    """
+
+    # field name -> (serializer class, extra kwargs)
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+
+        for name in self.requested_expansions(request):
+            serializer_class, options = self.expandable_fields[name]
+            self.fields[name] = serializer_class(read_only = True, **options)
+
+        requested = _query_list(request, 'fields')
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_expansions(cls, request):
+        requested = _query_list(request, 'expand') or set()
+        return sorted(requested & set(cls.expandable_fields))
+
+    @classmethod
+    def setup_queryset(cls, queryset, request):
+        for name in cls.requested_expansions(request):
+            field = queryset.model._meta.get_field(name)
+            if field.many_to_many or field.one_to_many:
+                queryset = queryset.prefetch_related(name)
+            else:
+                queryset = queryset.select_related(name)
+
+            # Many-to-many ids inside the nested object (e.g. team members).
+            serializer_class = cls.expandable_fields[name][0]
+            for nested in serializer_class().fields.values():
+                if isinstance(nested, serializers.ManyRelatedField):
+                    queryset = queryset.prefetch_related('{}__{}'.format(name, nested.source))
+        return queryset
+
+
+class DynamicFieldsViewSetMixin:
+    """Prepares the viewset queryset for the expansions of the request."""
+
+    def get_queryset(self):
+        return self.get_serializer_class().setup_queryset(super().get_queryset(), self.request)
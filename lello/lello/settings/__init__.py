@@ -0,0 +1,11 @@
+"""
+Settings are layered: base.py holds everything shared and each profile module
+overrides what it needs. LELLO_ENV picks the profile, development by default.
+"""
+
+import os
+
+if os.environ.get('LELLO_ENV', 'development') == 'production':
+    from .production import *
+else:
+    from .development import *
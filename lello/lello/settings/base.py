@@ -0,0 +1,377 @@
+"""
+Django settings for lello project, shared by every profile (see __init__.py).
+
+Generated by 'django-admin startproject' using Django 3.0.6.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.0/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/3.0/ref/settings/
+"""
+
+import os
+import datetime
+
+try:
+    # Local database settings, see README. Every value can be overridden with
+    # the LELLO_DB_* environment variables below.
+    from credentials import DEVELOPMENT_DATABASE
+except ImportError:
+    DEVELOPMENT_DATABASE = {}
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name, default=()):
+    value = os.environ.get(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/3.0/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.environ.get('LELLO_SECRET_KEY', 'f(y_s-!ov@svy&jv1#!wrr*9un)p%^d9i7f0=sw*)nxse21&#g')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+# With DEBUG on Django keeps every SQL query of the request in memory.
+DEBUG = env_bool('LELLO_DEBUG', False)
+
+ALLOWED_HOSTS = env_list('LELLO_ALLOWED_HOSTS')
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+
+    'rest_framework',
+    'django_filters',
+    'guardian',
+    'corsheaders',
+
+    'audits.apps.AuditsConfig',
+    'boards.apps.BoardsConfig',
+    'calendars.apps.CalendarsConfig',
+    'checklists.apps.ChecklistsConfig',
+    'notifications.apps.NotificationsConfig',
+    'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
+]
+
+MIDDLEWARE = [
+    'lello.metrics.MetricsMiddleware',
+    'lello.instrumentation.InstrumentationMiddleware',
+    'lello.db.ConnectionHealthMiddleware',
+    'lello.db.ReplicaPinMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+# Only the admin and the browsable API's session login need these; the API
+# itself authenticates with JWT. LELLO_API_ONLY=1 leaves them out of the
+# process (run the admin from a separate one without the flag).
+API_ONLY = env_bool('LELLO_API_ONLY', False)
+
+BROWSER_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+]
+
+BROWSER_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in BROWSER_APPS]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in BROWSER_MIDDLEWARE]
+
+ROOT_URLCONF = 'lello.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'lello.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/3.0/ref/settings/#databases
+
+# Connections are kept open for LELLO_DB_CONN_MAX_AGE seconds and checked
+# before each request. LELLO_DB_POOL=1 switches to an in-process pool instead
+# (for ASGI, where requests don't reuse threads); LELLO_DB_REPLICA_HOST adds a
+# read replica that serves safe requests of viewsets using ReadReplicaMixin
+# (lello/db.py).
+DB_POOL = os.environ.get('LELLO_DB_POOL') == '1'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'lello.backends.postgresql_pool' if DB_POOL else 'django.db.backends.postgresql',
+        'NAME': os.environ.get('LELLO_DB_NAME', DEVELOPMENT_DATABASE.get('NAME', 'lello')),
+        'USER': os.environ.get('LELLO_DB_USER', DEVELOPMENT_DATABASE.get('USER', '')),
+        'PASSWORD': os.environ.get('LELLO_DB_PASSWORD', DEVELOPMENT_DATABASE.get('PASSWORD', '')),
+        'HOST': os.environ.get('LELLO_DB_HOST', DEVELOPMENT_DATABASE.get('HOST', 'localhost')),
+        'PORT': os.environ.get('LELLO_DB_PORT', DEVELOPMENT_DATABASE.get('PORT', '5432')),
+        # Pooled connections go back to the pool at the end of each request.
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('LELLO_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('LELLO_DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.environ.get('LELLO_DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': 5,
+        },
+    }
+}
+
+if os.environ.get('LELLO_DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST = os.environ['LELLO_DB_REPLICA_HOST'],
+        PORT = os.environ.get('LELLO_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        TEST = {'MIRROR': 'default'},
+    )
+
+DATABASE_REPLICA = 'replica'
+REPLICA_ROUTING = {
+    'PIN_SECONDS': 5,
+    'MAX_LAG_SECONDS': 2,
+    'LAG_CHECK_INTERVAL': 1,
+}
+DATABASE_ROUTERS = ['lello.db.ReplicaRouter']
+
+
+# Password validation
+# https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/3.0/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/3.0/howto/static-files/
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.environ.get('LELLO_STATIC_ROOT', os.path.join(BASE_DIR, 'static'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+LOGIN_URL = "/"
+LOGIN_REDIRECT_URL = "home"
+LOGOUT_REDIRECT_URL = "/"
+
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': [
+        # 'rest_framework.permissions.AllowAny',
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'users.authentication.CachedJSONWebTokenAuthentication',
+        # 'rest_framework.authentication.SessionAuthentication',
+        # 'rest_framework.authentication.BasicAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'lello.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Viewsets with a filterset_class filter their list by query parameters.
+    'DEFAULT_FILTER_BACKENDS': [
+        'django_filters.rest_framework.DjangoFilterBackend',
+    ],
+}
+
+if API_ONLY:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['lello.renderers.FastJSONRenderer']
+
+# Days audits are kept per HTTP method (None keeps them forever); expired rows
+# are moved to ARCHIVE_DIR by `manage.py archive_audits`. See audits.retention.
+AUDIT_RETENTION = {
+    'TTL_DAYS': {
+        'GET': 30,
+        'POST': 365,
+        'PUT': 365,
+        'PATCH': 365,
+        'DELETE': 730,
+    },
+    'DEFAULT_TTL_DAYS': 365,
+    'ARCHIVE_DIR': os.environ.get('LELLO_AUDIT_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive', 'audits')),
+    'BATCH_SIZE': 1000,
+    'PARTITION_MONTHS_AHEAD': 3,
+}
+
+# New audits are hash-chained per board; `manage.py verify_audits` checks the
+# chains from their last checkpoint. See audits.integrity.
+AUDIT_INTEGRITY = {
+    'ENABLED': env_bool('LELLO_AUDIT_CHAIN', True),
+    'VERIFY_CHUNK_SIZE': 10000,
+    # Audits without board are chained by user over this many chains.
+    'UNBOARDED_CHAINS': 16,
+}
+
+# Deleted boards, lists and cards are archived (lello.archive);
+# `manage.py purge_archived` deletes them for good after AFTER_DAYS. See
+# boards.purge.
+ARCHIVE_PURGE = {
+    'AFTER_DAYS': 30,
+    'BATCH_SIZE': 500,
+}
+
+# Deleting a team (or a board with ?permanent=true) is done in the background
+# by `manage.py run_deletions`, BATCH_SIZE rows per statement. See
+# boards.deletion.
+CASCADE_DELETION = {
+    'BATCH_SIZE': 1000,
+    'PAUSE': 0,
+    'LOCK_TIMEOUT': 600,
+}
+
+# Used by lello.compression.CompressionMiddleware (enabled in production)
+COMPRESSION = {
+    'MIN_SIZE': int(os.environ.get('LELLO_COMPRESSION_MIN_SIZE', 1024)),
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+}
+
+JWT_AUTH = {
+    'JWT_ALLOW_REFRESH': True,
+    'JWT_EXPIRATION_DELTA': datetime.timedelta(seconds=1800),
+    'JWT_PAYLOAD_HANDLER': 'users.authentication.jwt_payload_handler',
+}
+
+# Users resolved from JWTs are kept in memory per process, see users/authentication.py
+JWT_USER_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,
+}
+
+AUTHENTICATION_BACKENDS = (
+    'django.contrib.auth.backends.ModelBackend',
+    'guardian.backends.ObjectPermissionBackend'
+)
+
+CORS_ORIGIN_ALLOW_ALL = True
+
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = 'smtp.gmail.com'
+EMAIL_USE_TLS = True
+EMAIL_PORT = 587
+# EMAIL_HOST_USER = 'lelloinc@hotmail.com'
+EMAIL_HOST_USER = 'lellodjango@gmail.com'
+EMAIL_HOST_PASSWORD = os.environ.get('LELLO_EMAIL_PASSWORD', 'lelloadmin123')
+
+# Per-request timing (Server-Timing header + log line), see lello/instrumentation.py
+INSTRUMENTATION = {
+    'ENABLED': False,
+    'SLOW_REQUEST_MS': 500,
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_DIR': os.path.join(BASE_DIR, 'profiles'),
+}
+
+# Side effects of requests (emails, notifications, events, audits) are queued
+# and run by `manage.py run_jobs`, see jobs/queue.py. EAGER runs them inline.
+JOBS = {
+    'EAGER': env_bool('LELLO_JOBS_EAGER', False),
+    'BATCH_SIZE': 10,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'LOCK_TIMEOUT': 600,
+}
+
+# Prometheus text endpoint at /metrics, see lello/metrics.py. Set
+# LELLO_METRICS_DIR when running several worker processes so /metrics
+# aggregates all of them. Only staff users, LELLO_METRICS_ALLOWED_IPS and
+# scrapers sending `Authorization: Bearer $LELLO_METRICS_TOKEN` can read it.
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': os.environ.get('LELLO_METRICS_DIR'),
+    'FLUSH_INTERVAL': 1.0,
+    'ALLOWED_IPS': env_list('LELLO_METRICS_ALLOWED_IPS'),
+    'TOKEN': os.environ.get('LELLO_METRICS_TOKEN'),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'lello.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,8 @@
+from .base import *
+
+DEBUG = env_bool('LELLO_DEBUG', True)
+
+# runserver alone, without a job worker.
+JOBS['EAGER'] = env_bool('LELLO_JOBS_EAGER', True)
+
+METRICS['ALLOWED_IPS'] = env_list('LELLO_METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
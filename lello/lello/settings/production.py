@@ -0,0 +1,110 @@
+"""
+Production profile, enabled with LELLO_ENV=production.
+
+DEBUG is off (no per-request query log), sessions live in the cache, compiled
+templates are kept in memory and large responses are compressed. Configuration comes
+from environment variables: LELLO_SECRET_KEY and LELLO_ALLOWED_HOSTS are
+required, LELLO_MEMCACHED (comma separated host:port) shares the cache between
+processes.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *
+
+DEBUG = env_bool('LELLO_DEBUG', False)
+
+SECRET_KEY = os.environ.get('LELLO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('LELLO_SECRET_KEY is required in production')
+
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured('LELLO_ALLOWED_HOSTS is required in production')
+
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'lello.compression.CompressionMiddleware',
+)
+
+# JSON only: the browsable API renders a whole HTML page per request.
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_RENDERER_CLASSES = ['lello.renderers.FastJSONRenderer'],
+)
+
+if os.environ.get('LELLO_MEMCACHED'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache',
+            'LOCATION': env_list('LELLO_MEMCACHED'),
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    # Per process: replica pinning and cached sessions only hold within a
+    # single worker.
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Reads hit the cache, writes go through to the database so a cache restart
+# doesn't log everyone out.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS'] = dict(
+    TEMPLATES[0]['OPTIONS'],
+    context_processors = [
+        processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+        if processor != 'django.template.context_processors.debug'
+    ],
+    loaders = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ],
+)
+
+SESSION_COOKIE_SECURE = env_bool('LELLO_SECURE_COOKIES', True)
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
+LOG_LEVEL = os.environ.get('LELLO_LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # Already one JSON object per line, see lello/instrumentation.py
+        'lello.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
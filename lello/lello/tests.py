@@ -0,0 +1,445 @@
+import gzip
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, router, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+import psycopg2
+from psycopg2 import extensions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_jwt.settings import api_settings
+
+from lello import compression, fast_serializers, metrics
+from lello.backends.postgresql_pool.base import ConnectionPool
+from lello.db import ConnectionHealthMiddleware, ReplicaRouter, _pin_key, _use_replica, replica_lag
+from boards.models import Board
+from users.authentication import jwt_payload_handler, user_cache
+from users.models import Team
+
+
+class ReplicaTestCase(TransactionTestCase):
+    """
+    Runs with a 'replica' alias pointing at the test database, the way
+    DATABASES['replica'] mirrors 'default' under test (TEST['MIRROR']).
+    TransactionTestCase: the replica connection only sees committed rows.
+    The alias only exists while these tests run so the rest of the suite
+    keeps a single database.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.databases['replica'] = dict(
+            connections['default'].settings_dict,
+            TEST = {'MIRROR': 'default'}
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        delattr(connections._connections, 'replica')
+        del connections.databases['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        replica_lag.checked_at = None
+        replica_lag.value = None
+        self.user = User.objects.create(username = 'lector')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queries(self, method, path, data=None):
+        """Queries run on each alias by one request."""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = getattr(self.client, method)(path, data, format = 'json')
+        self.assertLess(response.status_code, 400, response.content)
+        return len(primary.captured_queries), len(replica.captured_queries)
+
+
+class ReplicaRoutingTest(ReplicaTestCase):
+
+    def test_reads_go_to_the_replica(self):
+        Team.objects.create(name = 'Team')
+        primary, replica = self.queries('get', '/api/teams/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        # The flag doesn't outlive the request.
+        self.assertFalse(_use_replica.get())
+        self.assertEqual(router.db_for_read(Team), 'default')
+
+    def test_writes_and_transactions_go_to_the_primary(self):
+        primary, replica = self.queries('post', '/api/teams/', {'name': 'Nuevo'})
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        token = _use_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Team), 'replica')
+            self.assertEqual(router.db_for_write(Team), 'default')
+            with transaction.atomic():
+                self.assertTrue(connections['default'].in_atomic_block)
+                self.assertFalse(connections['replica'].in_atomic_block)
+        finally:
+            _use_replica.reset(token)
+
+    def test_relations_across_aliases(self):
+        team = Team.objects.using('replica').get(pk = Team.objects.create(name = 'Team').pk)
+        user = User.objects.using('default').get(pk = self.user.pk)
+        self.assertTrue(ReplicaRouter().allow_relation(team, user))
+        # Assigning related objects read from different aliases is allowed.
+        team.members.add(user)
+        self.assertEqual(list(team.members.all()), [user])
+
+
+class ReadYourWritesTest(ReplicaTestCase):
+
+    def test_writes_pin_reads_to_the_primary(self):
+        self.queries('post', '/api/teams/', {'name': 'Nuevo'})
+        self.assertTrue(cache.get(_pin_key(self.user)))
+        primary, replica = self.queries('get', '/api/teams/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        # Other users still read from the replica.
+        self.client.force_authenticate(User.objects.create(username = 'otro'))
+        primary, replica = self.queries('get', '/api/teams/')
+        self.assertEqual(primary, 0)
+
+    def test_writes_through_any_view_pin(self):
+        # LabelViewSet doesn't use ReadReplicaMixin.
+        board = Board.objects.create(name = 'Board', owner = self.user, team = Team.objects.create(name = 'Team'))
+        self.queries('post', '/api/labels/', {'name': 'Urgente', 'board': board.pk})
+        self.assertTrue(cache.get(_pin_key(self.user)))
+        primary, replica = self.queries('get', '/api/boards/{}/labels/'.format(board.pk))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_pin_lasts_pin_seconds(self):
+        with self.settings(REPLICA_ROUTING = {'PIN_SECONDS': 5}), \
+                mock.patch('lello.db.cache.set') as cache_set:
+            self.queries('post', '/api/teams/', {'name': 'Nuevo'})
+        cache_set.assert_called_once_with(_pin_key(self.user), True, 5)
+        primary, replica = self.queries('get', '/api/teams/')
+        self.assertEqual(primary, 0)
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.post('/api/teams/', {}, format = 'json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(cache.get(_pin_key(self.user)))
+
+
+class ReplicaLagTest(ReplicaTestCase):
+
+    def test_lagging_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(replica_lag, 'measure', return_value = 10.0):
+            primary, replica = self.queries('get', '/api/teams/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(replica_lag, 'measure', side_effect = DatabaseError):
+            primary, replica = self.queries('get', '/api/teams/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_first_measurement_in_flight_uses_the_primary(self):
+        # What other threads see while the first measurement runs.
+        replica_lag.checked_at = time.monotonic()
+        replica_lag.value = None
+        self.assertEqual(replica_lag.get('replica', 60), float('inf'))
+        primary, replica = self.queries('get', '/api/teams/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_lag_is_measured_once_per_interval(self):
+        with mock.patch.object(replica_lag, 'measure', return_value = 0.5) as measure:
+            self.queries('get', '/api/teams/')
+            self.queries('get', '/api/teams/')
+            self.assertEqual(measure.call_count, 1)
+            replica_lag.checked_at -= 60
+            self.queries('get', '/api/teams/')
+            self.assertEqual(measure.call_count, 2)
+
+
+class ConnectionHealthTest(TestCase):
+
+    def setUp(self):
+        self.connection = connections['default']
+        self.connection.ensure_connection()
+        self.health_checks = mock.patch.dict(self.connection.settings_dict, CONN_HEALTH_CHECKS = True, CONN_MAX_AGE = 60)
+        self.health_checks.start()
+        self.addCleanup(self.health_checks.stop)
+        self.middleware = ConnectionHealthMiddleware(lambda request: 'response')
+        self.request = RequestFactory().get('/')
+
+    def test_closes_broken_connections(self):
+        with mock.patch.object(self.connection, 'is_usable', return_value = False), \
+                mock.patch.object(self.connection, 'close') as close:
+            self.assertEqual(self.middleware(self.request), 'response')
+        close.assert_called_once_with()
+
+    def test_keeps_healthy_connections(self):
+        with mock.patch.object(self.connection, 'close') as close:
+            self.middleware(self.request)
+        close.assert_not_called()
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def setUp(self):
+        with mock.patch('psycopg2.pool.ThreadedConnectionPool'):
+            self.pool = ConnectionPool(1, 2, 5, health_checks = True)
+
+    def connection(self, closed = 0, broken = False):
+        connection = mock.Mock(closed = closed)
+        connection.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+        if broken:
+            connection.cursor.side_effect = psycopg2.OperationalError('server closed the connection unexpectedly')
+        return connection
+
+    def test_discards_broken_connections_on_checkout(self):
+        closed, broken, healthy = self.connection(closed = 1), self.connection(broken = True), self.connection()
+        self.pool.pool.getconn.side_effect = [closed, broken, healthy]
+        self.assertIs(self.pool.getconn(), healthy)
+        self.pool.pool.putconn.assert_has_calls([mock.call(closed, close = True), mock.call(broken, close = True)])
+
+    def test_releases_the_slot_when_no_connection_can_be_opened(self):
+        self.pool.pool.getconn.side_effect = psycopg2.OperationalError('could not connect to server')
+        for _ in range(3):
+            with self.assertRaises(psycopg2.OperationalError):
+                self.pool.getconn()
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+        self.requests = self.registry.counter('requests_total', 'Requests.', ('view',))
+        self.duration = self.registry.histogram('duration_seconds', 'Duration.', ('view',), buckets = (0.1, 1.0))
+
+    def test_histogram_rendering(self):
+        for value in (0.05, 0.1, 0.5, 5):
+            self.duration.observe(value, view = 'card-list')
+        self.requests.inc(view = 'say "hi"')
+        self.assertEqual(self.registry.render().splitlines(), [
+            '# HELP requests_total Requests.',
+            '# TYPE requests_total counter',
+            'requests_total{view="say \\"hi\\""} 1.0',
+            '# HELP duration_seconds Duration.',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{view="card-list",le="0.1"} 2',
+            'duration_seconds_bucket{view="card-list",le="1.0"} 3',
+            'duration_seconds_bucket{view="card-list",le="+Inf"} 4',
+            'duration_seconds_sum{view="card-list"} 5.65',
+            'duration_seconds_count{view="card-list"} 4',
+        ])
+
+    def test_multiprocess_merge(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        directory = temporary.name
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        other = {'requests_total': {'["team-list"]': 2.0}, 'duration_seconds': {'["team-list"]': [1, 0, 0, 0.05]}}
+        for pid in (os.getppid(), exited.pid):
+            with open(os.path.join(directory, 'metrics-{}.json'.format(pid)), 'w') as output:
+                json.dump(other, output)
+        self.requests.inc(view = 'team-list')
+
+        with override_settings(METRICS = dict(settings.METRICS, MULTIPROCESS_DIR = directory)):
+            for _ in range(2):
+                collected = self.registry.collect()
+                self.assertEqual(collected['requests_total'], {('team-list',): 5.0})
+                self.assertEqual(collected['duration_seconds'], {('team-list',): [2, 0, 0, 0.1]})
+
+        # The file of the process that exited was folded into EXITED.
+        self.assertEqual(sorted(os.listdir(directory)), sorted([
+            '.lock',
+            metrics.EXITED,
+            'metrics-{}.json'.format(os.getpid()),
+            'metrics-{}.json'.format(os.getppid()),
+        ]))
+
+    def test_middleware_labels(self):
+        user = User.objects.create(username = 'metrics')
+        client = APIClient()
+        client.force_authenticate(user)
+        key = ('team-list', 'list', 'GET', '200')
+
+        def observed():
+            # Observations of the request duration histogram.
+            return sum(metrics.http_duration.values.get(key[:3], [0])[:-1])
+
+        before = metrics.http_requests.values.get(key, 0), observed()
+        self.assertEqual(client.get('/api/teams/').status_code, 200)
+        self.assertEqual((metrics.http_requests.values[key], observed()), (before[0] + 1, before[1] + 1))
+
+        self.assertEqual(client.post('/api/teams/', {}, format = 'json').status_code, 400)
+        self.assertIn(('team-list', 'create', 'POST', '400'), metrics.http_requests.values)
+        client.get('/api/nada/')
+        self.assertIn(('unmatched', '', 'GET', '404'), metrics.http_requests.values)
+
+
+class MetricsViewTest(TestCase):
+
+    def test_access(self):
+        client = APIClient(REMOTE_ADDR = '10.0.0.1')
+        with override_settings(METRICS = dict(settings.METRICS, ALLOWED_IPS = [], TOKEN = 'secreto')):
+            self.assertEqual(client.get('/metrics').status_code, 403)
+            self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION = 'Bearer otro').status_code, 403)
+            response = client.get('/metrics', HTTP_AUTHORIZATION = 'Bearer secreto')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'# TYPE lello_http_requests_total counter', response.content)
+
+            client.force_login(User.objects.create(username = 'staff', is_staff = True))
+            self.assertEqual(client.get('/metrics').status_code, 200)
+
+        with override_settings(METRICS = dict(settings.METRICS, ALLOWED_IPS = ['10.0.0.1'], TOKEN = None)):
+            self.assertEqual(APIClient(REMOTE_ADDR = '10.0.0.1').get('/metrics').status_code, 200)
+            self.assertEqual(APIClient(REMOTE_ADDR = '10.0.0.2').get('/metrics').status_code, 403)
+
+
+@override_settings(INSTRUMENTATION = dict(settings.INSTRUMENTATION, ENABLED = True))
+class InstrumentationTest(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = user = User.objects.create(username = 'instrumented')
+        Team.objects.create(name = 'Team')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION = 'JWT {}'.format(
+            api_settings.JWT_ENCODE_HANDLER(jwt_payload_handler(user))
+        ))
+
+    def get(self, path='/api/teams/'):
+        """Response, log line and queries of one instrumented request."""
+        with CaptureQueriesContext(connections['default']) as queries:
+            with self.assertLogs('lello.instrumentation', 'INFO') as logs:
+                response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        [line] = logs.records
+        return response, json.loads(line.getMessage()), len(queries.captured_queries)
+
+    def test_records_request_metrics(self):
+        response, line, queries = self.get()
+        self.assertGreater(queries, 0)
+        self.assertEqual(line['queries'], queries)
+        self.assertEqual(
+            (line['method'], line['path'], line['view'], line['status']),
+            ('GET', '/api/teams/', 'team-list', 200)
+        )
+        self.assertEqual((line['cache_hits'], line['cache_misses']), (0, 1))
+        for field in ('duration_ms', 'db_ms', 'serializer_ms'):
+            self.assertGreaterEqual(line[field], 0)
+        self.assertGreaterEqual(line['duration_ms'], line['db_ms'])
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[0-9.]+, db;dur=[0-9.]+;desc="{} queries", serialize;dur=[0-9.]+, '.format(queries))
+        self.assertIn('cache;desc="0 hits, 1 misses"', timing)
+
+        # The user is cached now: one query less, counted as a hit.
+        response, line, cached = self.get()
+        self.assertEqual((line['queries'], cached), (queries - 1, queries - 1))
+        self.assertEqual((line['cache_hits'], line['cache_misses']), (1, 0))
+
+    def test_times_the_values_fast_path(self):
+        # lello.fast_serializers builds the response without Serializer.data.
+        def slow(plan, queryset, related=None):
+            time.sleep(0.02)
+            return []
+
+        with mock.patch.object(fast_serializers.ValuesPlan, 'serialize', autospec = True, side_effect = slow) as serialize:
+            response, line, _ = self.get('/api/users/{}/notifications/'.format(self.user.pk))
+        serialize.assert_called_once()
+        self.assertGreaterEqual(line['serializer_ms'], 20)
+        self.assertRegex(response['Server-Timing'], r'serialize;dur=(2\d|[3-9]\d|\d{3,})\.')
+
+    def test_dumps_slow_profiles(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        config = dict(settings.INSTRUMENTATION, ENABLED = True, PROFILE_SAMPLE_RATE = 1.0, SLOW_REQUEST_MS = 0, PROFILE_DIR = temporary.name)
+        with override_settings(INSTRUMENTATION = config):
+            self.get()
+        [name] = os.listdir(temporary.name)
+        self.assertRegex(name, r'-GET-api_teams-\d+ms\.prof$')
+
+
+def production_settings():
+    """The lello.settings.production module, loaded with its required variables."""
+    package = importlib.import_module('lello.settings')
+    environ = {'LELLO_SECRET_KEY': 'secreto', 'LELLO_ALLOWED_HOSTS': 'api.lello.com'}
+    with mock.patch.dict(os.environ, environ), mock.patch.dict(sys.modules), mock.patch.dict(package.__dict__):
+        sys.modules.pop('lello.settings.base', None)
+        sys.modules.pop('lello.settings.production', None)
+        return importlib.import_module('lello.settings.production')
+
+
+class CompressionTest(TestCase):
+
+    def setUp(self):
+        override = override_settings(
+            MIDDLEWARE = production_settings().MIDDLEWARE,
+            COMPRESSION = dict(settings.COMPRESSION, MIN_SIZE = 200),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        for number in range(20):
+            Team.objects.create(name = 'Team {}'.format(number))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username = 'compressed'))
+
+    def get(self, **headers):
+        response = self.client.get('/api/teams/', HTTP_ACCEPT = 'application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        return response
+
+    def test_compresses_when_accepted(self):
+        plain = self.get().content
+        self.assertGreater(len(plain), 200)
+        response = self.get(HTTP_ACCEPT_ENCODING = 'deflate, gzip;q=0.8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain))
+        self.assertEqual(gzip.decompress(response.content), plain)
+
+    def test_leaves_other_responses_alone(self):
+        for header in ({}, {'HTTP_ACCEPT_ENCODING': 'identity'}, {'HTTP_ACCEPT_ENCODING': 'gzip;q=0, br;q=0'}):
+            response = self.get(**header)
+            self.assertFalse(response.has_header('Content-Encoding'), header)
+            self.assertEqual(len(json.loads(response.content)), 20)
+
+    def test_skips_small_responses(self):
+        with self.settings(COMPRESSION = dict(settings.COMPRESSION, MIN_SIZE = 100000)):
+            response = self.get(HTTP_ACCEPT_ENCODING = 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(compression.accepted_encodings('gzip, BR;q=0.5, deflate;q=0, *'), {'gzip', 'br', '*'})
+
+    def test_production_serves_json_only(self):
+        renderers = [
+            import_string(path)()
+            for path in production_settings().REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        ]
+        self.assertFalse([renderer for renderer in renderers if isinstance(renderer, BrowsableAPIRenderer)])
+        # What a browser sends: it gets JSON instead of the HTML page.
+        request = Request(RequestFactory().get('/api/teams/', HTTP_ACCEPT = 'text/html,application/xhtml+xml,*/*;q=0.8'))
+        renderer, media_type = DefaultContentNegotiation().select_renderer(request, renderers)
+        self.assertEqual(renderer.media_type, 'application/json')
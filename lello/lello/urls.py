@@ -13,7 +13,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.conf.urls import url, include
 
 from rest_framework import routers
@@ -24,13 +24,12 @@ from rest_framework_jwt.views import (
 )
 
 from users.views import UserViewSet, UserDetailViewSet, TeamViewSet
-from boards.views import BoardViewSet, ListViewSet, CardViewSet, LabelViewSet
+from boards.views import BoardViewSet, ListViewSet, CardViewSet, LabelViewSet, DeletionViewSet
 from checklists.views import ChecklistViewSet, ElementViewSet
 from calendars.views import CalendarViewSet, EventViewSet
 from notifications.views import NotificationViewSet
 from audits.views import AuditViewSet
-
-from init_data import create_initial_data
+from lello.metrics import metrics_view
 
 from django.urls import path, include
 
@@ -43,6 +42,7 @@ router.register(r'boards', BoardViewSet)
 router.register(r'lists', ListViewSet)
 router.register(r'cards', CardViewSet)
 router.register(r'labels', LabelViewSet)
+router.register(r'deletions', DeletionViewSet)
 router.register(r'checklists', ChecklistViewSet)
 router.register(r'elements', ElementViewSet)
 router.register(r'calendars', CalendarViewSet)
@@ -51,12 +51,19 @@ router.register(r'notifications', NotificationViewSet)
 router.register(r'audits', AuditViewSet)
 
 urlpatterns = [
-    url('admin/', admin.site.urls),
-    url(r'^api-auth/', include('rest_framework.urls', namespace = 'rest_framework')),
     url(r'^api/', include(router.urls)),
     url(r'^api/token-auth/', obtain_jwt_token),
     url(r'^api/token-refresh/', refresh_jwt_token),
     url(r'^api/token-verify/', verify_jwt_token),
-    url(r'^admin/initial-data/', create_initial_data),
-    url(r'send/', include('users.urls')),
+    url(r'^metrics/?$', metrics_view),
 ]
+
+if not settings.API_ONLY:
+    # Imported here so API-only processes never load the admin.
+    from django.contrib import admin
+
+    urlpatterns += [
+        url('admin/', admin.site.urls),
+        url(r'^api-auth/', include('rest_framework.urls', namespace = 'rest_framework')),
+        url(r'send/', include('users.urls')),
+    ]
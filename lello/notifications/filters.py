@@ -0,0 +1,15 @@
+from django_filters import rest_framework as filters
+
+from notifications.models import Notification
+
+
+class NotificationFilter(filters.FilterSet):
+    receiver = filters.NumberFilter(field_name = 'receiver')
+    transmitter = filters.NumberFilter(field_name = 'transmitter')
+    # ?created_at_after=...&created_at_before=...
+    created_at = filters.IsoDateTimeFromToRangeFilter()
+    ordering = filters.OrderingFilter(fields = ('created_at',))
+
+    class Meta:
+        model = Notification
+        fields = []
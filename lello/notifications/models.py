@@ -24,6 +24,7 @@ class Notification(models.Model):
         blank = False,
         on_delete = models.CASCADE,
         related_name = 'receiver',
+        db_index = False
     )
     created_at = models.DateTimeField(
         auto_now_add = True
@@ -32,5 +33,11 @@ class Notification(models.Model):
         auto_now = True
     )
 
+    class Meta:
+        indexes = [
+            # A user's notifications, newest first.
+            models.Index(fields = ['receiver', 'created_at'], name = 'notification_receiver_idx'),
+        ]
+
     def __str__(self):
         return self.title
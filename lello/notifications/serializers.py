@@ -1,9 +1,14 @@
-from rest_framework import serializers
-
+from lello.serializers import DynamicFieldsModelSerializer
 from notifications.models import Notification
+from users.serializers import UserSerializer
+
 
+class NotificationSerializer(DynamicFieldsModelSerializer):
+    expandable_fields = {
+        'transmitter': (UserSerializer, {}),
+        'receiver': (UserSerializer, {}),
+    }
 
-class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
@@ -0,0 +1,12 @@
+from jobs.queue import task
+from notifications.models import Notification
+
+
+@task(priority = 5)
+def create_notification(title, description, transmitter_id, receiver_id):
+    Notification.objects.create(
+        title = title,
+        description = description,
+        transmitter_id = transmitter_id,
+        receiver_id = receiver_id
+    )
@@ -3,15 +3,19 @@ from rest_framework import viewsets, status
 from django.http import Http404
 from rest_framework.response import Response
 
+from notifications.filters import NotificationFilter
 from notifications.models import Notification
 from notifications.serializers import NotificationSerializer
 from users.permissions import APIPermissionClassFactory
+from lello.db import ReadReplicaMixin
+from lello.serializers import DynamicFieldsViewSetMixin
 from audits.models import Audit
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ReadReplicaMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    filterset_class = NotificationFilter
     permission_classes = (
         APIPermissionClassFactory(
             name='NotificationPermission',
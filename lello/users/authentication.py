@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext as _
+from rest_framework import exceptions
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+from rest_framework_jwt.utils import jwt_payload_handler as default_payload_handler
+
+from lello.instrumentation import record_cache
+
+
+DEFAULTS = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,
+}
+
+
+def token_version(user):
+    # Changes whenever the password does, so a password change both revokes
+    # old tokens and moves the user to a new cache key.
+    return hashlib.sha256(user.password.encode()).hexdigest()[:12]
+
+
+def jwt_payload_handler(user):
+    payload = default_payload_handler(user)
+    payload['ver'] = token_version(user)
+    return payload
+
+
+FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+
+class UserCache:
+    """
+    Bounded, thread-safe LRU of resolved users with a per-entry TTL.
+
+    Only the field values are kept: every hit builds a new User, so requests
+    never share an instance (nor the permission caches ModelBackend and
+    guardian leave on it). Entries are dropped on user changes in this
+    process; the TTL bounds how long other worker processes can keep serving
+    a stale entry.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            values, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return User.from_db(DEFAULT_DB_ALIAS, FIELDS, values)
+
+    def set(self, key, user):
+        values = tuple(getattr(user, name) for name in FIELDS)
+        with self.lock:
+            self.entries[key] = (values, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+config = dict(DEFAULTS, **getattr(settings, 'JWT_USER_CACHE', {}))
+user_cache = UserCache(config['MAX_SIZE'], config['TTL'])
+
+
+class CachedJSONWebTokenAuthentication(JSONWebTokenAuthentication):
+    """
+    JSONWebTokenAuthentication that resolves the token's user from an
+    in-process cache instead of querying the users table on every request.
+    """
+
+    def authenticate_credentials(self, payload):
+        user_id = payload.get('user_id')
+        version = payload.get('ver')
+        if user_id is None or version is None:
+            # Tokens issued before versioning: resolve them the old way.
+            return super().authenticate_credentials(payload)
+
+        key = (user_id, version)
+        user = user_cache.get(key)
+        record_cache(user is not None)
+        if user is not None:
+            return user
+
+        try:
+            user = User.objects.get(pk = user_id)
+        except User.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid signature.'))
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User account is disabled.'))
+
+        if token_version(user) != version:
+            raise exceptions.AuthenticationFailed(_('Token is no longer valid.'))
+
+        user_cache.set(key, user)
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
@@ -71,15 +71,25 @@ class Team(models.Model):
 class Member(models.Model):
     team = models.ForeignKey(
         'users.Team',
-        on_delete = models.CASCADE
+        on_delete = models.CASCADE,
+        db_index = False
     )
     user = models.ForeignKey(
         User,
-        on_delete = models.CASCADE
+        on_delete = models.CASCADE,
+        db_index = False
     )
     joined_at = models.DateTimeField(
         auto_now_add = True
     )
+
+    class Meta:
+        indexes = [
+            # Members of a team, and the memberships of a user, which Django
+            # looks up to cascade when the user is deleted.
+            models.Index(fields = ['team', 'user'], name = 'member_team_user_idx'),
+            models.Index(fields = ['user', 'team'], name = 'member_user_team_idx'),
+        ]
     # role = models.ForeignKey(
     #     'users.Role',
     #     null = True,  
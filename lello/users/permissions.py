@@ -16,6 +16,8 @@ __docformat__ = 'reStructuredText'
 
 from rest_framework import permissions
 
+from lello.metrics import permission_checks
+
 BASE_KEY = 'base'
 INSTANCE_KEY = 'instance'
 OBJECT_KEY = 'object'
@@ -25,6 +27,24 @@ PERMISSION_KEY = 'perm'
 class APIPermission(permissions.BasePermission):
 
     def has_permission(self, request, view):
+        allowed = self.check_permission(request, view)
+        self._count(view, BASE_KEY, allowed)
+        return allowed
+
+    def has_object_permission(self, request, view, obj):
+        allowed = self.check_object_permission(request, view, obj)
+        self._count(view, INSTANCE_KEY, allowed)
+        return allowed
+
+    def _count(self, view, level, allowed):
+        permission_checks.inc(
+            permission=type(self).__name__,
+            action=view.action,
+            level=level,
+            result='allowed' if allowed else 'denied',
+        )
+
+    def check_permission(self, request, view):
 
         # Class permission configuration
         perm_config = self._get_configuration()
@@ -103,7 +123,7 @@ class APIPermission(permissions.BasePermission):
         # Else, access is not allowed
         return False
 
-    def has_object_permission(self, request, view, obj):
+    def check_object_permission(self, request, view, obj):
 
         # Class permission configuration
         perm_config = self._get_configuration()
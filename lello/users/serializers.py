@@ -1,17 +1,19 @@
 from rest_framework import serializers
 
 from django.contrib.auth.models import User
+from django.db import transaction
+from lello.serializers import DynamicFieldsModelSerializer
 from users.models import UserDetail, Team
-from users.services import enviar_email
+from users.tasks import send_email
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = UserDetail
         fields = '__all__'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsModelSerializer):
     password = serializers.CharField(write_only=True)
     class Meta:
         model = User
@@ -27,13 +29,16 @@ class UserSerializer(serializers.ModelSerializer):
 
     # detail = UserDetailSerializer(many=False, read_only=False)
     def create(self, validated_data):
-        try:
-            email = validated_data["email"]
-            enviar_email([email], 'Bienvenido! Te has registrado en Lello')
-        except:
-            print("Email failed :(")
-        
-        user = User.objects.create_user(**validated_data)
+        # The welcome email is only queued once the user exists; the savepoint
+        # keeps a failed enqueue from breaking the user's transaction.
+        with transaction.atomic(savepoint = False):
+            user = User.objects.create_user(**validated_data)
+            try:
+                email = validated_data["email"]
+                with transaction.atomic():
+                    send_email.delay(to = [email], message = 'Bienvenido! Te has registrado en Lello')
+            except:
+                print("Email failed :(")
         # user = User.objects.create(
         #     user = validated_data["username"],
         #     active = True
@@ -43,7 +48,7 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Team
         fields = '__all__'
@@ -1,18 +1,28 @@
+import time
+
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
+from lello.metrics import email_duration
+
 def enviar_email(to, message):
-    send_mail(
-        'Hello from Lello',
-        message,
-        'lellodjango@gmail.com',
-        to,
-        fail_silently = False,
-        html_message = render_to_string(
-            'send/index.html',
-            {
-                'message': message
-            }
+    start = time.perf_counter()
+    result = 'error'
+    try:
+        send_mail(
+            'Hello from Lello',
+            message,
+            'lellodjango@gmail.com',
+            to,
+            fail_silently = False,
+            html_message = render_to_string(
+                'send/index.html',
+                {
+                    'message': message
+                }
+            )
         )
-    )
+        result = 'sent'
+    finally:
+        email_duration.observe(time.perf_counter() - start, result = result)
     print("Email enviado con exito!")
@@ -0,0 +1,7 @@
+from jobs.queue import task
+from users.services import enviar_email
+
+
+@task()
+def send_email(to, message):
+    enviar_email(to, message)
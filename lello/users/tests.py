@@ -1,3 +1,64 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework import exceptions
+from rest_framework.test import APIClient
+from rest_framework_jwt.settings import api_settings
+
+from users.authentication import CachedJSONWebTokenAuthentication, jwt_payload_handler, user_cache
+
+
+class CachedAuthenticationTest(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username = 'cached', password = 'admin')
+        self.payload = jwt_payload_handler(self.user)
+        self.authentication = CachedJSONWebTokenAuthentication()
+
+    def authenticate(self):
+        return self.authentication.authenticate_credentials(self.payload)
+
+    def test_hit_does_not_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, 'cached')
+
+    def test_hits_return_fresh_instances(self):
+        first = self.authenticate()
+        first.has_perm('users.delete_team')
+        second = self.authenticate()
+        self.assertIsNot(first, second)
+        self.assertFalse(hasattr(second, '_perm_cache'))
+        self.assertFalse(second._state.adding)
+
+    def test_password_change_revokes_token(self):
+        self.authenticate()
+        self.user.set_password('otra')
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_deactivation_is_seen_right_away(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_entries_expire(self):
+        with mock.patch('users.authentication.time.monotonic', return_value = 1000):
+            self.authenticate()
+        with mock.patch('users.authentication.time.monotonic', return_value = 1000 + user_cache.ttl + 1):
+            with self.assertNumQueries(1):
+                self.authenticate()
 
-# Create your tests here.
+    def test_token_authenticates_requests(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION = 'JWT {}'.format(api_settings.JWT_ENCODE_HANDLER(self.payload)))
+        response = client.get('/api/users/{}/'.format(self.user.pk))
+        self.assertEqual(response.status_code, 200)
@@ -6,24 +6,24 @@ from django.http import Http404
 from guardian.shortcuts import assign_perm
 
 from users.serializers import UserSerializer, UserDetailSerializer, TeamSerializer
-from notifications.serializers import NotificationSerializer
 from users.permissions import APIPermissionClassFactory
-from boards.serializers import BoardSerializer
+from lello.fast_serializers import serialize
+from lello.db import ReadReplicaMixin
 from notifications.models import Notification
 from django.contrib.auth.models import User
 from users.models import UserDetail, Team
 from audits.models import Audit
-from users.services import enviar_email
+from users.tasks import send_email
 
 
 def index(request):
     message = 'Hola, te saludo desde Lello Django'
-    enviar_email(
-        [
+    send_email.delay(
+        to = [
             'frangrosalo@hotmail.com',
             'gian.luca.99@hotmail.com'
         ],
-        message
+        message = message
     )
     return render(
         request,
@@ -34,7 +34,7 @@ def index(request):
     )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (
@@ -58,11 +58,18 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def notifications(self, request, pk=None):
+        # Serializers of other apps are imported where used so loading this
+        # module doesn't pull those apps in.
+        from notifications.serializers import NotificationSerializer
+
         user = self.get_object()
-        notifications = Notification.objects.filter(receiver = user)
+        notifications = NotificationSerializer.setup_queryset(
+            Notification.objects.filter(receiver = user),
+            request
+        )
 
         return Response(
-            [NotificationSerializer(notification).data for notification in notifications]
+            serialize(NotificationSerializer, notifications, self.get_serializer_context())
         )
 
 class UserDetailViewSet(viewsets.ModelViewSet):
@@ -86,8 +93,8 @@ class UserDetailViewSet(viewsets.ModelViewSet):
         ),
     )
 
-class TeamViewSet(viewsets.ModelViewSet):
-    queryset = Team.objects.all()
+class TeamViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
+    queryset = Team.objects.prefetch_related('members')
     serializer_class = TeamSerializer
     permission_classes = (
         APIPermissionClassFactory(
@@ -120,26 +127,44 @@ class TeamViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
 
+    def get_queryset(self):
+        from boards.models import Deletion
+
+        # Teams waiting for their background deletion are already gone for
+        # the API.
+        return super().get_queryset().exclude(pk__in = Deletion.objects.pending(Deletion.Target.team))
+
     def destroy(self, request, *args, **kwargs):
+        # A team can hold millions of rows: they are deleted in the
+        # background in small batches (boards.deletion), the response only
+        # says where to follow the progress.
+        from boards.deletion import schedule
+        from boards.models import Deletion
+        from boards.serializers import DeletionSerializer
+
         try:
             instance = self.get_object()
-            self.perform_destroy(instance)
-            Audit.objects.create(
-                httpMethod = request.method,
-                url = '/teams/{}/'.format(kwargs['pk']),
-                user = request.user
-            )
         except Http404:
-            pass
-        return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        deletion = schedule(Deletion.Target.team, instance, request.user)
+        Audit.objects.create(
+            httpMethod = request.method,
+            url = '/teams/{}/'.format(kwargs['pk']),
+            user = request.user
+        )
+        return Response(DeletionSerializer(deletion).data, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['get'])
     def boards(self, request, pk=None):
+        from boards.deletion import exclude_deleting
+        from boards.serializers import BoardSerializer
+
         team = self.get_object()
-        boards = team.board_set.all()
+        # Like /boards/: boards waiting for their deletion are already gone.
+        boards = BoardSerializer.setup_queryset(exclude_deleting(team.board_set.all()), request)
 
         return Response(
-            [BoardSerializer(board).data for board in boards]
+            BoardSerializer(boards, many = True, context = self.get_serializer_context()).data
         )
 
     @action(detail=True, methods=['get'])
@@ -148,5 +173,5 @@ class TeamViewSet(viewsets.ModelViewSet):
         members = team.members.all()
 
         return Response(
-            [UserSerializer(user).data for user in members]
+            UserSerializer(members, many = True, context = self.get_serializer_context()).data
         )